@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+import numpy
+import sys
+
+sys.path.append('code')
+from gameState import GameState
+
+
+class BatchGameState:
+    """
+    Advance many independent games in lockstep. Positions, pills, fruit,
+    time, and scores of all games are held in arrays across the batch and
+    a single step() moves every game that isn't over yet.
+
+    Games are set up as ordinary GameState instances (so map choice and
+    pill placement are exactly what they would be) and handed over along
+    with the Pac and Ghost expression trees playing each game. Given the
+    same seeds, every game ends with the same score, time, and winner as
+    it would stepping through GameState.play_turn with tree controllers
+    evaluating trees the same way (tree_eval). No world data is recorded.
+    """
+
+    # Sensor value when there is no other agent to measure distance to
+    NO_AGENT = 100000
+
+
+    def __init__(self, game_states, pac_trees, ghost_trees, tree_eval = 'compiled'):
+        """
+        Take over the given freshly set up game states. pac_trees[i] and
+        ghost_trees[i] are the expression trees controlling every Pac and
+        every Ghost in game i.
+
+        tree_eval is 'compiled' (one call of the compiled tree per agent
+        and candidate move) or 'vectorized' (each distinct tree evaluated
+        once for all the games and agents it plays, see
+        ExprTree.evaluate).
+        """
+        self.num_games = len(game_states)
+        # Kept for their nearest-pill distance fields
+        self.game_states = game_states
+        # Values of RAND-free trees by sensor values (see decide)
+        self.tree_vals = {}
+        self.pac_trees = pac_trees
+        self.ghost_trees = ghost_trees
+        self.tree_eval = tree_eval
+        # Sensors used by any of the trees (see ExprTree.sensor_mask)
+        self.pac_sensor_mask = 0
+        for tree in set(pac_trees):
+            self.pac_sensor_mask |= tree.sensor_mask()
+        self.ghost_sensor_mask = 0
+        for tree in set(ghost_trees):
+            self.ghost_sensor_mask |= tree.sensor_mask()
+        self.num_pacs = len(game_states[0].pacs_pos)
+        self.num_ghosts = len(game_states[0].ghosts_pos)
+
+        # Random generators stay with their games
+        self.rngs = [game_state.rng for game_state in game_states]
+        self.agent_rngs = [game_state.agent_rng for game_state in game_states]
+        self.agent_generators = [game_state.agent_generator for game_state in game_states]
+
+        # Stack the per-cell tables of the maps in use, padded to the largest map
+        map_infos = []
+        map_ids = {}
+        map_idx = []
+        for game_state in game_states:
+            if (id(game_state.game_map_info) not in map_ids):
+                map_ids[id(game_state.game_map_info)] = len(map_infos)
+                map_infos.append(game_state.game_map_info)
+            map_idx.append(map_ids[id(game_state.game_map_info)])
+        self.map_idx = numpy.array(map_idx)
+        self.max_cells = max([info.width * info.height for info in map_infos])
+        self.pac_neighbor_arrays = numpy.full((len(map_infos), self.max_cells, 5), -1)
+        self.ghost_neighbor_arrays = numpy.full((len(map_infos), self.max_cells, 4), -1)
+        self.wall_counts = numpy.zeros((len(map_infos), self.max_cells), dtype = numpy.int64)
+        for i, info in enumerate(map_infos):
+            num_cells = info.width * info.height
+            self.pac_neighbor_arrays[i, :num_cells] = info.pac_neighbor_array
+            self.ghost_neighbor_arrays[i, :num_cells] = info.ghost_neighbor_array
+            self.wall_counts[i, :num_cells] = info.wall_count_array
+
+        # Per-game constants
+        self.widths = numpy.array([game_state.width for game_state in game_states])
+        self.heights = numpy.array([game_state.height for game_state in game_states])
+        self.orig_time = numpy.array([game_state.orig_time for game_state in game_states])
+        self.orig_num_pills = numpy.array([game_state.orig_num_pills for game_state in game_states])
+        self.fruit_spawning_probability = [game_state.fruit_spawning_probability
+                                           for game_state in game_states]
+        self.fruit_score = numpy.array([game_state.fruit_score for game_state in game_states])
+
+        # Per-game state
+        self.pac_pos = numpy.array([game_state.pacs_pos
+                                    for game_state in game_states]).reshape(self.num_games, self.num_pacs)
+        self.ghost_pos = numpy.array([game_state.ghosts_pos
+                                      for game_state in game_states]).reshape(self.num_games, self.num_ghosts)
+        self.fruit = numpy.array([game_state.fruit_pos for game_state in game_states])
+        self.pills = numpy.zeros((self.num_games, self.max_cells), dtype = bool)
+        self.pill_dist = numpy.zeros((self.num_games, self.max_cells), dtype = numpy.int64)
+        for i, game_state in enumerate(game_states):
+            num_cells = game_state.width * game_state.height
+            self.pills[i, :num_cells] = (numpy.asarray(game_state.game_map) == game_state.PILL).reshape(-1)
+            self.pill_dist[i, :num_cells] = game_state.pill_dist
+        self.time = numpy.array([game_state.time for game_state in game_states])
+        self.score = numpy.array([game_state.score for game_state in game_states])
+        self.num_pills_eaten = numpy.array([game_state.num_pills_eaten for game_state in game_states])
+        self.fruit_eaten = numpy.array([game_state.fruit_eaten for game_state in game_states])
+        self.fruit_wait = [game_state.fruit_wait for game_state in game_states]
+        self.open_cells = [game_state.open_cells for game_state in game_states]
+        self.ghost_won = numpy.zeros(self.num_games, dtype = bool)
+        self.done = numpy.zeros(self.num_games, dtype = bool)
+
+
+    def nearest(self, x, y, agent_x, agent_y, exclude_own):
+        """
+        Given candidate coordinates shaped (games, agents, candidates) and
+        agent coordinates shaped (games, agents), return the Manhattan
+        distance from each candidate to the nearest agent. If exclude_own,
+        candidates of agent k don't count agent k.
+        """
+        if (agent_x.shape[1] == 0):
+            return numpy.full(x.shape, BatchGameState.NO_AGENT)
+        dist = (numpy.abs(x[..., None] - agent_x[:, None, None, :])
+                + numpy.abs(y[..., None] - agent_y[:, None, None, :]))
+        if (exclude_own):
+            own = numpy.eye(x.shape[1], agent_x.shape[1], dtype = bool)
+            dist[numpy.broadcast_to(own[None, :, None, :], dist.shape)] = BatchGameState.NO_AGENT
+        return dist.min(axis = -1)
+
+
+    def sensors(self, games, cands, pac_x, pac_y, ghost_x, ghost_y, is_pac):
+        """
+        Return the G, P, W, F, M values of every candidate cell (games,
+        agents, candidates) as an array shaped (games, agents, candidates,
+        5). Sensors none of the trees use are 0.
+        """
+        width = self.widths[games][:, None, None]
+        cells = numpy.where(cands >= 0, cands, 0)
+        x = cells % width
+        y = cells // width
+        mask = self.pac_sensor_mask if (is_pac) else self.ghost_sensor_mask
+        unused = numpy.zeros(cells.shape, dtype = numpy.int64)
+
+        G = self.nearest(x, y, ghost_x, ghost_y, not is_pac) if (mask & 1) else unused
+        P = self.pill_dist[games[:, None, None], cells] if (mask & 2) else unused
+        W = self.wall_counts[self.map_idx[games][:, None, None], cells] if (mask & 4) else unused
+        F = unused
+        if (mask & 8):
+            fruit = self.fruit[games][:, None, None]
+            F = numpy.where(fruit < 0,
+                            width + self.heights[games][:, None, None],
+                            numpy.abs(x - fruit % width) + numpy.abs(y - fruit // width))
+        M = self.nearest(x, y, pac_x, pac_y, is_pac) if (mask & 16) else unused
+
+        return numpy.stack([G, P, W, F, M], axis = -1)
+
+
+    def decide(self, games, trees, cands, sensors):
+        """
+        Given the games being played, the tree of each game, candidate
+        cells (games, agents, candidates) padded with -1 and their sensor
+        values, return the chosen cells (games, agents) the same way the
+        tree controllers do: one call of the compiled tree per agent and
+        candidate, RAND drawing from every game's own generator.
+        """
+        # Only the real candidates, in game, agent, candidate order
+        valid = (cands >= 0)
+        num_valid = valid.sum(axis = -1)
+        rows = list(map(tuple, sensors[valid].tolist()))
+
+        # Call each game's tree over all the rows of its agents. Trees
+        # that don't draw random numbers give the same value for the same
+        # sensor values, so their values are remembered across the batch.
+        vals = []
+        start = 0
+        for game, end in zip(games.tolist(), numpy.cumsum(num_valid.sum(axis = 1)).tolist()):
+            tree = trees[game]
+            tree_function = tree.compile()
+            game_rows = rows[start:end]
+            if (tree.uses_rand()):
+                rng = self.agent_rngs[game]
+                vals.extend([tree_function(row, rng) for row in game_rows])
+            else:
+                tree_vals = self.tree_vals.setdefault(id(tree), {})
+                for row in set(game_rows).difference(tree_vals):
+                    tree_vals[row] = tree_function(row, None)
+                vals.extend(map(tree_vals.__getitem__, game_rows))
+            start = end
+
+        # Each agent takes its first highest-valued candidate. The values
+        # are compared all at once as floats when that is exact (no nan, no
+        # integer too large for a float), or else agent by agent.
+        try:
+            float_vals = numpy.array(vals, dtype = numpy.float64)
+        except OverflowError:
+            float_vals = None
+        if ((float_vals is not None) and not numpy.isnan(float_vals).any()
+            and not (numpy.abs(float_vals[numpy.isfinite(float_vals)]) >= 2 ** 53).any()):
+            # Padding never wins; ties go to the first candidate
+            padded = numpy.full(cands.shape, -numpy.inf)
+            padded[valid] = float_vals
+            best = padded.argmax(axis = -1)
+            return numpy.take_along_axis(cands, best[..., None], axis = -1)[..., 0]
+        cells = cands[valid].tolist()
+        chosen = []
+        start = 0
+        for end in numpy.cumsum(num_valid).tolist():
+            agent_vals = vals[start:end]
+            chosen.append(cells[start + agent_vals.index(max(agent_vals))])
+            start = end
+        return numpy.array(chosen, dtype = cands.dtype).reshape(cands.shape[:2])
+
+
+    def decide_vectorized(self, games, trees, cands, sensors):
+        """
+        Given the games being played, the tree of each game, candidate
+        cells (games, agents, candidates) padded with -1 and their sensor
+        values, return the chosen cells (games, agents). Each distinct
+        tree is evaluated once over all the games it plays, RAND drawing
+        from every game's own numpy generator.
+        """
+        rows_by_tree = {}
+        for i, game in enumerate(games.tolist()):
+            rows_by_tree.setdefault(id(trees[game]), []).append(i)
+
+        chosen = numpy.empty(cands.shape[:2], dtype = cands.dtype)
+        for rows in rows_by_tree.values():
+            tree = trees[games[rows[0]]]
+            vals = tree.evaluate(sensors[rows], [self.agent_generators[games[i]] for i in rows])
+            # Padding never wins; ties go to the first candidate, as in decide
+            vals = numpy.where(cands[rows] >= 0, vals, -numpy.inf)
+            best = vals.argmax(axis = -1)
+            chosen[rows] = numpy.take_along_axis(cands[rows], best[..., None], axis = -1)[..., 0]
+        return chosen
+
+
+    def check_fruit(self, game, pac_cell):
+        """
+        Eat and spawn fruit in the given game exactly like
+        GameState.check_fruit, drawing from the game's generator.
+        """
+        rng = self.rngs[game]
+        if (pac_cell == self.fruit[game]):
+            self.fruit_eaten[game] += 1
+            self.fruit[game] = -1
+            self.fruit_wait[game] = GameState.draw_fruit_wait(rng, self.fruit_spawning_probability[game])
+
+        if (self.fruit[game] == -1):
+            if (self.fruit_wait[game] > 0):
+                self.fruit_wait[game] -= 1
+            elif (self.fruit_wait[game] == 0):
+                cell = GameState.sample_open_cell(rng, self.open_cells[game], pac_cell)
+                if (cell < 0):
+                    # No open cell for fruit: wait and try again, as GameState does
+                    self.fruit_wait[game] = GameState.draw_fruit_wait(rng, self.fruit_spawning_probability[game])
+                else:
+                    self.fruit[game] = cell
+
+
+    def step(self):
+        """
+        Play one turn of every game that isn't over.
+
+        Returns the number of games that were played.
+        """
+        games = numpy.flatnonzero(~self.done)
+        if (len(games) == 0):
+            return 0
+
+        # Current positions and their coordinates
+        width = self.widths[games][:, None]
+        maps = self.map_idx[games][:, None]
+        prev_pac_pos = self.pac_pos[games]
+        prev_ghost_pos = self.ghost_pos[games]
+        pac_x, pac_y = prev_pac_pos % width, prev_pac_pos // width
+        ghost_x, ghost_y = prev_ghost_pos % width, prev_ghost_pos // width
+
+        # Candidate moves and their sensor values, for all games at once
+        pac_cands = self.pac_neighbor_arrays[maps, prev_pac_pos]
+        ghost_cands = self.ghost_neighbor_arrays[maps, prev_ghost_pos]
+        pac_sensors = self.sensors(games, pac_cands, pac_x, pac_y, ghost_x, ghost_y, True)
+        ghost_sensors = self.sensors(games, ghost_cands, pac_x, pac_y, ghost_x, ghost_y, False)
+
+        # Decide next moves: Pacs first, then Ghosts, each game drawing
+        # from its own generator
+        if (self.tree_eval == 'vectorized'):
+            new_pac_pos = self.decide_vectorized(games, self.pac_trees, pac_cands, pac_sensors)
+            new_ghost_pos = self.decide_vectorized(games, self.ghost_trees, ghost_cands, ghost_sensors)
+        else:
+            new_pac_pos = self.decide(games, self.pac_trees, pac_cands, pac_sensors)
+            new_ghost_pos = self.decide(games, self.ghost_trees, ghost_cands, ghost_sensors)
+
+        # Execute next moves
+        self.pac_pos[games] = new_pac_pos
+        self.ghost_pos[games] = new_ghost_pos
+        self.time[games] -= 1
+
+        # Hit or crossed paths with a ghost? Game over.
+        hit = ((new_pac_pos[:, :, None] == new_ghost_pos[:, None, :])
+               | ((new_pac_pos[:, :, None] == prev_ghost_pos[:, None, :])
+                  & (prev_pac_pos[:, :, None] == new_ghost_pos[:, None, :]))).any(axis = (1, 2))
+        self.ghost_won[games[hit]] = True
+
+        # If Pac didn't hit a ghost, check for eating pills and fruit
+        safe = games[~hit]
+        pac_cells = self.pac_pos[safe, 0]
+        ate = self.pills[safe, pac_cells]
+        if (ate.any()):
+            self.pills[safe[ate], pac_cells[ate]] = False
+            self.num_pills_eaten[safe[ate]] += 1
+            for game, pac_cell in zip(safe[ate].tolist(), pac_cells[ate].tolist()):
+                self.open_cells[game].append(pac_cell)
+                # Repair only the cells whose nearest pill was this one
+                game_state = self.game_states[game]
+                game_state.remove_pill_dist(pac_cell)
+                self.pill_dist[game, :len(game_state.pill_dist)] = game_state.pill_dist
+
+        for game, pac_cell in zip(safe.tolist(), pac_cells.tolist()):
+            self.check_fruit(game, pac_cell)
+
+        # Score update, same arithmetic as GameState.update_score
+        eaten = self.num_pills_eaten[games]
+        all_eaten = (eaten == self.orig_num_pills[games])
+        score = (((eaten * 100.0) / self.orig_num_pills[games]).astype(numpy.int64)
+                 + self.fruit_eaten[games] * self.fruit_score[games])
+        score = score + numpy.where(all_eaten,
+                                    ((self.time[games] * 100.0) / self.orig_time[games]).astype(numpy.int64),
+                                    0)
+        self.score[games] = score.astype(numpy.int64)
+
+        # Out of time, hit by a ghost, or ate all the pills? Game over.
+        self.done[games] = hit | (self.time[games] == 0) | all_eaten
+
+        return len(games)
+
+
+    def play(self):
+        """
+        Step until every game is over.
+        """
+        while (self.step() > 0):
+            pass
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import struct
+import sys
+
+import numpy
+
+sys.path.append('code')
+from gameMapInfo import GameMapInfo
+from numpyGameState import NumpyGameState
+
+
+class BinaryMapCorpus:
+    """
+    A directory of map files packed once into a single binary file, which
+    every run then memory-maps instead of parsing the map files. Processes
+    reading the same corpus share one physical copy of it.
+
+    Cells are indexed by y * width + x. File layout, all little-endian,
+    every table starting on an 8-byte boundary:
+        header:     magic, version, number of maps
+        map index:  per map, width and height (uint16), number of walls
+                    (uint32), and the file offsets (uint64) of its tables,
+                    its maze distance table (0 if not stored) and its name
+        per map:    walls:            bitmap with one bit per cell
+                    wall counts:      uint8 per cell, board edges included
+                    Pac neighbors:    int32 x 5 per cell, padded with -1
+                    Ghost neighbors:  int32 x 4 per cell, padded with -1
+                    grid neighbors:   int32 x 4 per cell, padded with -1
+                    maze distances:   optional, uint16 per pair of cells
+                    name:             uint16 length, then the map file
+                                      path in UTF-8
+    """
+
+    MAGIC = b'PMAP'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHI')
+    INDEX_DTYPE = numpy.dtype([('width', '<u2'), ('height', '<u2'), ('num_walls', '<u4'),
+                               ('tables_offset', '<u8'), ('maze_dist_offset', '<u8'),
+                               ('name_offset', '<u8')])
+    NAME_LENGTH = struct.Struct('<H')
+
+
+    def __init__(self, corpus_file_path):
+        """
+        Memory-map a binary map corpus file and read its map index.
+        """
+        self.corpus_file_path = corpus_file_path
+        self.data = numpy.memmap(corpus_file_path, dtype = numpy.uint8, mode = 'r')
+        magic, version, self.num_maps = BinaryMapCorpus.HEADER.unpack(
+            self.data[:BinaryMapCorpus.HEADER.size].tobytes())
+        if ((magic != BinaryMapCorpus.MAGIC) or (version != BinaryMapCorpus.VERSION)):
+            raise ValueError(corpus_file_path + ' is not a version ' + str(BinaryMapCorpus.VERSION)
+                             + ' binary map corpus file')
+        self.index = numpy.frombuffer(self.data, dtype = BinaryMapCorpus.INDEX_DTYPE,
+                                      count = self.num_maps,
+                                      offset = BinaryMapCorpus.align(BinaryMapCorpus.HEADER.size))
+
+
+    @staticmethod
+    def align(offset):
+        """
+        Round a file offset up to the next 8-byte boundary.
+        """
+        return (offset + 7) & ~7
+
+
+    def array(self, offset, dtype, shape):
+        """
+        Return a read-only array of the given type and shape mapped from
+        the corpus file at the given offset.
+        """
+        return numpy.frombuffer(self.data, dtype = dtype, count = int(numpy.prod(shape)),
+                                offset = int(offset)).reshape(shape)
+
+
+    def map_tables(self, map_index):
+        """
+        Return the width, height, walls ((height, width) booleans), wall
+        counts, and Pac, Ghost and grid neighbor arrays of a map.
+        """
+        entry = self.index[map_index]
+        width = int(entry['width'])
+        height = int(entry['height'])
+        num_cells = width * height
+
+        offset = int(entry['tables_offset'])
+        wall_bits = self.array(offset, numpy.uint8, ((num_cells + 7) // 8,))
+        walls = numpy.unpackbits(wall_bits, count = num_cells).astype(bool).reshape(height, width)
+        offset = BinaryMapCorpus.align(offset + len(wall_bits))
+        wall_counts = self.array(offset, numpy.uint8, (num_cells,))
+        offset = BinaryMapCorpus.align(offset + num_cells)
+        pac_neighbor_array = self.array(offset, '<i4', (num_cells, 5))
+        offset += pac_neighbor_array.nbytes
+        ghost_neighbor_array = self.array(offset, '<i4', (num_cells, 4))
+        offset += ghost_neighbor_array.nbytes
+        grid_neighbor_array = self.array(offset, '<i4', (num_cells, 4))
+
+        return (width, height, walls, wall_counts,
+                pac_neighbor_array, ghost_neighbor_array, grid_neighbor_array)
+
+
+    def maze_dist(self, map_index):
+        """
+        Return the stored maze distance table of a map, or None if the
+        corpus was packed without maze distances.
+        """
+        entry = self.index[map_index]
+        if (entry['maze_dist_offset'] == 0):
+            return None
+        num_cells = int(entry['width']) * int(entry['height'])
+        return self.array(entry['maze_dist_offset'], '<u2', (num_cells, num_cells))
+
+
+    def map_name(self, map_index):
+        """
+        Return the path of the map file a map was packed from.
+        """
+        offset = int(self.index[map_index]['name_offset'])
+        length, = BinaryMapCorpus.NAME_LENGTH.unpack(
+            self.data[offset:offset + BinaryMapCorpus.NAME_LENGTH.size].tobytes())
+        offset += BinaryMapCorpus.NAME_LENGTH.size
+        return self.data[offset:offset + length].tobytes().decode('utf-8')
+
+
+    def map_info(self, map_index):
+        """
+        Return the GameMapInfo of a map.
+        """
+        return GameMapInfo(self.map_name(map_index), map_index, corpus = self)
+
+
+    @staticmethod
+    def is_binary_map_corpus_file(file_path):
+        """
+        Return whether the given file is a binary map corpus file.
+        """
+        with open(file_path, 'rb') as reader:
+            return (reader.read(len(BinaryMapCorpus.MAGIC)) == BinaryMapCorpus.MAGIC)
+
+
+    @staticmethod
+    def map_file_paths(map_dir):
+        """
+        Return the paths of the text map files in a directory, in natural
+        order (map2.txt before map10.txt).
+        """
+        def natural_key(file_name):
+            return [int(part) if part.isdigit() else part
+                    for part in re.split(r'(\d+)', file_name)]
+
+        file_names = [file_name for file_name in os.listdir(map_dir)
+                      if file_name.endswith('.txt')]
+        return [os.path.join(map_dir, file_name)
+                for file_name in sorted(file_names, key = natural_key)]
+
+
+    @staticmethod
+    def compile(map_file_paths, corpus_file_path, with_maze_dist = False):
+        """
+        Parse the given map files and pack them into a binary map corpus
+        file, optionally with their maze distance tables.
+        """
+        def pad(chunks, size):
+            padding = BinaryMapCorpus.align(size) - size
+            if (padding > 0):
+                chunks.append(bytes(padding))
+            return size + padding
+
+        index = numpy.zeros(len(map_file_paths), dtype = BinaryMapCorpus.INDEX_DTYPE)
+        offset = BinaryMapCorpus.align(BinaryMapCorpus.align(BinaryMapCorpus.HEADER.size)
+                                       + index.nbytes)
+        chunks = []
+        for map_index, map_file_path in enumerate(map_file_paths):
+            info = GameMapInfo(map_file_path, map_index)
+            index[map_index] = (info.width, info.height, info.num_walls, offset, 0, 0)
+            for table in [numpy.packbits(info.grid.ravel() == NumpyGameState.WALL),
+                          info.wall_count_array]:
+                chunks.append(table.tobytes())
+                offset = pad(chunks, offset + table.nbytes)
+            for table in [info.pac_neighbor_array, info.ghost_neighbor_array, info.grid_neighbor_array]:
+                chunks.append(table.astype('<i4').tobytes())
+                offset += table.nbytes
+            offset = pad(chunks, offset)
+
+            if (with_maze_dist):
+                index[map_index]['maze_dist_offset'] = offset
+                maze_dist = info.build_maze_dist().astype('<u2')
+                chunks.append(maze_dist.tobytes())
+                offset = pad(chunks, offset + maze_dist.nbytes)
+
+            name = map_file_path.encode('utf-8')
+            index[map_index]['name_offset'] = offset
+            chunks.append(BinaryMapCorpus.NAME_LENGTH.pack(len(name)) + name)
+            offset = pad(chunks, offset + BinaryMapCorpus.NAME_LENGTH.size + len(name))
+
+        with open(corpus_file_path, 'wb') as writer:
+            header = BinaryMapCorpus.HEADER.pack(BinaryMapCorpus.MAGIC, BinaryMapCorpus.VERSION,
+                                                 len(map_file_paths))
+            writer.write(header)
+            writer.write(bytes(BinaryMapCorpus.align(len(header)) - len(header)))
+            writer.write(index.tobytes())
+            writer.write(bytes(BinaryMapCorpus.align(index.nbytes) - index.nbytes))
+            for chunk in chunks:
+                writer.write(chunk)
+
+
+if __name__ == '__main__':
+    # Pack every map file in a directory into a binary map corpus
+    if ((len(sys.argv) not in [3, 4]) or ((len(sys.argv) == 4) and (sys.argv[3] != 'maze'))):
+        print('use: python3 binaryMapCorpus.py mapDirectory corpusFile [maze]')
+        sys.exit(1)
+    map_file_paths = BinaryMapCorpus.map_file_paths(sys.argv[1])
+    BinaryMapCorpus.compile(map_file_paths, sys.argv[2], with_maze_dist = (len(sys.argv) == 4))
+    print('Packed', len(map_file_paths), 'maps into', sys.argv[2])
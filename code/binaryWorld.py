@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+import struct
+import sys
+
+
+class BinaryWorld:
+    """
+    A world (the record of one game) in a compact binary form, with
+    lossless conversion to and from the text world file format.
+
+    Positions are stored as cell indices (y * width + x). File layout,
+    all little-endian:
+        header:        magic, version, width, height, number of Pacs,
+                       number of Ghosts, number of turns, keyframe
+                       interval, offset of the turn index, starting time,
+                       starting score
+        start cells:   uint16 per agent, Pacs first
+        walls:         bitmap with one bit per cell
+        pills:         bitmap in the same layout
+        turn records:  flags (uint8), then a 3-bit move code per agent,
+                       then the uint16 cell of every agent whose move
+                       code is JUMP, then the uint16 fruit cell if
+                       FRUIT_SPAWNED, then either the score gained as a
+                       uint8 (time went down by one) or, if
+                       EXPLICIT_TIME_SCORE, int32 time and score
+        turn index:    a keyframe for every keyframe_interval turns: the
+                       uint32 file offset of that turn's record, and the
+                       time, score and agent cells before it
+
+    Because the records are relative to the turn before, a reader jumps
+    to the nearest keyframe and decodes forward at most
+    keyframe_interval records (see BinaryWorldReader).
+    """
+
+    MAGIC = b'PWLD'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHHBBIHIii')
+    CELL = struct.Struct('<H')
+    MAX_CELLS = 0xFFFF
+    TIME_SCORE = struct.Struct('<ii')
+    KEYFRAME_INTERVAL = 64
+
+    # Turn record flags
+    FRUIT_SPAWNED = 1
+    EXPLICIT_TIME_SCORE = 2
+
+    # Move codes: stay, up, down, right, left, or jump to a stored cell
+    STAY, UP, DOWN, RIGHT, LEFT, JUMP = range(6)
+    MOVE_BITS = 3
+
+
+    def __init__(self, width, height, start_pos, num_pacs, walls, pills,
+                 start_time, start_score):
+        """
+        start_pos lists the starting [x, y] of every Pac and then every
+        Ghost; walls and pills are sets of cell indices (y * width + x).
+        Turns are added with add_turn.
+        """
+        self.width = width
+        self.height = height
+        self.start_pos = start_pos
+        self.num_pacs = num_pacs
+        self.num_ghosts = len(start_pos) - num_pacs
+        self.walls = walls
+        self.pills = pills
+        self.start_time = start_time
+        self.start_score = start_score
+        self.turns = []  # [positions, fruit [x, y] or None, time, score] per turn
+
+
+    def add_turn(self, positions, fruit, time, score):
+        """
+        Add a turn given every agent's [x, y] (Pacs first), the [x, y] of
+        fruit spawned this turn or None, and the time and score after it.
+        """
+        self.turns.append([positions, fruit, time, score])
+
+
+    @staticmethod
+    def agent_labels(num_pacs, num_ghosts):
+        """
+        Return the world file labels of the agents, Pacs first.
+        """
+        return ['m' for _ in range(num_pacs)] + [str(i + 1) for i in range(num_ghosts)]
+
+
+    @staticmethod
+    def from_world_data(world_data):
+        """
+        Given the lines of a text world file as written by GameState,
+        return the equivalent BinaryWorld. Raises ValueError if the lines
+        don't follow that layout.
+        """
+        lines = [line.split() for line in world_data if line.strip()]
+        try:
+            width = int(lines[0][0])
+            height = int(lines[1][0])
+
+            # Starting positions come before the walls and pills
+            line_idx = 2
+            labels = []
+            start_pos = []
+            while (lines[line_idx][0] not in ('w', 'p', 't')):
+                labels.append(lines[line_idx][0])
+                start_pos.append([int(lines[line_idx][1]), int(lines[line_idx][2])])
+                line_idx += 1
+            num_pacs = labels.count('m')
+            if (labels != BinaryWorld.agent_labels(num_pacs, len(labels) - num_pacs)):
+                raise ValueError('unexpected agents ' + ' '.join(labels))
+
+            # Walls, then pills, each of which GameState writes in cell order
+            wall_cells = []
+            pill_cells = []
+            while (lines[line_idx][0] in ('w', 'p')):
+                cell = int(lines[line_idx][2]) * width + int(lines[line_idx][1])
+                if (lines[line_idx][0] == 'p'):
+                    pill_cells.append(cell)
+                elif (len(pill_cells) == 0):
+                    wall_cells.append(cell)
+                else:
+                    raise ValueError('wall after pills at ' + ' '.join(lines[line_idx]))
+                line_idx += 1
+            if ((wall_cells != sorted(set(wall_cells))) or (pill_cells != sorted(set(pill_cells)))):
+                raise ValueError('walls or pills out of order')
+
+            world = BinaryWorld(width, height, start_pos, num_pacs, set(wall_cells), set(pill_cells),
+                                int(lines[line_idx][1]), int(lines[line_idx][2]))
+            line_idx += 1
+
+            # Turns: agent positions, maybe a fruit spawn, then time and score
+            while (line_idx < len(lines)):
+                positions = []
+                for label in labels:
+                    if (lines[line_idx][0] != label):
+                        raise ValueError('expected ' + label + ' but got ' + lines[line_idx][0])
+                    positions.append([int(lines[line_idx][1]), int(lines[line_idx][2])])
+                    line_idx += 1
+                fruit = None
+                if (lines[line_idx][0] == 'f'):
+                    fruit = [int(lines[line_idx][1]), int(lines[line_idx][2])]
+                    line_idx += 1
+                if (lines[line_idx][0] != 't'):
+                    raise ValueError('expected t but got ' + lines[line_idx][0])
+                world.add_turn(positions, fruit, int(lines[line_idx][1]), int(lines[line_idx][2]))
+                line_idx += 1
+        except IndexError:
+            raise ValueError('world data ends unexpectedly')
+
+        return world
+
+
+    def to_world_data(self):
+        """
+        Return the world as the lines of a text world file, exactly as
+        GameState would have written them.
+        """
+        labels = BinaryWorld.agent_labels(self.num_pacs, self.num_ghosts)
+        world_data = [str(self.width) + '\n', str(self.height) + '\n']
+        for label, pos in zip(labels, self.start_pos):
+            world_data.append(label + ' ' + str(pos[0]) + ' ' + str(pos[1]) + '\n')
+        for prefix, cells in [('w ', self.walls), ('p ', self.pills)]:
+            for cell in sorted(cells):
+                world_data.append(prefix + str(cell % self.width) + ' ' + str(cell // self.width) + '\n')
+        world_data.append('t ' + str(self.start_time) + ' ' + str(self.start_score) + '\n')
+
+        for positions, fruit, time, score in self.turns:
+            for label, pos in zip(labels, positions):
+                world_data.append(label + ' ' + str(pos[0]) + ' ' + str(pos[1]) + '\n')
+            if (fruit is not None):
+                world_data.append('f ' + str(fruit[0]) + ' ' + str(fruit[1]) + '\n')
+            world_data.append('t ' + str(time) + ' ' + str(score) + '\n')
+
+        return world_data
+
+
+    def encode_turn(self, prev_cells, prev_time, prev_score, positions, fruit, time, score):
+        """
+        Return the binary record of one turn given the state before it.
+        """
+        width = self.width
+        flags = 0
+        moves = 0
+        jumps = b''
+        for i, pos in enumerate(positions):
+            cell = pos[1] * width + pos[0]
+            delta = cell - prev_cells[i]
+            if (delta == 0):
+                code = BinaryWorld.STAY
+            elif (delta == width):
+                code = BinaryWorld.UP
+            elif (delta == -width):
+                code = BinaryWorld.DOWN
+            elif ((delta == 1) and (pos[0] > 0)):
+                code = BinaryWorld.RIGHT
+            elif ((delta == -1) and (pos[0] < width - 1)):
+                code = BinaryWorld.LEFT
+            else:
+                code = BinaryWorld.JUMP
+                jumps += BinaryWorld.CELL.pack(cell)
+            moves |= (code << (BinaryWorld.MOVE_BITS * i))
+
+        tail = b''
+        if (fruit is not None):
+            flags |= BinaryWorld.FRUIT_SPAWNED
+            tail += BinaryWorld.CELL.pack(fruit[1] * width + fruit[0])
+        if ((time == prev_time - 1) and (0 <= score - prev_score <= 255)):
+            tail += bytes([score - prev_score])
+        else:
+            flags |= BinaryWorld.EXPLICIT_TIME_SCORE
+            tail += BinaryWorld.TIME_SCORE.pack(time, score)
+
+        num_move_bytes = (BinaryWorld.MOVE_BITS * len(positions) + 7) // 8
+        return bytes([flags]) + moves.to_bytes(num_move_bytes, 'little') + jumps + tail
+
+
+    def to_bytes(self):
+        """
+        Return the world in the binary layout described above. Raises
+        ValueError if the map has more cells than a uint16 cell can hold.
+        """
+        num_cells = self.width * self.height
+        if (num_cells > BinaryWorld.MAX_CELLS):
+            raise ValueError('map of ' + str(self.width) + 'x' + str(self.height) + ' cells is too large for '
+                             + 'a binary world (at most ' + str(BinaryWorld.MAX_CELLS) + ' cells)')
+        num_agents = self.num_pacs + self.num_ghosts
+        keyframe_struct = struct.Struct('<Iii' + 'H' * num_agents)
+
+        # Everything up to the turn records
+        cells = [pos[1] * self.width + pos[0] for pos in self.start_pos]
+        body = [struct.pack('<' + 'H' * num_agents, *cells)]
+        for cell_set in (self.walls, self.pills):
+            bitmap = bytearray((num_cells + 7) // 8)
+            for cell in cell_set:
+                bitmap[cell >> 3] |= (1 << (cell & 7))
+            body.append(bytes(bitmap))
+        offset = BinaryWorld.HEADER.size + sum([len(chunk) for chunk in body])
+
+        # Turn records, with a keyframe every KEYFRAME_INTERVAL turns
+        keyframes = []
+        time = self.start_time
+        score = self.start_score
+        for turn, (positions, fruit, new_time, new_score) in enumerate(self.turns):
+            if ((turn % BinaryWorld.KEYFRAME_INTERVAL) == 0):
+                keyframes.append(keyframe_struct.pack(offset, time, score, *cells))
+            record = self.encode_turn(cells, time, score, positions, fruit, new_time, new_score)
+            body.append(record)
+            offset += len(record)
+            cells = [pos[1] * self.width + pos[0] for pos in positions]
+            time = new_time
+            score = new_score
+        body += keyframes
+
+        header = BinaryWorld.HEADER.pack(BinaryWorld.MAGIC, BinaryWorld.VERSION,
+                                         self.width, self.height,
+                                         self.num_pacs, self.num_ghosts,
+                                         len(self.turns), BinaryWorld.KEYFRAME_INTERVAL,
+                                         offset, self.start_time, self.start_score)
+        return header + b''.join(body)
+
+
+    def write(self, file_path):
+        """
+        Write the world to a binary world file.
+        """
+        with open(file_path, 'wb') as writer:
+            writer.write(self.to_bytes())
+
+
+    @staticmethod
+    def read(file_path):
+        """
+        Read a whole binary world file and return it as a BinaryWorld.
+        """
+        reader = BinaryWorldReader(file_path)
+        world = BinaryWorld(reader.width, reader.height, reader.start_pos,
+                            reader.num_pacs, reader.walls, reader.pills,
+                            reader.start_time, reader.start_score)
+        for turn in reader.read_turns():
+            world.add_turn(*turn)
+        reader.close()
+        return world
+
+
+    @staticmethod
+    def is_binary_world_file(file_path):
+        """
+        Return whether the given file is a binary world file.
+        """
+        with open(file_path, 'rb') as reader:
+            return (reader.read(len(BinaryWorld.MAGIC)) == BinaryWorld.MAGIC)
+
+
+class BinaryWorldReader:
+    """
+    Open a binary world file and read individual turns from it, jumping
+    to the nearest keyframe instead of reading every turn before.
+    """
+    def __init__(self, file_path):
+        """
+        Read the header, the starting state, and the turn index.
+        """
+        self.file = open(file_path, 'rb')
+        magic, version, self.width, self.height, self.num_pacs, self.num_ghosts, \
+            self.num_turns, self.keyframe_interval, index_offset, \
+            self.start_time, self.start_score \
+            = BinaryWorld.HEADER.unpack(self.file.read(BinaryWorld.HEADER.size))
+        if ((magic != BinaryWorld.MAGIC) or (version != BinaryWorld.VERSION)):
+            self.file.close()
+            raise ValueError(file_path + ' is not a version ' + str(BinaryWorld.VERSION)
+                             + ' binary world file')
+
+        num_agents = self.num_pacs + self.num_ghosts
+        self.start_cells = list(struct.unpack('<' + 'H' * num_agents,
+                                              self.file.read(2 * num_agents)))
+        self.start_pos = [self.cell_pos(cell) for cell in self.start_cells]
+        num_cells = self.width * self.height
+        self.walls = self.read_bitmap(num_cells)
+        self.pills = self.read_bitmap(num_cells)
+        self.num_move_bytes = (BinaryWorld.MOVE_BITS * num_agents + 7) // 8
+
+        # Keyframes: [offset, time, score, cells] before every
+        # keyframe_interval-th turn
+        keyframe_struct = struct.Struct('<Iii' + 'H' * num_agents)
+        num_keyframes = (self.num_turns + self.keyframe_interval - 1) // self.keyframe_interval
+        self.file.seek(index_offset)
+        self.keyframes = []
+        for _ in range(num_keyframes):
+            values = keyframe_struct.unpack(self.file.read(keyframe_struct.size))
+            self.keyframes.append([values[0], values[1], values[2], list(values[3:])])
+
+
+    def cell_pos(self, cell):
+        """
+        Return the [x, y] position of a cell index.
+        """
+        return [cell % self.width, cell // self.width]
+
+
+    def read_bitmap(self, num_cells):
+        """
+        Read a cell bitmap at the current file position and return the set
+        of cells whose bits are set.
+        """
+        bitmap = self.file.read((num_cells + 7) // 8)
+        return {cell for cell in range(num_cells) if ((bitmap[cell >> 3] >> (cell & 7)) & 1)}
+
+
+    def decode_turn(self, cells, time, score):
+        """
+        Decode the turn record at the current file position given the
+        agent cells, time, and score before it. Return the cells, fruit
+        cell or -1, time, and score after it.
+        """
+        width = self.width
+        flags = self.file.read(1)[0]
+        moves = int.from_bytes(self.file.read(self.num_move_bytes), 'little')
+        new_cells = []
+        for cell in cells:
+            code = moves & ((1 << BinaryWorld.MOVE_BITS) - 1)
+            moves >>= BinaryWorld.MOVE_BITS
+            if (code == BinaryWorld.STAY):
+                new_cells.append(cell)
+            elif (code == BinaryWorld.UP):
+                new_cells.append(cell + width)
+            elif (code == BinaryWorld.DOWN):
+                new_cells.append(cell - width)
+            elif (code == BinaryWorld.RIGHT):
+                new_cells.append(cell + 1)
+            elif (code == BinaryWorld.LEFT):
+                new_cells.append(cell - 1)
+            else:
+                new_cells.append(BinaryWorld.CELL.unpack(self.file.read(2))[0])
+
+        fruit = -1
+        if (flags & BinaryWorld.FRUIT_SPAWNED):
+            fruit = BinaryWorld.CELL.unpack(self.file.read(2))[0]
+        if (flags & BinaryWorld.EXPLICIT_TIME_SCORE):
+            time, score = BinaryWorld.TIME_SCORE.unpack(self.file.read(BinaryWorld.TIME_SCORE.size))
+        else:
+            time -= 1
+            score += self.file.read(1)[0]
+        return new_cells, fruit, time, score
+
+
+    def turn_values(self, cells, fruit, time, score):
+        """
+        Convert a decoded turn into agent positions (Pacs first), spawned
+        fruit position or None, time, and score.
+        """
+        return ([self.cell_pos(cell) for cell in cells],
+                None if (fruit < 0) else self.cell_pos(fruit),
+                time, score)
+
+
+    def read_turn(self, turn):
+        """
+        Given a turn number (0-based), return that turn's agent positions
+        (Pacs first), spawned fruit position or None, time, and score.
+        """
+        offset, time, score, cells = self.keyframes[turn // self.keyframe_interval]
+        self.file.seek(offset)
+        for _ in range(turn % self.keyframe_interval + 1):
+            cells, fruit, time, score = self.decode_turn(cells, time, score)
+        return self.turn_values(cells, fruit, time, score)
+
+
+    def read_turns(self):
+        """
+        Read every turn in order, yielding the same values as read_turn.
+        """
+        if (self.num_turns == 0):
+            return
+        offset, time, score, cells = self.keyframes[0]
+        self.file.seek(offset)
+        for _ in range(self.num_turns):
+            cells, fruit, time, score = self.decode_turn(cells, time, score)
+            yield self.turn_values(cells, fruit, time, score)
+
+
+    def close(self):
+        """
+        Close the underlying file.
+        """
+        self.file.close()
+
+
+if __name__ == '__main__':
+    # Convert a world file to the other format: text to binary or
+    # binary to text, depending on what the input file is.
+    if (len(sys.argv) != 3):
+        print('use: python3 binaryWorld.py inputWorldFile outputWorldFile')
+        sys.exit(1)
+    if (BinaryWorld.is_binary_world_file(sys.argv[1])):
+        with open(sys.argv[2], 'w') as the_file:
+            for line in BinaryWorld.read(sys.argv[1]).to_world_data():
+                the_file.write(line)
+    else:
+        with open(sys.argv[1], 'r') as the_file:
+            BinaryWorld.from_world_data(the_file.readlines()).write(sys.argv[2])
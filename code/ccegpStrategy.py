@@ -1,17 +1,19 @@
 # -*- coding: utf-8 -*-
 import random
-import copy
 import traceback
 import numpy
 import sys
 
 sys.path.append('code')
 from strategy import Strategy
-from gameState import GameState
 from controllers import PacController, GhostController
 from exprTree import Node, ExprTree
 from population import Population
 from ciaoPlotter import CIAOPlotter
+from batchGameState import BatchGameState
+from flatGenome import FlatGenome
+from outcomeCache import OutcomeCache
+from treeFile import TreeFile
 
 
 class CCEGPStrategy(Strategy):
@@ -55,6 +57,14 @@ class CCEGPStrategy(Strategy):
         self.parsimony_log = None
         self.termination = 'number_of_evals'
         self.n_for_convergence = 10
+        self.batch_evals = False
+        self.genome = 'tree'
+        self.crossover_sampling = 'rejection'
+        self.outcome_cache_size = 0
+        self.outcome_cache_quantum = 0
+        self.outcome_cache = None
+        self.save_populations = False
+        self.population_file_path_root = 'data/defaultPopulations'
 
         # Parse config properties
         try:
@@ -226,6 +236,61 @@ class CCEGPStrategy(Strategy):
             except:
                 print('config: n_for_convergence not specified; using', self.n_for_convergence)
 
+        try:
+            self.batch_evals = experiment.config_parser.getboolean('ccegp_options', 'batch_evals')
+            print('config: batch_evals =', self.batch_evals)
+        except:
+            print('config: batch_evals not specified; using', self.batch_evals)
+        if (self.batch_evals and experiment.maze_sensors):
+            print('config: batch_evals does not support maze_sensors; using False')
+            self.batch_evals = False
+
+        try:
+            self.genome = experiment.config_parser.get('ccegp_options', 'genome')
+            if (self.genome not in ['tree', 'flat']):
+                raise ValueError
+            print('config: genome =', self.genome)
+        except:
+            self.genome = 'tree'
+            print('config: genome not properly specified; using', self.genome)
+
+        try:
+            self.crossover_sampling = experiment.config_parser.get('ccegp_options', 'crossover_sampling')
+            if (self.crossover_sampling not in ['rejection', 'direct']):
+                raise ValueError
+            print('config: crossover_sampling =', self.crossover_sampling)
+        except:
+            self.crossover_sampling = 'rejection'
+            print('config: crossover_sampling not properly specified; using', self.crossover_sampling)
+
+        try:
+            self.outcome_cache_size = experiment.config_parser.getint('ccegp_options',
+                                                                      'outcome_cache_size')
+            print('config: outcome_cache_size =', self.outcome_cache_size)
+        except:
+            print('config: outcome_cache_size not specified; using', self.outcome_cache_size)
+
+        try:
+            self.outcome_cache_quantum = experiment.config_parser.getfloat('ccegp_options',
+                                                                           'outcome_cache_quantum')
+            print('config: outcome_cache_quantum =', self.outcome_cache_quantum)
+        except:
+            print('config: outcome_cache_quantum not specified; using', self.outcome_cache_quantum)
+
+        try:
+            self.save_populations = experiment.config_parser.getboolean('ccegp_options', 'save_populations')
+            print('config: save_populations =', self.save_populations)
+        except:
+            print('config: save_populations not specified; using', self.save_populations)
+
+        try:
+            self.population_file_path_root = experiment.config_parser.get('ccegp_options',
+                                                                          'population_file_path_root')
+            print('config: population_file_path_root =', self.population_file_path_root)
+        except:
+            print('config: population_file_path_root not properly specified; using',
+                  self.population_file_path_root)
+
         try:
             self.ciao_file_path_root = experiment.config_parser.get('ccegp_options',
                                                                          'ciao_file_path_root')
@@ -291,6 +356,15 @@ class CCEGPStrategy(Strategy):
         if (self.termination == 'convergence'):
             experiment.log_file.write('n evals for convergence: '
                                       + str(self.n_for_convergence) + '\n')
+        experiment.log_file.write('batch evals: ' + str(self.batch_evals) + '\n')
+        experiment.log_file.write('genome: ' + self.genome + '\n')
+        experiment.log_file.write('crossover sampling: ' + self.crossover_sampling + '\n')
+        experiment.log_file.write('outcome cache size: ' + str(self.outcome_cache_size) + '\n')
+        experiment.log_file.write('outcome cache quantum: ' + str(self.outcome_cache_quantum) + '\n')
+        experiment.log_file.write('save populations: ' + str(self.save_populations) + '\n')
+        if (self.save_populations):
+            experiment.log_file.write('population file path root: '
+                                      + self.population_file_path_root + '\n')
         experiment.log_file.write('CIAO data file path root: ' + self.ciao_file_path_root + '\n')
         experiment.log_file.write('parsimony log file path: ' + self.parsimony_log_file_path + '\n')
 
@@ -349,6 +423,12 @@ class CCEGPStrategy(Strategy):
         pop.individuals = [None for _ in range(pop.ea_mu)]
 
         for i in range(pop.ea_mu):
+            if (self.genome == 'flat'):
+                grow_or_full = 'full' if (random.random() < 0.5) else 'grow'
+                pop.individuals[i] = ExprTree(FlatGenome.random_genome(
+                    ExprTree.functions, pop.terminals, 0, pop.dmax_init, grow_or_full))
+                continue
+
             root = Node()
             # Full method
             if (random.random() < 0.5):
@@ -524,17 +604,21 @@ class CCEGPStrategy(Strategy):
         """
         Given a population and a parent, return a mutated offspring
         """
+        if (self.genome == 'flat'):
+            return self.mutate_flat(pop, parent)
+
         # Start with a copy of the parent
-        offspring = copy.deepcopy(parent)
+        offspring = parent.clone()
 
         # Randomly pick a node in the expression tree
-        selected_node = offspring.root.find_nth_node(random.randint(1, offspring.root.size))
+        selected_node = offspring.node_list()[random.randint(1, offspring.root.size) - 1]
 
         # Build a new (sub)tree there. Arbitrarily choose 'grow' method and limit depth to dmax_overall.
         self.build_tree(pop, selected_node, selected_node.depth, pop.dmax_overall, 'grow')
 
-        # Reset the tree metrics we just screwed up
-        offspring.root.reset_metrics()
+        # Update the tree metrics we just screwed up: the new subtree and
+        # the path above it
+        offspring.update_metrics(selected_node, selected_node.parent, selected_node.depth)
 
         return offspring
 
@@ -543,16 +627,32 @@ class CCEGPStrategy(Strategy):
         """
         Given a population and two parents, return two recombined offspring.
         """
+        if (self.genome == 'flat'):
+            return self.recombine_flat(pop, parent1, parent2)
+
         # Start with copies of the parents
-        offspring1 = copy.deepcopy(parent1)
-        offspring2 = copy.deepcopy(parent2)
+        offspring1 = parent1.clone()
+        offspring2 = parent2.clone()
+
+        # Pick the nodes to swap straight from the pairs that fit within Dmax
+        if (self.crossover_sampling == 'direct'):
+            nodes1 = offspring1.node_list()
+            nodes2 = offspring2.node_list()
+            k1, k2 = self.sample_crossover_pair(pop, [node.depth for node in nodes1],
+                                                [node.height for node in nodes1],
+                                                [node.depth for node in nodes2],
+                                                [node.height for node in nodes2])
+            selected_node1 = nodes1[k1]
+            selected_node2 = nodes2[k2]
+            match_found = True
+        else:
+            match_found = False
 
         # Randomly pick nodes from each tree and swap them.
-        match_found = False
         while (not(match_found)):
             # Pick a node in each tree
-            selected_node1 = offspring1.root.find_nth_node(random.randint(1, offspring1.root.size))
-            selected_node2 = offspring2.root.find_nth_node(random.randint(1, offspring2.root.size))
+            selected_node1 = offspring1.node_list()[random.randint(1, offspring1.root.size) - 1]
+            selected_node2 = offspring2.node_list()[random.randint(1, offspring2.root.size) - 1]
 
             # If the swap would cause either offspring to exceed Dmax,
             # try again.
@@ -560,20 +660,111 @@ class CCEGPStrategy(Strategy):
                 or ((selected_node2.depth + selected_node1.height) > pop.dmax_overall)):
                 continue
 
-            # Match found -- make swap
-            temp_node = Node()
-            temp_node.copy(selected_node1)
-            selected_node1.copy(selected_node2)
-            selected_node2.copy(temp_node)
+            # Match found
             match_found = True
 
-        # Reset the tree metrics we just screwed up
-        offspring1.root.reset_metrics()
-        offspring2.root.reset_metrics()
+        # Make swap, remembering where each node sits
+        attach1, depth1 = selected_node1.parent, selected_node1.depth
+        attach2, depth2 = selected_node2.parent, selected_node2.depth
+        temp_node = Node()
+        temp_node.copy(selected_node1)
+        selected_node1.copy(selected_node2)
+        selected_node2.copy(temp_node)
+
+        # Update the tree metrics we just screwed up: the swapped subtrees
+        # and the paths above them
+        offspring1.update_metrics(selected_node1, attach1, depth1)
+        offspring2.update_metrics(selected_node2, attach2, depth2)
 
         return [offspring1, offspring2]
 
 
+    def mutate_flat(self, pop, parent):
+        """
+        mutate for flat genomes: splice a new 'grow' subtree over a
+        randomly picked node's slice of the parent's arrays. Nodes are
+        picked as mutate picks them from a tree, so a run plays the same
+        with either genome.
+        """
+        genome = parent.root
+        k = genome.breadth_first_order()[random.randint(1, genome.size) - 1]
+        subtree = FlatGenome.random_genome(ExprTree.functions, pop.terminals,
+                                           genome.node_depths()[k], pop.dmax_overall, 'grow')
+        return ExprTree(genome.replace_subtree(k, subtree, 0))
+
+
+    def recombine_flat(self, pop, parent1, parent2):
+        """
+        recombine for flat genomes: swap the slices of a randomly picked
+        node in each parent, under the same Dmax limit. Nodes are picked
+        as recombine picks them from trees, so a run plays the same with
+        either genome.
+        """
+        genome1 = parent1.root
+        genome2 = parent2.root
+        order1 = genome1.breadth_first_order()
+        order2 = genome2.breadth_first_order()
+        depths1 = genome1.node_depths()
+        depths2 = genome2.node_depths()
+        heights1 = genome1.subtree_heights()
+        heights2 = genome2.subtree_heights()
+
+        # Pick the nodes to swap straight from the pairs that fit within Dmax
+        if (self.crossover_sampling == 'direct'):
+            n1, n2 = self.sample_crossover_pair(pop, [depths1[k] for k in order1],
+                                                [heights1[k] for k in order1],
+                                                [depths2[k] for k in order2],
+                                                [heights2[k] for k in order2])
+            k1 = order1[n1]
+            k2 = order2[n2]
+            match_found = True
+        else:
+            match_found = False
+
+        # Randomly pick nodes from each tree until the swap fits within Dmax
+        while (not(match_found)):
+            k1 = order1[random.randint(1, genome1.size) - 1]
+            k2 = order2[random.randint(1, genome2.size) - 1]
+            if (((depths1[k1] + heights2[k2]) > pop.dmax_overall)
+                or ((depths2[k2] + heights1[k1]) > pop.dmax_overall)):
+                continue
+            match_found = True
+
+        return [ExprTree(genome1.replace_subtree(k1, genome2, k2)),
+                ExprTree(genome2.replace_subtree(k2, genome1, k1))]
+
+
+    def sample_crossover_pair(self, pop, depths1, heights1, depths2, heights2):
+        """
+        Given the depth and height of every node of two trees, return the
+        indices of a pair of nodes, one in each tree, whose swap keeps both
+        trees within Dmax. The pair is picked uniformly among all such
+        pairs, as picking pairs at random until one fits does, but without
+        the retries.
+        """
+        dmax = pop.dmax_overall
+
+        # fits[a + 1][b + 1]: number of nodes of tree 2 with depth <= a
+        # and height <= b
+        fits = numpy.zeros((dmax + 2, dmax + 2), dtype = numpy.int64)
+        for depth, height in zip(depths2, heights2):
+            if ((depth <= dmax) and (height <= dmax)):
+                fits[depth + 1][height + 1] += 1
+        fits = fits.cumsum(axis = 0).cumsum(axis = 1)
+
+        # Pick the node of tree 1 weighted by the number of nodes it can
+        # swap with, then one of those nodes
+        weights = [fits[max(dmax - height, -1) + 1][max(dmax - depth, -1) + 1]
+                   for depth, height in zip(depths1, heights1)]
+        if (sum(weights) == 0):
+            # Nothing fits (trees started out deeper than Dmax): swap roots
+            return 0, 0
+        k1 = random.choices(range(len(weights)), weights = weights)[0]
+        matches = [k2 for k2 in range(len(depths2))
+                   if (((depths1[k1] + heights2[k2]) <= dmax) and ((depths2[k2] + heights1[k1]) <= dmax))]
+        return k1, random.choice(matches)
+
+
     def recombine_mutate(self, pop, parents):
         """
         Given a population and a set of parents, return a set of offspring
@@ -616,56 +807,143 @@ class CCEGPStrategy(Strategy):
             exit(1)
 
 
-    def execute_one_game(self, pac_individual, ghost_individual):
+    def execute_one_game(self, pac_individual, ghost_individual, exhibition = False):
         """
         Execute one game / eval of a run given a Pac individual and
         Ghost individual selected from their respective populations.
+        The exhibition game's replay becomes the run's best world.
         """
-        # Pick a new map and set up a new game state.
-        game_map = self.experiment.pre_loaded_maps[random.randint(0, 99)]
-        self.experiment.world_data = []
-        game_state = GameState(game_map,
-                               self.experiment.pill_density,
-                               self.experiment.time_multiplier,
-                               self.experiment.fruit_spawning_probability,
-                               self.experiment.fruit_score,
-                               self.experiment.num_pacs,
-                               self.experiment.num_ghosts)
-        game_state.write_world_config(self.experiment.world_data)
-        game_state.write_world_time_score(self.experiment.world_data)
+        # Reuse the outcome if this exact game has been played already.
+        # With outcome_cache_quantum > 0 the game found may be one of
+        # trees whose constants only round the same, so its replay isn't
+        # of these trees: the exhibition game is then always played, and
+        # other games take the outcome without the replay.
+        seed = self.experiment.next_game_seed()
+        key = self.outcome_key(pac_individual, ghost_individual, seed)
+        exact = (self.outcome_cache_quantum == 0)
+        outcome = None
+        if ((key is not None) and (exact or (not exhibition))):
+            # (Batched games don't record replays, which the exhibition game needs.)
+            outcome = self.outcome_cache.get(key, need_replay = exact)
+        if (outcome is not None):
+            self.experiment.replay = outcome[4] if (exact) else None
+            self.set_game_fitnesses(pac_individual, ghost_individual, *outcome[:4])
+            return
+
+        # Set up a new game state on a map picked with the game's own seed.
+        game_state = self.experiment.new_game_state(seed = seed)
 
         # Create new Pac and Ghost controllers
         for curr_pac_id in range(self.experiment.num_pacs):
-            self.pac_controllers[curr_pac_id] = PacController(curr_pac_id, pac_individual)
+            self.pac_controllers[curr_pac_id] = PacController(curr_pac_id, pac_individual,
+                                                              self.experiment.tree_eval)
         for curr_ghost_id in range(self.experiment.num_ghosts):
             self.ghost_controllers[curr_ghost_id] = GhostController(curr_ghost_id,
-                                                                    ghost_individual)
+                                                                    ghost_individual,
+                                                                    self.experiment.tree_eval)
 
         # While the game isn't over, play game turns.
         game_over = False
         while (not game_over):
-            game_over = game_state.play_turn(self.experiment.world_data,
-                                             self.pac_controllers,
+            game_over = game_state.play_turn(self.pac_controllers,
                                              self.ghost_controllers)
+        self.experiment.replay = game_state.get_replay()
+        if (key is not None):
+            self.outcome_cache.put(key, [game_state.score, game_state.time, game_state.orig_time,
+                                         game_state.ghost_won, self.experiment.replay])
+
+        self.set_game_fitnesses(pac_individual, ghost_individual, game_state.score,
+                                game_state.time, game_state.orig_time, game_state.ghost_won)
+
 
+    def outcome_key(self, pac_individual, ghost_individual, seed):
+        """
+        Return the outcome cache key of a game, or None if its outcome
+        isn't to be cached: the cache is off, or every game has its own
+        seed (no game_seed_pool_size), so no game comes up twice. Seeded
+        games draw RAND from their own generators, so trees using RAND
+        play the same way every time too.
+        """
+        if ((self.outcome_cache is None) or (self.experiment.game_seed_pool_size == 0)):
+            return None
+        return (pac_individual.canonical_hash(self.outcome_cache_quantum),
+                ghost_individual.canonical_hash(self.outcome_cache_quantum), seed)
+
+
+    def execute_game_batch(self, pairings):
+        """
+        Execute a batch of games / evals given a list of [Pac individual,
+        Ghost individual] pairings, stepping all games together.
+
+        Returns a list of [score, time, orig_time, ghost_won] per game,
+        in pairing order. No world data is recorded.
+        """
+        # Look up each game's outcome; only the games not played already
+        # (and not repeated earlier in this batch) are batched.
+        seeds = [self.experiment.next_game_seed() for _ in pairings]
+        keys = [self.outcome_key(pac_individual, ghost_individual, seed)
+                for (pac_individual, ghost_individual), seed in zip(pairings, seeds)]
+        results = [None for _ in pairings]
+        to_play = []
+        played_by_key = {}
+        for i in range(len(pairings)):
+            if (keys[i] in played_by_key):
+                # Counts as a hit: by the time it's looked up the game
+                # would have been played and cached, were it played alone
+                self.outcome_cache.hits += 1
+                continue
+            if (keys[i] is not None):
+                results[i] = self.outcome_cache.get(keys[i])
+            if (results[i] is None):
+                to_play.append(i)
+                if (keys[i] is not None):
+                    played_by_key[keys[i]] = i
+        if (len(to_play) == 0):
+            return [result[:4] for result in results]
+
+        # Set up a game state for each game, each with its own seed and map.
+        game_states = [self.experiment.new_game_state(seed = seeds[i]) for i in to_play]
+
+        batch = BatchGameState(game_states,
+                               [pairings[i][0] for i in to_play],
+                               [pairings[i][1] for i in to_play],
+                               self.experiment.tree_eval)
+        batch.play()
+
+        for j, i in enumerate(to_play):
+            results[i] = [int(batch.score[j]), int(batch.time[j]), int(batch.orig_time[j]),
+                          bool(batch.ghost_won[j]), None]
+            if (keys[i] is not None):
+                self.outcome_cache.put(keys[i], results[i])
+        for i in range(len(pairings)):
+            if (results[i] is None):
+                results[i] = results[played_by_key[keys[i]]]
+        return [result[:4] for result in results]
+
+
+    def set_game_fitnesses(self, pac_individual, ghost_individual, score, time, orig_time, ghost_won):
+        """
+        Given a Pac individual and Ghost individual and the outcome of the
+        game they played, set their fitnesses and scores.
+        """
         # Set Pac fitness and implement parsimony pressure
-        pac_individual.fitness = game_state.score
+        pac_individual.fitness = score
         if (self.pac_pop.parsimony_technique == 'size'):
             pac_individual.fitness -= (self.pac_pop.pppc * pac_individual.root.size)
         else:
             pac_individual.fitness -= (self.pac_pop.pppc * pac_individual.root.height)
 
         # Set Ghost fitness and implement parsimony pressure
-        ghost_individual.fitness = -(game_state.score)
-        if (game_state.ghost_won):
-            ghost_individual.fitness += int((game_state.time * 100.0) / game_state.orig_time)
+        ghost_individual.fitness = -(score)
+        if (ghost_won):
+            ghost_individual.fitness += int((time * 100.0) / orig_time)
         if (self.ghost_pop.parsimony_technique == 'size'):
             ghost_individual.fitness -= (self.ghost_pop.pppc * ghost_individual.root.size)
         else:
             ghost_individual.fitness -= (self.ghost_pop.pppc * ghost_individual.root.height)
 
         # Set Pac and Ghost scores
-        pac_individual.score = game_state.score # Score is raw game score without parsimony pressure for Pac
+        pac_individual.score = score # Score is raw game score without parsimony pressure for Pac
         ghost_individual.score = ghost_individual.fitness # Score and fitness interchangeable for Ghost
 
 
@@ -687,14 +965,20 @@ class CCEGPStrategy(Strategy):
         random.shuffle(pacs)
         random.shuffle(ghosts)
         num_games = max(len(pacs), len(ghosts))
+        # If num pacs < num ghosts, some pacs will go multiple times.
+        # If num ghosts < num pacs, some ghosts will go multiple times.
+        pairings = [[pacs[curr_game % len(pacs)], ghosts[curr_game % len(ghosts)]]
+                    for curr_game in range(num_games)]
+        if (self.batch_evals):
+            results = self.execute_game_batch(pairings)
         for curr_game in range(num_games):
-            # If num pacs < num ghosts, some pacs will go multiple times
             pac_index = curr_game % len(pacs)
-            # If num ghosts < num pacs, some ghosts will go multiple times
             ghost_index = curr_game % len(ghosts)
-            pac_individual = pacs[pac_index]
-            ghost_individual = ghosts[ghost_index]
-            self.execute_one_game(pac_individual, ghost_individual)
+            pac_individual, ghost_individual = pairings[curr_game]
+            if (self.batch_evals):
+                self.set_game_fitnesses(pac_individual, ghost_individual, *results[curr_game])
+            else:
+                self.execute_one_game(pac_individual, ghost_individual)
             # Save the fitness in a list so we can average the results later
             pac_fitnesses[pac_index].append(pac_individual.fitness)
             ghost_fitnesses[ghost_index].append(ghost_individual.fitness)
@@ -765,10 +1049,20 @@ class CCEGPStrategy(Strategy):
         fitnesses = numpy.zeros((num_gens, num_gens))
         eval_count = 0
         print('CIAO: play', num_gens, 'generations of bests')
+        if (self.batch_evals):
+            results = self.execute_game_batch([[self.pac_pop.best_individuals[pac],
+                                                self.ghost_pop.best_individuals[ghost]]
+                                               for ghost in range(num_gens)
+                                               for pac in range(ghost, num_gens)])
         for ghost in range(num_gens):
             for pac in range(ghost, num_gens):
-                self.execute_one_game(self.pac_pop.best_individuals[pac],
-                                      self.ghost_pop.best_individuals[ghost])
+                if (self.batch_evals):
+                    self.set_game_fitnesses(self.pac_pop.best_individuals[pac],
+                                            self.ghost_pop.best_individuals[ghost],
+                                            *results[eval_count])
+                else:
+                    self.execute_one_game(self.pac_pop.best_individuals[pac],
+                                          self.ghost_pop.best_individuals[ghost])
                 eval_count += 1
                 # 0,0 is lower left, so adjust the row index
                 fitnesses[num_gens - pac - 1][ghost] = self.pac_pop.best_individuals[pac].fitness
@@ -813,8 +1107,21 @@ class CCEGPStrategy(Strategy):
         self.pac_pop.reset_run_values()
         self.ghost_pop.reset_run_values()
 
+        # Outcomes are cached per run
+        if (self.outcome_cache_size > 0):
+            self.outcome_cache = OutcomeCache(self.outcome_cache_size)
+
         self.parsimony_log.write('\nRun ' + str(self.experiment.curr_run) + '\n')
 
+        # Populations are saved every generation to one file per population
+        population_files = []
+        if (self.save_populations):
+            for pop in [self.pac_pop, self.ghost_pop]:
+                population_files.append(open(self.population_file_path_root + '_Run'
+                                             + str(self.experiment.curr_run) + '_'
+                                             + pop.pop_name + '.pop', 'wb'))
+                TreeFile.write_header(population_files[-1])
+
         generation = 1
         print('\rGeneration', generation, end = ' ')
 
@@ -834,6 +1141,8 @@ class CCEGPStrategy(Strategy):
             self.pac_pop.generation_bookkeeping()
             self.pac_pop.update_logs(eval_count, self.experiment.log_file, self.parsimony_log)
             self.ghost_pop.generation_bookkeeping()
+            for pop, population_file in zip([self.pac_pop, self.ghost_pop], population_files):
+                TreeFile.write_population(population_file, generation, pop.individuals)
 
             # Update run bookkeeping
             self.pac_pop.calc_run_stats()
@@ -877,17 +1186,25 @@ class CCEGPStrategy(Strategy):
             self.ghost_pop.individuals = self.select_survivors(self.ghost_pop)
 
 
+        for population_file in population_files:
+            population_file.close()
+
         # Do CIAO plot here
         self.ciao_plot()
 
         # Play "exhibition game" to get best world data (does not count against Eval total).
-        # This has a side effect of setting self.experiment.world_data
+        # This has a side effect of setting self.experiment.replay
         print('Exhibition game: Pac', self.pac_pop.run_best_individual.fitness,
               'vs Ghost', self.ghost_pop.run_best_individual.fitness)
         self.execute_one_game(self.pac_pop.run_best_individual,
-                              self.ghost_pop.run_best_individual)
+                              self.ghost_pop.run_best_individual, exhibition = True)
+
+        # Report how well the outcome cache did
+        if (self.outcome_cache is not None):
+            print(self.outcome_cache.cache_stats())
+            self.experiment.log_file.write('\n' + self.outcome_cache.cache_stats() + '\n')
 
-        return self.pac_pop.run_high_fitness, self.experiment.world_data, \
+        return self.pac_pop.run_high_fitness, self.experiment.replay, \
             str(self.pac_pop.run_best_individual.root), \
             self.ghost_pop.run_high_fitness, str(self.ghost_pop.run_best_individual.root)
 
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-import random
+import numpy
 import sys
 
 sys.path.append('code')
@@ -9,13 +9,22 @@ class PacController():
     """
     Pac-Man controller
     """
-    def __init__(self, pac_id, tree):
+    def __init__(self, pac_id, tree, tree_eval = 'compiled'):
         """
         Initialization requires the expression tree asociated with this controller.
+
+        tree_eval is how the tree is evaluated: 'compiled' (one call of the
+        compiled tree per possible move) or 'vectorized' (all possible
+        moves at once, see ExprTree.evaluate).
         """
         self.pac_id = pac_id
         self.tree = tree
+        self.tree_eval = tree_eval
         self.next_move = None
+        # Same board, same move -- unless the tree draws random numbers
+        self.deterministic = not tree.uses_rand()
+        # Sensors the tree uses; the others aren't computed
+        self.sensor_mask = tree.sensor_mask()
 
 
     def decide_move(self, game_state):
@@ -25,21 +34,48 @@ class PacController():
         """
         # Get all possible moves
         valid_pos = game_state.get_valid_positions(game_state.pacs_pos[self.pac_id], 'pac')
-        # Get the value of the expression tree for each possible move.
+        # Get the value of the expression tree for each possible move,
+        # one compiled call per move or all moves at once.
         # Feed the calculator the values of G, P, W, F, M instead of
         # recalculating those values each time we hit them in the tree.
-        valid_pos_vals = [ self.tree.root.calc([game_state.G(pos),
-                                                game_state.P(pos),
-                                                game_state.W(pos),
-                                                game_state.F(pos),
-                                                game_state.M(pos, pac_id = self.pac_id)]) \
-                          for pos in valid_pos ]
-        # Find the index of the highest-valued move
-        new_pos_idx = valid_pos_vals.index(max(valid_pos_vals))
+        # G and M come from the distances shared by all controllers this turn.
+        if (self.tree_eval == 'vectorized'):
+            valid_pos_vals = self.tree.evaluate([ self.sensor_values(game_state, pos) \
+                                                  for pos in valid_pos ],
+                                                game_state.agent_generator)
+            # Find the index of the highest-valued move
+            new_pos_idx = int(numpy.argmax(valid_pos_vals))
+        else:
+            tree_function = self.tree.compile()
+            valid_pos_vals = [ tree_function(self.sensor_values(game_state, pos),
+                                             game_state.agent_rng) \
+                              for pos in valid_pos ]
+            # Find the index of the highest-valued move
+            new_pos_idx = valid_pos_vals.index(max(valid_pos_vals))
         # Set the next move
         self.next_move = valid_pos[new_pos_idx]
 
 
+    def sensor_values(self, game_state, pos):
+        """
+        Return the values of G, P, W, F, M for a possible move, followed
+        by their maze-distance variants if the game has maze distances.
+        Sensors the tree doesn't use (see ExprTree.sensor_mask) are 0.
+        """
+        mask = self.sensor_mask
+        gpwfm = [game_state.turn_G(pos) if (mask & 1) else 0,
+                 game_state.P(pos) if (mask & 2) else 0,
+                 game_state.W(pos) if (mask & 4) else 0,
+                 game_state.F(pos) if (mask & 8) else 0,
+                 game_state.turn_M(pos, pac_id = self.pac_id) if (mask & 16) else 0]
+        if (game_state.maze_dist is not None):
+            gpwfm += [game_state.G_maze(pos) if (mask & 32) else 0,
+                      game_state.P_maze(pos) if (mask & 64) else 0,
+                      game_state.F_maze(pos) if (mask & 128) else 0,
+                      game_state.M_maze(pos, pac_id = self.pac_id) if (mask & 256) else 0]
+        return gpwfm
+
+
     def execute_move(self, game_state):
         """
         Actually execute the stored move
@@ -51,14 +87,21 @@ class GhostController():
     """
     Ghost controller
     """
-    def __init__(self, ghost_id, tree):
+    def __init__(self, ghost_id, tree, tree_eval = 'compiled'):
         """
         Use instances of the same class for each ghost -- need to know
         which ghost this class instance is for.
+
+        tree_eval is how the tree is evaluated, as for PacController.
         """
         self.ghost_id = ghost_id
         self.tree = tree
+        self.tree_eval = tree_eval
         self.next_move = None
+        # Same board, same move -- unless the tree draws random numbers
+        self.deterministic = not tree.uses_rand()
+        # Sensors the tree uses; the others aren't computed
+        self.sensor_mask = tree.sensor_mask()
 
 
     def decide_move(self, game_state):
@@ -68,21 +111,48 @@ class GhostController():
         # Get all possible moves
         valid_pos = game_state.get_valid_positions(game_state.ghosts_pos[self.ghost_id],
                                                    'ghost')
-        # Get the value of the expression tree for each possible move.
+        # Get the value of the expression tree for each possible move,
+        # one compiled call per move or all moves at once.
         # Feed the calculator the values of G, P, W, F, M instead of
         # recalculating those values each time we hit them in the tree.
-        valid_pos_vals = [ self.tree.root.calc([game_state.G(pos, ghost_id = self.ghost_id),
-                                                game_state.P(pos),
-                                                game_state.W(pos),
-                                                game_state.F(pos),
-                                                game_state.M(pos)]) \
-                          for pos in valid_pos ]
-        # Find the index of the highest-valued move
-        new_pos_idx = valid_pos_vals.index(max(valid_pos_vals))
+        # G and M come from the distances shared by all controllers this turn.
+        if (self.tree_eval == 'vectorized'):
+            valid_pos_vals = self.tree.evaluate([ self.sensor_values(game_state, pos) \
+                                                  for pos in valid_pos ],
+                                                game_state.agent_generator)
+            # Find the index of the highest-valued move
+            new_pos_idx = int(numpy.argmax(valid_pos_vals))
+        else:
+            tree_function = self.tree.compile()
+            valid_pos_vals = [ tree_function(self.sensor_values(game_state, pos),
+                                             game_state.agent_rng) \
+                              for pos in valid_pos ]
+            # Find the index of the highest-valued move
+            new_pos_idx = valid_pos_vals.index(max(valid_pos_vals))
         # Set the next move
         self.next_move = valid_pos[new_pos_idx]
 
 
+    def sensor_values(self, game_state, pos):
+        """
+        Return the values of G, P, W, F, M for a possible move, followed
+        by their maze-distance variants if the game has maze distances.
+        Sensors the tree doesn't use (see ExprTree.sensor_mask) are 0.
+        """
+        mask = self.sensor_mask
+        gpwfm = [game_state.turn_G(pos, ghost_id = self.ghost_id) if (mask & 1) else 0,
+                 game_state.P(pos) if (mask & 2) else 0,
+                 game_state.W(pos) if (mask & 4) else 0,
+                 game_state.F(pos) if (mask & 8) else 0,
+                 game_state.turn_M(pos) if (mask & 16) else 0]
+        if (game_state.maze_dist is not None):
+            gpwfm += [game_state.G_maze(pos, ghost_id = self.ghost_id) if (mask & 32) else 0,
+                      game_state.P_maze(pos) if (mask & 64) else 0,
+                      game_state.F_maze(pos) if (mask & 128) else 0,
+                      game_state.M_maze(pos) if (mask & 256) else 0]
+        return gpwfm
+
+
     def execute_move(self, game_state):
         """
         Actually execute the stored move
@@ -102,6 +172,7 @@ class RandomGhostController():
         """
         self.ghost_id = ghost_id
         self.next_move = None
+        self.deterministic = False
 
 
     def decide_move(self, game_state):
@@ -113,7 +184,7 @@ class RandomGhostController():
 
         # Get a list of valid new positions and pick one randomly
         valid_pos = game_state.get_valid_positions(pos, 'ghost')
-        new_pos_idx = random.randint(0, len(valid_pos) - 1)
+        new_pos_idx = game_state.agent_rng.randint(0, len(valid_pos) - 1)
         self.next_move = valid_pos[new_pos_idx]
 
 
@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
 import configparser
+import numpy
 import random
 import time
 import traceback
 import sys
 
 sys.path.append('code')
-from gameMapInfo import GameMapInfo
+from mapCorpus import MapCorpus
+from binaryWorld import BinaryWorld
+from gameState import GameState
+from numpyGameState import NumpyGameState
+from exprTree import ExprTree
 from randomStrategy import RandomStrategy
 from hillClimbStrategy import HillClimbStrategy
 from gpStrategy import GPStrategy
@@ -35,25 +40,34 @@ class Experiment:
         self.pac_solution_file_path = 'solutions/defaultPacSolution.txt'
         self.ghost_solution_file_path = 'solutions/defaultGhostSolution.txt'
         self.high_score_world_file_path = 'worlds/defaultWorld.txt'
+        self.world_file_format = 'text'
         self.map_file_path = None
+        self.map_corpus_path = 'maps'
+        self.map_cache_size = 1000
 
-        self.world_data = None  # Array of strings that will be written to world data file
+        self.replay = None  # Replay of the last game, regenerated into a world file if it's the best
         self.game_map = None
         self.pill_density = 0.5
         self.fruit_spawning_probability = 0.5
         self.fruit_score = 10
         self.time_multiplier = 1
+        self.engine = 'list'
+        self.maze_sensors = False
+        self.fast_forward = False
+        self.tree_eval = 'compiled'
+        self.game_seed_pool_size = 0
 
         self.num_pacs = 1
         self.num_ghosts = 3
 
         self.pac_exp_high_fitness = float('-inf')
-        self.pac_exp_best_world_data = None
+        self.pac_exp_best_replay = None
         self.pac_exp_best_solution = None
         self.ghost_exp_high_fitness = float('-inf')
         self.ghost_exp_best_solution = None
 
-        self.pre_loaded_maps = []
+        self.map_corpus = None
+        self.num_games = 0  # games set up so far, numbering their seeds
 
         try:
             self.config_parser = configparser.ConfigParser()
@@ -99,6 +113,24 @@ class Experiment:
             except:
                 print('config: high_score_world_file_path not properly specified; using', self.high_score_world_file_path)
 
+            try:
+                self.world_file_format = self.config_parser.get('basic_options', 'world_file_format').lower()
+                print('config: world_file_format =', self.world_file_format)
+            except:
+                print('config: world_file_format not properly specified; using', self.world_file_format)
+
+            try:
+                self.map_corpus_path = self.config_parser.get('basic_options', 'map_corpus_path')
+                print('config: map_corpus_path =', self.map_corpus_path)
+            except:
+                print('config: map_corpus_path not properly specified; using', self.map_corpus_path)
+
+            try:
+                self.map_cache_size = self.config_parser.getint('basic_options', 'map_cache_size')
+                print('config: map_cache_size =', self.map_cache_size)
+            except:
+                print('config: map_cache_size not properly specified; using', self.map_cache_size)
+
             try:
                 self.pac_solution_file_path = self.config_parser.get('basic_options', 'pac_solution_file_path')
                 print('config: pac_solution_file_path =', self.pac_solution_file_path)
@@ -135,6 +167,44 @@ class Experiment:
             except:
                 print('config: time_multiplier not properly specified; using', self.time_multiplier)
 
+            try:
+                self.engine = self.config_parser.get('basic_options', 'engine').lower()
+                print('config: engine =', self.engine)
+            except:
+                print('config: engine not properly specified; using', self.engine)
+
+            try:
+                self.fast_forward = self.config_parser.getboolean('basic_options', 'fast_forward')
+                print('config: fast_forward =', self.fast_forward)
+            except:
+                print('config: fast_forward not specified; using', self.fast_forward)
+
+            try:
+                tree_eval = self.config_parser.get('basic_options', 'tree_eval').lower()
+                if (tree_eval not in ['compiled', 'vectorized']):
+                    raise ValueError(tree_eval)
+                self.tree_eval = tree_eval
+                print('config: tree_eval =', self.tree_eval)
+            except:
+                print('config: tree_eval not properly specified; using', self.tree_eval)
+
+            try:
+                self.maze_sensors = self.config_parser.getboolean('basic_options', 'maze_sensors')
+                print('config: maze_sensors =', self.maze_sensors)
+            except:
+                print('config: maze_sensors not specified; using', self.maze_sensors)
+
+            try:
+                self.game_seed_pool_size = self.config_parser.getint('basic_options',
+                                                                     'game_seed_pool_size')
+                if (self.game_seed_pool_size < 0):
+                    raise ValueError(self.game_seed_pool_size)
+                print('config: game_seed_pool_size =', self.game_seed_pool_size)
+            except:
+                self.game_seed_pool_size = 0
+                print('config: game_seed_pool_size not properly specified; using',
+                      self.game_seed_pool_size)
+
             # Dump parms to log file
             try:
                 self.log_file = open(self.log_file_path, 'w')
@@ -154,6 +224,12 @@ class Experiment:
                                     + self.ghost_solution_file_path + '\n')
                 self.log_file.write('highest-scoring world file path: '
                                     + self.high_score_world_file_path + '\n')
+                self.log_file.write('world file format: '
+                                    + self.world_file_format + '\n')
+                self.log_file.write('map corpus path: '
+                                    + self.map_corpus_path + '\n')
+                self.log_file.write('map cache size: '
+                                    + str(self.map_cache_size) + '\n')
                 self.log_file.write('pill density: '
                                     + str(self.pill_density) + '\n')
                 self.log_file.write('fruit spawning probability: '
@@ -162,6 +238,16 @@ class Experiment:
                                     + str(self.fruit_score) + '\n')
                 self.log_file.write('time multiplier: '
                                     + str(self.time_multiplier) + '\n')
+                self.log_file.write('engine: '
+                                    + self.engine + '\n')
+                self.log_file.write('fast forward: '
+                                    + str(self.fast_forward) + '\n')
+                self.log_file.write('tree evaluation: '
+                                    + self.tree_eval + '\n')
+                self.log_file.write('maze sensors: '
+                                    + str(self.maze_sensors) + '\n')
+                self.log_file.write('game seed pool size: '
+                                    + str(self.game_seed_pool_size) + '\n')
 
             except:
                 print('config: problem with log file', self.log_file_path)
@@ -173,12 +259,109 @@ class Experiment:
             return None
 
 
-    def pre_load_maps(self):
+    def load_map_corpus(self):
         """
-        Pre-load all the possible game maps.
+        Find the maps of the configured map corpus. They are loaded
+        (along with their maze distance tables if the maze sensors are in
+        use) as games need them.
         """
-        for i in range(100):
-            self.pre_loaded_maps.append(GameMapInfo('maps/map' + str(i) + '.txt'))
+        try:
+            self.map_corpus = MapCorpus(self.map_corpus_path, self.map_cache_size, self.maze_sensors)
+        except (OSError, ValueError) as error:
+            print('Could not open map corpus:', error)
+            sys.exit(1)
+        if (self.map_corpus.num_maps == 0):
+            print('No maps found in map corpus', self.map_corpus_path)
+            sys.exit(1)
+
+        if (self.maze_sensors):
+            ExprTree.use_maze_terminals()
+
+
+    def next_game_seed(self):
+        """
+        Return the seed of the next game, derived SeedSequence-style from
+        the experiment's random seed and the game's number. A game can be
+        re-run from just those two, in any process and in any order.
+        SeedSequence only takes non-negative entropy, so a negative random
+        seed is taken as its 64-bit two's complement.
+
+        With a game seed pool, games cycle through that many seeds instead,
+        so the same games come up again (and can be cached, see
+        OutcomeCache).
+        """
+        game_number = self.num_games
+        if (self.game_seed_pool_size > 0):
+            game_number %= self.game_seed_pool_size
+        seed = numpy.random.SeedSequence([self.random_seed & 0xFFFFFFFFFFFFFFFF, game_number]) \
+            .generate_state(1, numpy.uint64)[0]
+        self.num_games += 1
+        return int(seed)
+
+
+    def new_game_state(self, game_map = None, seed = None):
+        """
+        Set up a new game state using the configured engine.
+
+        Every game gets its own seed (the next game seed unless given),
+        and all of its random numbers, including the choice of map (unless
+        given), come from generators seeded with it. So a game plays out
+        the same no matter which games were played before it, and it can
+        be replayed from its moves.
+        """
+        if (seed is None):
+            seed = self.next_game_seed()
+        if (game_map is None):
+            game_map = self.map_corpus.random_map(GameState.game_rngs(seed)[0])
+
+        if (self.engine == 'numpy'):
+            game_state_class = NumpyGameState
+        elif (self.engine == 'list'):
+            game_state_class = GameState
+        else:
+            print('engine unknown:', self.engine)
+            sys.exit(1)
+
+        return game_state_class(game_map,
+                                self.pill_density,
+                                self.time_multiplier,
+                                self.fruit_spawning_probability,
+                                self.fruit_score,
+                                self.num_pacs,
+                                self.num_ghosts,
+                                seed,
+                                self.fast_forward)
+
+
+    def replay_to_world_data(self, replay):
+        """
+        Play a game again from its replay and return the world data
+        (array of strings) it would have written along the way.
+        """
+        game_state = self.new_game_state(self.map_corpus.get_map(replay.map_index), replay.seed)
+        world_data = []
+        game_state.write_world_config(world_data)
+        game_state.write_world_time_score(world_data)
+        for turn in range(replay.num_turns()):
+            game_state.replay_turn(replay.turn_moves(turn), world_data)
+        return world_data
+
+
+    def replay_to_world_file(self, replay, world_file_path):
+        """
+        Write the world file of the game recorded in a replay, in the
+        configured world file format.
+        """
+        if (self.world_file_format == 'binary'):
+            BinaryWorld.from_world_data(self.replay_to_world_data(replay)).write(world_file_path)
+        elif (self.world_file_format == 'text'):
+            the_file = open(world_file_path, 'w')
+            for line in self.replay_to_world_data(replay):
+                the_file.write(line)
+            the_file.close()
+        else:
+            print('world file format unknown:', self.world_file_format)
+            sys.exit(1)
 
 
     def run_experiment(self):
@@ -189,7 +372,7 @@ class Experiment:
 
         start_time = time.time()
 
-        self.pre_load_maps()
+        self.load_map_corpus()
 
         strategy_instance = None
         if (self.strategy == 'random'):
@@ -213,7 +396,7 @@ class Experiment:
             self.log_file.write('\nRun ' + str(curr_run) + '\n')
 
             # Execute one run and get best values.
-            pac_run_high_fitness, pac_run_best_world_data, pac_run_best_solution, \
+            pac_run_high_fitness, pac_run_best_replay, pac_run_best_solution, \
                 ghost_run_high_fitness, ghost_run_best_solution \
                 = strategy_instance.execute_one_run()
 
@@ -222,23 +405,20 @@ class Experiment:
                 if (pac_run_high_fitness > self.pac_exp_high_fitness):
                     self.pac_exp_high_fitness = pac_run_high_fitness
                     print('New exp Pac high fitness: ', self.pac_exp_high_fitness)
-                    self.pac_exp_best_world_data = pac_run_best_world_data
+                    self.pac_exp_best_replay = pac_run_best_replay
                     self.pac_exp_best_solution = pac_run_best_solution
             # If Competitive Co-evolution, add fitnesses (use Pac to store most data)
             else:
                 if ((pac_run_high_fitness + ghost_run_high_fitness) > self.pac_exp_high_fitness):
                     self.pac_exp_high_fitness = (pac_run_high_fitness + ghost_run_high_fitness)
                     print('New exp Pac+Ghost high fitness: ', self.pac_exp_high_fitness)
-                    self.pac_exp_best_world_data = pac_run_best_world_data
+                    self.pac_exp_best_replay = pac_run_best_replay
                     self.pac_exp_best_solution = pac_run_best_solution
                     self.ghost_exp_best_solution = ghost_run_best_solution
 
 
         # Dump best world to file
-        the_file = open(self.high_score_world_file_path, 'w')
-        for line in self.pac_exp_best_world_data:
-            the_file.write(line)
-        the_file.close()
+        self.replay_to_world_file(self.pac_exp_best_replay, self.high_score_world_file_path)
 
         # Dump best Pac solution to file
         the_file = open(self.pac_solution_file_path, 'w')
@@ -251,6 +431,10 @@ class Experiment:
             the_file.write(self.ghost_exp_best_solution)
             the_file.close()
 
+        # Report how well the map cache did
+        print(self.map_corpus.cache_stats())
+        self.log_file.write('\n' + self.map_corpus.cache_stats() + '\n')
+
         # Close out the log file
         if (not(self.log_file is None)):
             self.log_file.close()
@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import math
+import numpy
 import random
 import sys
 
@@ -9,11 +12,20 @@ class ExprTree():
     """
     Defines an Expression Tree -- this is the encoding of an individual.
     """
+    __slots__ = ('root', 'fitness', 'score', 'replay', 'compiled', 'compiled_vectorized',
+                 'simplified', 'nodes', 'hash_cache', 'rand_used')
+
     def __init__(self, root):
         self.root = root
         self.fitness = -1  # fitness may be modified by parsimony pressure
         self.score = -1
-        self.world_data = []  # the world data that produced the fitness
+        self.replay = None  # replay of the game that produced the fitness
+        self.compiled = None  # the tree as a Python function (see compile)
+        self.compiled_vectorized = None  # the same over numpy arrays (see evaluate)
+        self.simplified = None  # root of the simplified copy (see simplify)
+        self.nodes = None  # the tree's nodes in breadth-first order (see node_list)
+        self.hash_cache = None  # quantum and digest of the last canonical_hash
+        self.rand_used = None  # whether the tree contains RAND (see uses_rand)
 
     # Canonical list of terminals for Pac supported by the Expression Tree class
     pac_terminals = ['G', 'P', 'W', 'F', 'constant']
@@ -24,11 +36,357 @@ class ExprTree():
     # Canonical list of functions supported by the Expression Tree class
     functions = ['+', '-', '*', '/', 'RAND']
 
+    # Maze-distance variants of the distance terminals, only available
+    # when the experiment loads maze distance tables (see use_maze_terminals)
+    pac_maze_terminals = ['G_maze', 'P_maze', 'F_maze']
+    ghost_maze_terminals = ['G_maze', 'P_maze', 'F_maze', 'M_maze']
+
+
+    # Position of each terminal's value in the list passed to calc
+    terminal_indices = {'G': 0, 'P': 1, 'W': 2, 'F': 3, 'M': 4,
+                        'G_maze': 5, 'P_maze': 6, 'F_maze': 7, 'M_maze': 8}
+
+
+    def compile(self):
+        """
+        Return the tree as a Python function f(gpwfm, rng) giving the same
+        value as root.calc(gpwfm, rng), RAND draws included, without the
+        recursion and the string comparisons at every node. It's generated
+        from the simplified tree (see simplify).
+
+        The function is generated from source once and kept with the tree
+        until the tree is changed (see reset_metrics and update_metrics);
+        copies made with clone don't carry it over.
+        """
+        if (self.compiled is None):
+            self.compiled = self.generate_function('gpwfm', 'rng', False)
+        return self.compiled
+
+
+    def generate_function(self, values_name, rand_name, vectorized):
+        """
+        Return the simplified tree generated as a Python function of the
+        sensor values and what RAND draws from, named as given. Scalar
+        functions index the gpwfm list; vectorized ones take the last axis
+        of a sensor array and divide with divide_vectorized.
+        """
+        lines = []
+        terminals_used = set()
+        result = self.simplify().compile_helper(lines, terminals_used, vectorized)
+        index_prefix = '[..., ' if (vectorized) else '['
+        loads = [terminal + ' = ' + values_name + index_prefix
+                 + str(ExprTree.terminal_indices[terminal]) + ']'
+                 for terminal in sorted(terminals_used)]
+        source = 'def tree_function(' + values_name + ', ' + rand_name + '):\n' \
+            + ''.join(['    ' + line + '\n' for line in loads + lines]) \
+            + '    return ' + result + '\n'
+        namespace = {'divide': ExprTree.divide_vectorized}
+        exec(compile(source, '<ExprTree>', 'exec'), namespace)
+        return namespace['tree_function']
+
+
+    @staticmethod
+    def divide_vectorized(left_val, right_val):
+        """
+        Divide elementwise, giving 0 wherever the divisor is 0, as calc does.
+        """
+        right_val = numpy.asarray(right_val, dtype = numpy.float64)
+        quotient = numpy.zeros(numpy.broadcast(left_val, right_val).shape)
+        return numpy.divide(left_val, right_val, out = quotient, where = (right_val != 0))
+
+
+    def evaluate(self, sensors, generators):
+        """
+        Vectorized counterpart of calc: given an array of sensor values
+        shaped (..., values), each row laid out like calc's gpwfm list,
+        return the tree's value for every row, shaped sensors.shape[:-1],
+        with numpy operations. Like compile, the simplified tree is
+        generated as a function once and kept with the tree.
+
+        generators is the numpy generator RAND draws from, or a list of
+        them, one per entry along the first axis (e.g. one per game when
+        the sensors of many games are stacked). Every RAND node draws for
+        all rows at once, so trees with RAND don't draw the same numbers
+        as calc and give different (equally distributed) values.
+        """
+        sensors = numpy.asarray(sensors, dtype = numpy.float64)
+        shape = sensors.shape[:-1]
+
+        def uniform(low, high):
+            if (isinstance(generators, list)):
+                draws = numpy.stack([generator.random(shape[1:]) for generator in generators])
+            else:
+                draws = generators.random(shape)
+            # Same arithmetic as random.uniform
+            return low + (high - low) * draws
+
+        if (self.compiled_vectorized is None):
+            self.compiled_vectorized = self.generate_function('sensors', 'uniform', True)
+        # Overflows and 0 * inf give inf and nan, as they do in calc
+        with numpy.errstate(all = 'ignore'):
+            return numpy.broadcast_to(self.compiled_vectorized(sensors, uniform), shape)
+
+
+    def node_list(self):
+        """
+        Return the tree's nodes in breadth-first order, so node n as
+        numbered by find_nth_node is node_list()[n - 1]. Picking a node
+        takes constant time once the list is built; it is built on first
+        use and dropped by reset_metrics.
+        """
+        if (self.nodes is None):
+            self.nodes = [self.root]
+            next_node = 0
+            while (next_node < len(self.nodes)):
+                node = self.nodes[next_node]
+                next_node += 1
+                if (node.expr in ExprTree.functions):
+                    self.nodes.append(node.left)
+                    self.nodes.append(node.right)
+        return self.nodes
+
+
+    def reset_metrics(self):
+        """
+        Reset the metrics of all nodes (see Node.reset_metrics) after the
+        tree has been changed, and drop what was kept from the old tree.
+        """
+        self.root.reset_metrics()
+        self.drop_kept()
+
+
+    def update_metrics(self, node, parent, depth):
+        """
+        Update the metrics after the subtree at the given node has been
+        replaced, the node sitting under the given parent at the given
+        depth (see Node.update_metrics), and drop what was kept from the
+        old tree.
+        """
+        node.update_metrics(parent, depth)
+        self.drop_kept()
+
+
+    def drop_kept(self):
+        """
+        Drop everything worked out from the tree and kept with it (node
+        list, canonical hash, RAND flag, compiled functions and simplified
+        copy), so it is worked out again from the changed tree.
+        """
+        self.nodes = None
+        self.hash_cache = None
+        self.rand_used = None
+        self.compiled = None
+        self.compiled_vectorized = None
+        self.simplified = None
+
+
+    def sensor_mask(self):
+        """
+        Return a bitmask of the sensor values the tree's value depends on:
+        bit i is set if value i of calc's gpwfm list is used. It's read off
+        the simplified tree (see simplify), which compile and evaluate use,
+        so sensors only used in dropped subtrees don't count.
+        """
+        return self.simplify().terminal_mask
+
+
+    @staticmethod
+    def terminal_bit(expr):
+        """
+        Return the sensor mask bit of a node with the given expression (0
+        for constants and functions).
+        """
+        if (expr in ExprTree.terminal_indices):
+            return 1 << ExprTree.terminal_indices[expr]
+        return 0
+
+
+    def simplify(self):
+        """
+        Return the root of a simplified copy of the tree, which computes
+        the same values as the tree (RAND draws included) with less work:
+            - subtrees without terminals or RAND are folded into constants
+            - a division by a constant 0 is 0 whatever the dividend, so the
+              dividend is dropped (unless it draws random numbers)
+            - adding or subtracting 0 and multiplying or dividing by 1 are
+              dropped where that doesn't turn an int into a float
+        x - x and x * 0 are left alone: they aren't 0 when x is inf or nan.
+
+        The copy is made once and kept with the tree until the tree is
+        changed, and compile and evaluate use it. The tree itself, and so its size and height for
+        parsimony pressure, is left unchanged.
+        """
+        if (self.simplified is None):
+            self.simplified = self.root.simplify()
+        return self.simplified
+
+
+    @staticmethod
+    def simplified_node(expr, constant, left = None, right = None):
+        """
+        Return a simplified node (see simplify) for the given expression,
+        given its constant or its simplified children, as a list [node,
+        kind, uses RAND], where kind is 'int' or 'float' if the node's
+        value is always of that type and None if it can be either.
+        """
+        def kind_of(value):
+            return 'int' if (isinstance(value, int)) else 'float'
+
+        def keeps(kind, value):
+            # Whether x + value (or x * value) has the same type as x
+            return (kind == 'float') or ((kind == 'int') and isinstance(value, int))
+
+        if (expr == 'constant'):
+            return [Node('constant', constant = constant), kind_of(constant), False]
+        if (expr not in ExprTree.functions):
+            # Sensor values are ints
+            return [Node(expr), 'int', False]
+
+        left_node, left_kind, left_rand = left
+        right_node, right_kind, right_rand = right
+        uses_rand = left_rand or right_rand or (expr == 'RAND')
+        left_constant = left_node.constant if (left_node.expr == 'constant') else None
+        right_constant = right_node.constant if (right_node.expr == 'constant') else None
+
+        # Fold constant subtrees with calc, so the value is exactly the same
+        if ((not uses_rand) and (left_constant is not None) and (right_constant is not None)):
+            value = Node(expr, left = left_node, right = right_node).calc([])
+            return ExprTree.simplified_node('constant', value)
+
+        if (expr == '/'):
+            if ((right_constant == 0) and (not left_rand)):
+                return ExprTree.simplified_node('constant', 0)
+            if ((right_constant == 1) and (left_kind == 'float')):
+                return left
+        if ((expr in ['+', '-']) and (right_constant == 0) and keeps(left_kind, right_constant)):
+            return left
+        if ((expr == '+') and (left_constant == 0) and keeps(right_kind, left_constant)):
+            return right
+        if (expr == '*'):
+            if ((right_constant == 1) and keeps(left_kind, right_constant)):
+                return left
+            if ((left_constant == 1) and keeps(right_kind, left_constant)):
+                return right
+
+        # Type of the value: RAND always gives a float, and so does '/' by
+        # a nonzero constant; by 0 (kept for a dividend drawing random
+        # numbers) calc gives int 0 but evaluate float 0, so it's unknown
+        if ((expr == 'RAND') or ((expr == '/') and (right_constant is not None)
+                                 and (right_constant != 0))):
+            kind = 'float'
+        elif (expr == '/'):
+            kind = None
+        elif ((left_kind == 'int') and (right_kind == 'int')):
+            kind = 'int'
+        elif ((left_kind == 'float') or (right_kind == 'float')):
+            kind = 'float'
+        else:
+            kind = None
+        return [Node(expr, left = left_node, right = right_node), kind, uses_rand]
+
+
+    def canonical_hash(self, quantum = 0):
+        """
+        Return a digest identifying what the tree computes: trees equal
+        up to the order of the operands of + and * get the same digest
+        (both are commutative, so they play the same), unless both
+        operands use RAND, since swapping them would swap their draws.
+
+        With quantum > 0, constants are first rounded to multiples of
+        quantum, so trees whose constants differ by less than that get
+        the same digest too.
+
+        The digest is kept until the tree is changed (see reset_metrics
+        and update_metrics).
+        """
+        if ((self.hash_cache is None) or (self.hash_cache[0] != quantum)):
+            self.hash_cache = (quantum, self.root.canonical_hash(quantum)[0])
+        return self.hash_cache[1]
+
+
+    def uses_rand(self):
+        """
+        Return whether the tree contains RAND, and so needn't compute the
+        same thing twice. Kept until the tree is changed, like the
+        canonical hash.
+        """
+        if (self.rand_used is None):
+            self.rand_used = self.root.contains('RAND')
+        return self.rand_used
+
+
+    @staticmethod
+    def leaf_hash(expr, constant, quantum):
+        """
+        Return the canonical hash of a terminal node (see canonical_hash),
+        as a pair [digest, uses RAND].
+        """
+        if (expr == 'constant'):
+            if (quantum > 0):
+                constant = round(constant / quantum)
+            expr = 'constant ' + repr(constant)
+        return [hashlib.blake2b(expr.encode('utf-8'), digest_size = 16).digest(), False]
+
+
+    @staticmethod
+    def function_hash(expr, left, right):
+        """
+        Return the canonical hash of a function node given its children's
+        (see canonical_hash), as a pair [digest, uses RAND].
+        """
+        (left_digest, left_rand), (right_digest, right_rand) = left, right
+        if ((expr in ['+', '*']) and not (left_rand and right_rand)):
+            left_digest, right_digest = sorted([left_digest, right_digest])
+        return [hashlib.blake2b(expr.encode('utf-8') + left_digest + right_digest,
+                                digest_size = 16).digest(),
+                left_rand or right_rand or (expr == 'RAND')]
+
+
+    def clone(self):
+        """
+        Return a copy of this individual: a copy of the tree (see
+        Node.clone) with the same fitness, score and replay. Replays
+        aren't changed once recorded, so the copy shares it.
+        """
+        copy = ExprTree(self.root.clone())
+        copy.fitness = self.fitness
+        copy.score = self.score
+        copy.replay = self.replay
+        return copy
+
+
+    def __getstate__(self):
+        """
+        Copy (and pickle) everything but the compiled functions and the
+        simplified tree.
+        """
+        state = {slot: getattr(self, slot) for slot in ExprTree.__slots__}
+        state['compiled'] = None
+        state['compiled_vectorized'] = None
+        state['simplified'] = None
+        return (None, state)
+
+
+    @staticmethod
+    def use_maze_terminals():
+        """
+        Add the maze-distance terminals to the canonical terminal lists,
+        ahead of 'constant'.
+        """
+        for terminals, maze_terminals in [(ExprTree.pac_terminals, ExprTree.pac_maze_terminals),
+                                          (ExprTree.ghost_terminals, ExprTree.ghost_maze_terminals)]:
+            for terminal in maze_terminals:
+                if (terminal not in terminals):
+                    terminals.insert(len(terminals) - 1, terminal)
+
 
 class Node():
     """
     Defines a node in an ExprTree.
     """
+    __slots__ = ('expr', 'left', 'right', 'constant', 'parent', 'depth', 'height', 'size',
+                 'terminal_mask')
+
     def __init__(self, expr = None, left = None, right = None,
                  constant = 0):
         self.expr = expr
@@ -39,16 +397,20 @@ class Node():
         self.depth = 0
         self.height = 0
         self.size = 1
+        self.terminal_mask = 0  # sensors used in this subtree (see ExprTree.sensor_mask)
 
 
-    def calc(self, gpwfm):
+    def calc(self, gpwfm, rng = random):
         """
         Return the recursively-calculated numerical value represented by
         this node.
 
-        gpwf is a list containing the values of G, P, W, and F so we
+        gpwfm is a list containing the values of G, P, W, F, M (and then
+        G_maze, P_maze, F_maze, M_maze if maze distances are in use) so we
         don't have to recalculate them each time they are encountered
         in the tree.
+
+        rng is the random generator RAND draws from.
         """
         # If this is an input node (leaf node) return a value.
         if (self.expr == 'G'): return gpwfm[0]
@@ -57,10 +419,14 @@ class Node():
         if (self.expr == 'F'): return gpwfm[3]
         if (self.expr == 'M'): return gpwfm[4]
         if (self.expr == 'constant'): return self.constant
+        if (self.expr == 'G_maze'): return gpwfm[5]
+        if (self.expr == 'P_maze'): return gpwfm[6]
+        if (self.expr == 'F_maze'): return gpwfm[7]
+        if (self.expr == 'M_maze'): return gpwfm[8]
 
         # Calculate values of left and right children.
-        left_val = self.left.calc(gpwfm)
-        right_val = self.right.calc(gpwfm)
+        left_val = self.left.calc(gpwfm, rng)
+        right_val = self.right.calc(gpwfm, rng)
 
         # Apply the appropriate function to the child values and return it.
         if (self.expr == '+'): return left_val + right_val
@@ -70,22 +436,155 @@ class Node():
             if (right_val == 0): return 0  # lazy way to deal with divide-by-zero
             else: return left_val / right_val
         if (self.expr == 'RAND'):
-            return random.uniform(left_val, right_val)
+            return rng.uniform(left_val, right_val)
+
+
+    def compile_helper(self, lines, terminals_used, vectorized = False):
+        """
+        Append the Python statements computing this node's subtree to
+        lines, children first in the order calc evaluates them, and return
+        the expression holding its value. Terminals are named after
+        themselves; their names are added to terminals_used.
+
+        If vectorized, the statements work on numpy arrays: division calls
+        divide and RAND calls uniform (see ExprTree.generate_function).
+        """
+        # If this is an input node (leaf node) return its value directly.
+        if (self.expr == 'constant'):
+            if (math.isfinite(self.constant)):
+                return repr(self.constant)
+            return 'float(\'' + repr(float(self.constant)) + '\')'
+        if (self.expr not in ExprTree.functions):
+            terminals_used.add(self.expr)
+            return self.expr
+
+        left = self.left.compile_helper(lines, terminals_used, vectorized)
+        right = self.right.compile_helper(lines, terminals_used, vectorized)
+
+        name = 'v' + str(len(lines))
+        if (vectorized and (self.expr in ['/', 'RAND'])):
+            function = 'divide' if (self.expr == '/') else 'uniform'
+            lines.append(name + ' = ' + function + '(' + left + ', ' + right + ')')
+        elif (self.expr == '/'):
+            # lazy way to deal with divide-by-zero, as in calc
+            lines.append(name + ' = 0 if (' + right + ' == 0) else ' + left + ' / ' + right)
+        elif (self.expr == 'RAND'):
+            lines.append(name + ' = rng.uniform(' + left + ', ' + right + ')')
+        else:
+            lines.append(name + ' = ' + left + ' ' + self.expr + ' ' + right)
+        return name
+
+
+    def simplify(self):
+        """
+        Return a simplified copy of this node's subtree as a new tree (see
+        ExprTree.simplify).
+        """
+        root = self.simplify_helper()[0]
+        root.reset_metrics()
+        return root
+
+
+    def simplify_helper(self):
+        """
+        Return this node's subtree simplified, as ExprTree.simplified_node
+        returns it.
+        """
+        if (self.expr not in ExprTree.functions):
+            return ExprTree.simplified_node(self.expr, self.constant)
+        return ExprTree.simplified_node(self.expr, self.constant,
+                                        self.left.simplify_helper(), self.right.simplify_helper())
+
+
+    def canonical_hash(self, quantum = 0):
+        """
+        Return the canonical hash of this node's subtree (see
+        ExprTree.canonical_hash), as a pair [digest, uses RAND].
+        """
+        if (self.expr not in ExprTree.functions):
+            return ExprTree.leaf_hash(self.expr, self.constant, quantum)
+        return ExprTree.function_hash(self.expr, self.left.canonical_hash(quantum),
+                                      self.right.canonical_hash(quantum))
 
 
     def reset_metrics(self, parent = None, depth = 0):
         """
-        Recursive method to reset depth, height, and size of all nodes.
+        Recursive method to reset depth, height, size, and sensor mask of
+        all nodes.
         """
         self.parent = parent
         self.depth = depth
         self.height = 0
         self.size = 1
+        self.terminal_mask = ExprTree.terminal_bit(self.expr)
         if (self.expr in ExprTree.functions):
             self.left.reset_metrics(parent = self, depth = self.depth + 1)
             self.right.reset_metrics(parent = self, depth = self.depth + 1)
             self.size += (self.left.size + self.right.size)
             self.height = 1 + max(self.left.height, self.right.height)
+            self.terminal_mask = self.left.terminal_mask | self.right.terminal_mask
+
+
+    def clone(self):
+        """
+        Return a copy of the subtree rooted at this node as a new tree,
+        with its metrics set as reset_metrics would set them.
+
+        Nodes are copied without recursion, parents before children,
+        then sizes, heights and sensor masks are filled in children first.
+        """
+        root = Node(self.expr, constant = self.constant)
+        copies = []
+        to_visit = [(self, root)]
+        while (len(to_visit) > 0):
+            node, copy = to_visit.pop()
+            copies.append(copy)
+            if (node.expr in ExprTree.functions):
+                copy.left = Node(node.left.expr, constant = node.left.constant)
+                copy.right = Node(node.right.expr, constant = node.right.constant)
+                for child in [copy.left, copy.right]:
+                    child.parent = copy
+                    child.depth = copy.depth + 1
+                to_visit.append((node.right, copy.right))
+                to_visit.append((node.left, copy.left))
+
+        for copy in reversed(copies):
+            if (copy.expr in ExprTree.functions):
+                copy.size = 1 + copy.left.size + copy.right.size
+                copy.height = 1 + max(copy.left.height, copy.right.height)
+                copy.terminal_mask = copy.left.terminal_mask | copy.right.terminal_mask
+            else:
+                copy.terminal_mask = ExprTree.terminal_bit(copy.expr)
+        return root
+
+
+    def update_metrics(self, parent, depth):
+        """
+        Update metrics after this node's subtree has been replaced, the
+        node now sitting under the given parent at the given depth: reset
+        the metrics of the subtree, then the size, height, and sensor mask
+        of its ancestors. Only the subtree and the path up to the root are
+        visited, and the tree ends up as reset_metrics would leave it.
+        """
+        self.reset_metrics(parent = parent, depth = depth)
+        node = parent
+        while (node is not None):
+            node.size = 1 + node.left.size + node.right.size
+            node.height = 1 + max(node.left.height, node.right.height)
+            node.terminal_mask = node.left.terminal_mask | node.right.terminal_mask
+            node = node.parent
+
+
+    def contains(self, expr):
+        """
+        Return whether this node or any node below it has the given
+        expression.
+        """
+        if (self.expr == expr):
+            return True
+        if (self.expr in ExprTree.functions):
+            return (self.left.contains(expr) or self.right.contains(expr))
+        return False
 
 
     def find_nth_node(self, n, counter = 1):
@@ -123,27 +622,42 @@ class Node():
         self.depth = node.depth
         self.height = node.height
         self.size = node.size
+        self.terminal_mask = node.terminal_mask
 
 
-    def repr_helper(self, level):
+    def text_lines(self, level = 0):
         """
-        Return a string representing this node.
+        Yield the lines of the printed form of this node's subtree, one
+        node per line in preorder, each indented with a pipe per level.
 
         level = depth of this node, for printing the pipe indents
         """
+        to_visit = [(self, level)]
+        while (len(to_visit) > 0):
+            node, level = to_visit.pop()
 
-        # If input (leaf) node, return string representing input.
-        if (self.expr in ['G', 'P', 'W', 'F', 'M', 'constant']):
-            if (self.expr == 'constant'):
-                return ('|' * level) + str(self.constant) + '\n'
+            # If input (leaf) node, the line names the input.
+            if (node.expr in ['G', 'P', 'W', 'F', 'M', 'constant',
+                              'G_maze', 'P_maze', 'F_maze', 'M_maze']):
+                if (node.expr == 'constant'):
+                    yield ('|' * level) + str(node.constant) + '\n'
+                else:
+                    yield ('|' * level) + node.expr + '\n'
+
+            # If operator node, the operator, then its operands one level in.
             else:
-                return ('|' * level) + self.expr + '\n'
+                yield ('|' * level) + node.expr + '\n'
+                to_visit.append((node.right, level + 1))
+                to_visit.append((node.left, level + 1))
 
-        # If operator node, return a recursively-generated string.
-        else:
-            return ('|' * level) + self.expr + '\n' \
-                + self.left.repr_helper(level + 1) \
-                + self.right.repr_helper(level + 1)
+
+    def repr_helper(self, level):
+        """
+        Return a string representing this node.
+
+        level = depth of this node, for printing the pipe indents
+        """
+        return ''.join(self.text_lines(level))
 
 
     def __repr__(self):
@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+import random
+import sys
+
+import numpy
+
+sys.path.append('code')
+from exprTree import ExprTree, Node
+
+
+class FlatGenome:
+    """
+    An expression tree stored as flat arrays instead of linked Nodes: the
+    opcode of every node in preorder, the constant of every node (0 for
+    non-constants) and whether it is a float or an int (the int 0 of a
+    division by 0 folded by simplify), and for every node the index just
+    past the end of its subtree, so each subtree is a slice. It takes the place of the root
+    Node of an ExprTree: it has the same size, height, calc,
+    compile_helper, simplify, canonical_hash, contains and printed form,
+    all computed without recursion, so trees can grow far deeper than the
+    recursion limit.
+
+    Copying one is copying four small arrays, and mutation and crossover
+    are slicing (see replace_subtree).
+    """
+
+    # Opcodes index this list: functions first, then terminals
+    OPCODES = ExprTree.functions + ['G', 'P', 'W', 'F', 'M',
+                                    'G_maze', 'P_maze', 'F_maze', 'M_maze', 'constant']
+    NUM_FUNCTIONS = len(ExprTree.functions)
+    ADD, SUBTRACT, MULTIPLY, DIVIDE, RAND = range(NUM_FUNCTIONS)
+    CONSTANT = OPCODES.index('constant')
+
+    # Kinds of constants
+    FLOAT_CONSTANT, INT_CONSTANT = range(2)
+
+    # Opcodes by their printed label; constants print as their value
+    LABEL_OPCODES = {expr: op for op, expr in enumerate(OPCODES) if (expr != 'constant')}
+
+
+    def __init__(self, ops, constants, ends = None, kinds = None):
+        """
+        Given the opcodes and constants of the nodes in preorder, and
+        optionally the subtree ends (found from the opcodes otherwise) and
+        the kinds of the constants (all floats otherwise), set up the
+        genome.
+        """
+        self.ops = numpy.asarray(ops, dtype = numpy.int8)
+        self.constants = numpy.asarray(constants, dtype = numpy.float64)
+        if (kinds is None):
+            kinds = numpy.full(len(self.ops), FlatGenome.FLOAT_CONSTANT)
+        self.kinds = numpy.asarray(kinds, dtype = numpy.int8)
+        if (ends is None):
+            ends = self.find_ends(self.ops.tolist())
+        self.ends = numpy.asarray(ends, dtype = numpy.int32)
+
+        # Same metrics as a root Node after reset_metrics
+        self.size = len(self.ops)
+        self.depth = 0
+        self.height = max(self.node_depths())
+        self.terminal_mask = 0
+        for op in numpy.unique(self.ops).tolist():
+            self.terminal_mask |= ExprTree.terminal_bit(FlatGenome.OPCODES[op])
+
+
+    @staticmethod
+    def find_ends(ops):
+        """
+        Given a list of opcodes in preorder, return the index just past
+        the end of every node's subtree.
+        """
+        ends = [0] * len(ops)
+        sizes = []
+        for k in range(len(ops) - 1, -1, -1):
+            size = 1
+            if (ops[k] < FlatGenome.NUM_FUNCTIONS):
+                size += sizes.pop() + sizes.pop()
+            sizes.append(size)
+            ends[k] = k + size
+        return ends
+
+
+    def node_depths(self):
+        """
+        Return the depth of every node as a list, the root being at 0.
+        """
+        ops = self.ops.tolist()
+        ends = self.ends.tolist()
+        depths = [0] * len(ops)
+        for k in range(len(ops)):
+            if (ops[k] < FlatGenome.NUM_FUNCTIONS):
+                # Left child right after, right child after the left subtree
+                depths[k + 1] = depths[ends[k + 1]] = depths[k] + 1
+        return depths
+
+
+    def breadth_first_order(self):
+        """
+        Return the indices of the nodes in breadth-first order, the order
+        ExprTree.node_list lists a tree's nodes in, so nodes are picked
+        the same way from either genome.
+        """
+        ops = self.ops.tolist()
+        ends = self.ends.tolist()
+        order = [0]
+        next_node = 0
+        while (next_node < len(order)):
+            k = order[next_node]
+            next_node += 1
+            if (ops[k] < FlatGenome.NUM_FUNCTIONS):
+                order.append(k + 1)
+                order.append(ends[k + 1])
+        return order
+
+
+    def subtree_heights(self):
+        """
+        Return the height of every node's subtree as a list, leaves being 0.
+        """
+        ops = self.ops.tolist()
+        ends = self.ends.tolist()
+        heights = [0] * len(ops)
+        for k in range(len(ops) - 1, -1, -1):
+            if (ops[k] < FlatGenome.NUM_FUNCTIONS):
+                heights[k] = 1 + max(heights[k + 1], heights[ends[k + 1]])
+        return heights
+
+
+    def constant_list(self):
+        """
+        Return the constant of every node as a list, int constants as ints.
+        """
+        constants = self.constants.tolist()
+        for k in numpy.flatnonzero(self.kinds == FlatGenome.INT_CONSTANT).tolist():
+            constants[k] = int(constants[k])
+        return constants
+
+
+    @staticmethod
+    def from_node(node):
+        """
+        Return the genome of the tree rooted at the given Node.
+        """
+        ops = []
+        constants = []
+        kinds = []
+        to_visit = [node]
+        while (len(to_visit) > 0):
+            curr = to_visit.pop()
+            ops.append(FlatGenome.OPCODES.index(curr.expr))
+            constants.append(curr.constant if (curr.expr == 'constant') else 0.0)
+            kinds.append(FlatGenome.INT_CONSTANT if ((curr.expr == 'constant')
+                                                     and isinstance(curr.constant, int))
+                         else FlatGenome.FLOAT_CONSTANT)
+            if (curr.expr in ExprTree.functions):
+                to_visit.append(curr.right)
+                to_visit.append(curr.left)
+        return FlatGenome(ops, constants, kinds = kinds)
+
+
+    @staticmethod
+    def from_text(lines):
+        """
+        Return the genome of a tree in the printed form (see text_lines),
+        read in one pass, so lines can come straight from an open file.
+        Blank lines are skipped. Raise ValueError if a line isn't a node
+        or the nodes don't make up exactly one tree.
+        """
+        ops = []
+        constants = []
+        kinds = []
+
+        # Depths the coming nodes must be at, the next one last
+        expected_depths = [0]
+        for line_num, line in enumerate(lines, 1):
+            line = line.rstrip()
+            if (line == ''):
+                continue
+            label = line.lstrip('|')
+            depth = len(line) - len(label)
+            if (len(expected_depths) == 0):
+                raise ValueError('line ' + str(line_num) + ': node past the end of the tree')
+            if (depth != expected_depths.pop()):
+                raise ValueError('line ' + str(line_num) + ': node ' + repr(label)
+                                 + ' at the wrong depth (' + str(depth) + ')')
+
+            if (label in FlatGenome.LABEL_OPCODES):
+                ops.append(FlatGenome.LABEL_OPCODES[label])
+                constants.append(0.0)
+                kinds.append(FlatGenome.FLOAT_CONSTANT)
+            else:
+                # Float constants always print with a point, an exponent,
+                # inf or nan, and int constants without
+                try:
+                    constants.append(int(label))
+                    kinds.append(FlatGenome.INT_CONSTANT)
+                except ValueError:
+                    try:
+                        constants.append(float(label))
+                    except ValueError:
+                        raise ValueError('line ' + str(line_num) + ': unknown node ' + repr(label))
+                    kinds.append(FlatGenome.FLOAT_CONSTANT)
+                ops.append(FlatGenome.CONSTANT)
+
+            # Both operands of a function come next, one level in
+            if (ops[-1] < FlatGenome.NUM_FUNCTIONS):
+                expected_depths += [depth + 1, depth + 1]
+
+        if (len(expected_depths) > 0):
+            raise ValueError('tree ends early: ' + str(len(expected_depths)) + ' nodes missing')
+        return FlatGenome(ops, constants, kinds = kinds)
+
+
+    @staticmethod
+    def is_well_formed(ops):
+        """
+        Given a list of opcodes, return whether they are valid and make up
+        exactly one tree in preorder.
+        """
+        # Nodes still to come: a function needs two more, a terminal none
+        open_nodes = 1
+        for op in ops:
+            if (open_nodes == 0 or op < 0 or op >= len(FlatGenome.OPCODES)):
+                return False
+            open_nodes += 1 if (op < FlatGenome.NUM_FUNCTIONS) else -1
+        return (open_nodes == 0)
+
+
+    @staticmethod
+    def random_genome(functions, terminals, depth, dmax, grow_or_full, rng = random):
+        """
+        Return a random genome for a subtree rooted at the given depth,
+        built like the strategies' build_tree with the 'grow' or 'full'
+        method (and drawing the same random numbers in the same order).
+        """
+        ops = []
+        constants = []
+        to_build = [depth]
+        while (len(to_build) > 0):
+            depth = to_build.pop()
+            # Inner nodes: grow picks from functions and terminals, full
+            # from functions only. At Dmax, pick a terminal.
+            if (depth < dmax):
+                if (grow_or_full == 'grow'):
+                    expr = (functions + terminals)[rng.randint(0, (len(functions) + len(terminals) - 1))]
+                else:
+                    expr = functions[rng.randint(0, len(functions) - 1)]
+            else:
+                expr = terminals[rng.randint(0, len(terminals) - 1)]
+
+            ops.append(FlatGenome.OPCODES.index(expr))
+            constants.append(rng.uniform(-10, 10) if (expr == 'constant') else 0.0)
+            if (expr in functions):
+                to_build += [depth + 1, depth + 1]
+        return FlatGenome(ops, constants)
+
+
+    def replace_subtree(self, k, donor, donor_k):
+        """
+        Return a new genome: this one with the subtree at node k replaced
+        by a copy of the donor's subtree at node donor_k.
+        """
+        end = int(self.ends[k])
+        donor_end = int(donor.ends[donor_k])
+        growth = (donor_end - donor_k) - (end - k)
+
+        # Ancestors of node k (the nodes before it whose subtrees reach
+        # past it) and everything after the subtree shift by the growth
+        prefix_ends = self.ends[:k]
+        ends = numpy.concatenate([prefix_ends + numpy.where(prefix_ends > k, growth, 0),
+                                  donor.ends[donor_k:donor_end] - donor_k + k,
+                                  self.ends[end:] + growth])
+        ops = numpy.concatenate([self.ops[:k], donor.ops[donor_k:donor_end], self.ops[end:]])
+        constants = numpy.concatenate([self.constants[:k], donor.constants[donor_k:donor_end],
+                                       self.constants[end:]])
+        kinds = numpy.concatenate([self.kinds[:k], donor.kinds[donor_k:donor_end], self.kinds[end:]])
+        return FlatGenome(ops, constants, ends, kinds)
+
+
+    def clone(self):
+        """
+        Return a copy of the genome.
+        """
+        return FlatGenome(self.ops.copy(), self.constants.copy(), self.ends.copy(),
+                          self.kinds.copy())
+
+
+    def fold(self, leaf, apply):
+        """
+        Evaluate the genome bottom-up without recursion, in the order calc
+        visits nodes: leaf(k) gives the value of terminal node k, and
+        apply(op, left, right) combines the values of a function node's
+        children. Return the value of the root.
+
+        Walking the preorder, function nodes wait on a stack until both
+        of their children's values are known.
+        """
+        ops = self.ops.tolist()
+        waiting = []  # [opcode, left value or None]
+        value = None
+        for k in range(len(ops)):
+            if (ops[k] < FlatGenome.NUM_FUNCTIONS):
+                waiting.append([ops[k], None])
+                continue
+            value = leaf(k)
+            while (len(waiting) > 0):
+                if (waiting[-1][1] is None):
+                    waiting[-1][1] = (value,)
+                    break
+                op, (left,) = waiting.pop()
+                value = apply(op, left, value)
+        return value
+
+
+    def calc(self, gpwfm, rng = random):
+        """
+        Same as Node.calc, run as a stack machine over the arrays.
+        """
+        ops = self.ops.tolist()
+        constants = self.constant_list()
+        terminal_indices = [ExprTree.terminal_indices.get(expr) for expr in FlatGenome.OPCODES]
+
+        def leaf(k):
+            if (ops[k] == FlatGenome.CONSTANT):
+                return constants[k]
+            return gpwfm[terminal_indices[ops[k]]]
+
+        def apply(op, left_val, right_val):
+            if (op == FlatGenome.ADD): return left_val + right_val
+            if (op == FlatGenome.SUBTRACT): return left_val - right_val
+            if (op == FlatGenome.MULTIPLY): return left_val * right_val
+            if (op == FlatGenome.DIVIDE):
+                if (right_val == 0): return 0  # lazy way to deal with divide-by-zero
+                else: return left_val / right_val
+            return rng.uniform(left_val, right_val)
+
+        return self.fold(leaf, apply)
+
+
+    def compile_helper(self, lines, terminals_used, vectorized = False):
+        """
+        Same as Node.compile_helper (see ExprTree.compile).
+        """
+        ops = self.ops.tolist()
+        constants = self.constant_list()
+
+        def leaf(k):
+            if (ops[k] == FlatGenome.CONSTANT):
+                if (numpy.isfinite(constants[k])):
+                    return repr(constants[k])
+                return 'float(\'' + repr(constants[k]) + '\')'
+            terminals_used.add(FlatGenome.OPCODES[ops[k]])
+            return FlatGenome.OPCODES[ops[k]]
+
+        def apply(op, left, right):
+            name = 'v' + str(len(lines))
+            if (vectorized and (op in [FlatGenome.DIVIDE, FlatGenome.RAND])):
+                function = 'divide' if (op == FlatGenome.DIVIDE) else 'uniform'
+                lines.append(name + ' = ' + function + '(' + left + ', ' + right + ')')
+            elif (op == FlatGenome.DIVIDE):
+                lines.append(name + ' = 0 if (' + right + ' == 0) else ' + left + ' / ' + right)
+            elif (op == FlatGenome.RAND):
+                lines.append(name + ' = rng.uniform(' + left + ', ' + right + ')')
+            else:
+                lines.append(name + ' = ' + left + ' ' + FlatGenome.OPCODES[op] + ' ' + right)
+            return name
+
+        return self.fold(leaf, apply)
+
+
+    def simplify(self):
+        """
+        Same as Node.simplify (see ExprTree.simplify), giving a genome.
+        """
+        ops = self.ops.tolist()
+        constants = self.constant_list()
+
+        def leaf(k):
+            return ExprTree.simplified_node(FlatGenome.OPCODES[ops[k]], constants[k])
+
+        def apply(op, left, right):
+            return ExprTree.simplified_node(FlatGenome.OPCODES[op], 0, left, right)
+
+        return FlatGenome.from_node(self.fold(leaf, apply)[0])
+
+
+    def canonical_hash(self, quantum = 0):
+        """
+        Same as Node.canonical_hash (see ExprTree.canonical_hash).
+        """
+        ops = self.ops.tolist()
+        constants = self.constant_list()
+
+        def leaf(k):
+            return ExprTree.leaf_hash(FlatGenome.OPCODES[ops[k]], constants[k], quantum)
+
+        def apply(op, left, right):
+            return ExprTree.function_hash(FlatGenome.OPCODES[op], left, right)
+
+        return self.fold(leaf, apply)
+
+
+    def contains(self, expr):
+        """
+        Return whether any node has the given expression.
+        """
+        return bool((self.ops == FlatGenome.OPCODES.index(expr)).any())
+
+
+    def to_node(self):
+        """
+        Return the tree as linked Nodes, with metrics reset.
+        """
+        ops = self.ops.tolist()
+        constants = self.constant_list()
+        nodes = [Node(FlatGenome.OPCODES[op]) for op in ops]
+        for k in range(len(ops)):
+            if (ops[k] == FlatGenome.CONSTANT):
+                nodes[k].constant = constants[k]
+            elif (ops[k] < FlatGenome.NUM_FUNCTIONS):
+                nodes[k].left = nodes[k + 1]
+                nodes[k].right = nodes[int(self.ends[k + 1])]
+        nodes[0].reset_metrics()
+        return nodes[0]
+
+
+    def text_lines(self):
+        """
+        Yield the lines of the printed form of the tree, the same as the
+        root Node's (see Node.text_lines).
+        """
+        ops = self.ops.tolist()
+        constants = self.constant_list()
+        for k, depth in enumerate(self.node_depths()):
+            if (ops[k] == FlatGenome.CONSTANT):
+                yield ('|' * depth) + str(constants[k]) + '\n'
+            else:
+                yield ('|' * depth) + FlatGenome.OPCODES[ops[k]] + '\n'
+
+
+    def __repr__(self):
+        """
+        Return a string representing the tree, the same as the root Node's.
+        """
+        return ''.join(self.text_lines())
@@ -1,20 +1,65 @@
 # -*- coding: utf-8 -*-
+import numpy
+import os
 import sys
 
 sys.path.append('code')
 from gameState import GameState
+from numpyGameState import NumpyGameState
 
 
 class GameMapInfo:
     """
-    Class to hold a game map. Initialize from a map file.
+    Class to hold a game map. Initialize from a map file, or from a
+    binary map corpus (see BinaryMapCorpus).
     """
-    def __init__(self, map_file_path):
+    def __init__(self, map_file_path, map_index = -1, corpus = None):
+        self.map_file_path = map_file_path
+        self.map_index = map_index  # position among the experiment's pre-loaded maps (or in the corpus)
         self.game_map = None
         self.width = 0
         self.height = 0
         self.num_walls = 0
+        self.grid = None  # uint8 template for the numpy engine
 
+        # Per-cell tables indexed by y * width + x, built once at load (or,
+        # for a map from a corpus, on first use; see build_cell_lists)
+        self.cell_x = None           # x coordinate of each cell
+        self.cell_y = None           # y coordinate of each cell
+        self.pac_neighbors = None    # valid next cells for Pac (including staying put)
+        self.ghost_neighbors = None  # valid next cells for a Ghost
+        self.wall_counts = None      # number of adjacent walls, board edges included
+        self.grid_neighbors = None   # adjacent cell indices, walls or not
+
+        # The same tables as arrays, neighbor cells padded with -1, for
+        # BatchGameState (memory-mapped for a map from a corpus)
+        self.pac_neighbor_array = None
+        self.ghost_neighbor_array = None
+        self.grid_neighbor_array = None
+        self.wall_count_array = None
+
+        # All-pairs maze distances (uint16, cells x cells), only loaded
+        # when the maze sensors are in use; see load_maze_dist
+        self.maze_dist = None
+
+        # Zobrist keys for GameState's cycle detection, one list per agent
+        # (see zobrist_keys)
+        self.cycle_keys = []
+
+        # BinaryMapCorpus the map is read from instead of its map file, if any
+        self.corpus = corpus
+
+        if (corpus is None):
+            self.read_map_file(map_file_path)
+            self.build_cell_tables()
+        else:
+            self.load_corpus_tables()
+
+
+    def read_map_file(self, map_file_path):
+        """
+        Read the map and set up its grid from a text map file.
+        """
         with open(map_file_path, 'r') as reader:
             curr_line = reader.readline()
 
@@ -34,6 +79,194 @@ class GameMapInfo:
         self.num_walls = sum([curr_row.count(GameState.WALL) \
                               for curr_row in self.game_map])
 
+        # Build the grid template used by NumpyGameState
+        self.grid = numpy.full((self.height, self.width), NumpyGameState.OPEN,
+                               dtype = numpy.uint8)
+        self.grid[numpy.array(self.game_map) == GameState.WALL] = NumpyGameState.WALL
+
+
+    def load_corpus_tables(self):
+        """
+        Set up the map and its per-cell tables from the arrays stored in
+        the binary map corpus. The tables stay memory-mapped, so every
+        process shares one copy; the list forms GameState indexes are only
+        built when a game is first played on the map (see build_cell_lists).
+        """
+        self.width, self.height, walls, self.wall_count_array, self.pac_neighbor_array, \
+            self.ghost_neighbor_array, self.grid_neighbor_array \
+            = self.corpus.map_tables(self.map_index)
+
+        self.game_map = [[GameState.WALL if is_wall else GameState.OPEN for is_wall in row]
+                         for row in walls.tolist()]
+        self.num_walls = int(walls.sum())
+        self.grid = numpy.where(walls, NumpyGameState.WALL, NumpyGameState.OPEN).astype(numpy.uint8)
+
+
+    def build_cell_lists(self):
+        """
+        Build the list forms of the per-cell tables, which GameState
+        indexes, from the arrays of a map from a corpus, unless they're
+        already built. Maps read from map files have them from the start.
+        """
+        if (self.pac_neighbors is not None):
+            return
+        num_cells = self.width * self.height
+        self.cell_x = [cell % self.width for cell in range(num_cells)]
+        self.cell_y = [cell // self.width for cell in range(num_cells)]
+        self.pac_neighbors = self.unpad_rows(self.pac_neighbor_array)
+        self.ghost_neighbors = self.unpad_rows(self.ghost_neighbor_array)
+        self.grid_neighbors = self.unpad_rows(self.grid_neighbor_array)
+        self.wall_counts = self.wall_count_array.tolist()
+
+
+    def build_cell_tables(self):
+        """
+        Precompute the neighbor lists and wall counts of every cell. Walls
+        never change during a game, so GameState can look these up
+        instead of checking bounds and walls on every call.
+        """
+        num_cells = self.width * self.height
+        self.cell_x = [cell % self.width for cell in range(num_cells)]
+        self.cell_y = [cell // self.width for cell in range(num_cells)]
+        self.pac_neighbors = [None] * num_cells
+        self.ghost_neighbors = [None] * num_cells
+        self.wall_counts = [0] * num_cells
+        self.grid_neighbors = [None] * num_cells
+
+        for y in range(self.height):
+            for x in range(self.width):
+                # Up, down, right, left -- the order GameState has always used
+                ghost_cells = []
+                grid_cells = []
+                num_walls = 0
+                for nx, ny in [(x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)]:
+                    # The edges of the board count as walls
+                    if ((nx < 0) or (nx >= self.width) or (ny < 0) or (ny >= self.height)):
+                        num_walls += 1
+                        continue
+                    grid_cells.append(ny * self.width + nx)
+                    if (self.game_map[ny][nx] == GameState.WALL):
+                        num_walls += 1
+                    else:
+                        ghost_cells.append(ny * self.width + nx)
+
+                cell = y * self.width + x
+                self.ghost_neighbors[cell] = ghost_cells
+                # Because Pac doesn't have to move, add current position as an option
+                self.pac_neighbors[cell] = ghost_cells + [cell]
+                self.wall_counts[cell] = num_walls
+                self.grid_neighbors[cell] = grid_cells
+
+        self.pac_neighbor_array = numpy.full((num_cells, 5), -1, dtype = numpy.int32)
+        self.ghost_neighbor_array = numpy.full((num_cells, 4), -1, dtype = numpy.int32)
+        self.grid_neighbor_array = numpy.full((num_cells, 4), -1, dtype = numpy.int32)
+        for cell in range(num_cells):
+            self.pac_neighbor_array[cell, :len(self.pac_neighbors[cell])] = self.pac_neighbors[cell]
+            self.ghost_neighbor_array[cell, :len(self.ghost_neighbors[cell])] = self.ghost_neighbors[cell]
+            self.grid_neighbor_array[cell, :len(self.grid_neighbors[cell])] = self.grid_neighbors[cell]
+        self.wall_count_array = numpy.array(self.wall_counts, dtype = numpy.uint8)
+
+
+    def zobrist_keys(self, num_agents):
+        """
+        Return a list of random 64-bit keys for every cell, per agent, for
+        hashing agent positions. The keys are drawn from a fixed seed, so
+        they don't disturb any game's random numbers.
+        """
+        if (len(self.cycle_keys) < num_agents):
+            rng = numpy.random.default_rng(len(self.cycle_keys))
+            num_cells = self.width * self.height
+            while (len(self.cycle_keys) < num_agents):
+                self.cycle_keys.append(rng.integers(0, 2 ** 63, size = num_cells).tolist())
+        return self.cycle_keys[:num_agents]
+
+
+    def maze_dist_file_path(self):
+        """
+        Return where the maze distance table of this map is cached.
+        """
+        return os.path.splitext(self.map_file_path)[0] + '_mazeDist.npy'
+
+
+    def load_maze_dist(self):
+        """
+        Load the all-pairs maze distance table of this map, memory-mapped
+        from the binary map corpus if it has one, or else from its cache
+        file. The table is built (and the cache written) if the cache is
+        missing or older than the map file.
+        """
+        if (self.corpus is not None):
+            self.maze_dist = self.corpus.maze_dist(self.map_index)
+            if (self.maze_dist is not None):
+                return
+
+        num_cells = self.width * self.height
+        cache_path = self.maze_dist_file_path()
+        try:
+            if (os.path.getmtime(cache_path) >= os.path.getmtime(self.map_file_path)):
+                maze_dist = numpy.load(cache_path, mmap_mode = 'r')
+                if ((maze_dist.shape == (num_cells, num_cells)) and (maze_dist.dtype == numpy.uint16)):
+                    # A plain array view of the mapping indexes faster than the memmap itself
+                    self.maze_dist = numpy.asarray(maze_dist)
+                    return
+        except OSError:
+            pass
+
+        self.maze_dist = self.build_maze_dist()
+        try:
+            numpy.save(cache_path, self.maze_dist)
+            self.maze_dist = numpy.asarray(numpy.load(cache_path, mmap_mode = 'r'))
+        except OSError:
+            print('Could not cache maze distances in', cache_path)
+
+
+    def build_maze_dist(self):
+        """
+        Return the maze distance (number of moves around walls) between
+        every pair of cells, from a breadth-first search out of every open
+        cell at once. Pairs with a wall or with no path between them get
+        the number of cells, which is longer than any path.
+        """
+        num_cells = self.width * self.height
+        if (num_cells >= numpy.iinfo(numpy.uint16).max):
+            print('Map too large for maze distances:', self.map_file_path)
+            sys.exit(1)
+
+        is_open = self.grid.ravel() != NumpyGameState.WALL
+        open_cells = numpy.flatnonzero(is_open)
+        maze_dist = numpy.full((num_cells, num_cells), num_cells, dtype = numpy.uint16)
+        maze_dist[open_cells, open_cells] = 0
+
+        # Send the -1 padding of the neighbor table to an extra column
+        # that is never in the frontier
+        neighbors = numpy.where(self.ghost_neighbor_array < 0, num_cells, self.ghost_neighbor_array)
+        frontier = numpy.zeros((num_cells, num_cells + 1), dtype = bool)
+        frontier[open_cells, open_cells] = True
+        reached = frontier[:, :num_cells].copy()
+
+        dist = 0
+        while (frontier.any()):
+            dist += 1
+            # A cell is reached this step if one of its neighbors was reached last step
+            new = frontier[:, neighbors].any(axis = 2)
+            new &= is_open
+            new &= ~reached
+            maze_dist[new] = dist
+            reached |= new
+            frontier[:, :num_cells] = new
+
+        return maze_dist
+
+
+    @staticmethod
+    def unpad_rows(neighbor_array):
+        """
+        Given a neighbor array padded with -1, return its rows as lists
+        without the padding.
+        """
+        lengths = (neighbor_array >= 0).sum(axis = 1).tolist()
+        return [row[:length] for row, length in zip(neighbor_array.tolist(), lengths)]
+
 
     @staticmethod
     def convert_row_string_to_list(row_string):
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import numpy
+
+
+class GameSnapshot:
+    """
+    What GameState.snapshot() captures: just the values that change
+    during a game. The map itself isn't copied; pills eaten after the
+    snapshot are found from the game's open-cell list, which only grows,
+    and put back on restore.
+    """
+    def __init__(self, game_state):
+        """
+        Capture the given game state between turns.
+        """
+        self.game_state = game_state
+        self.pacs_pos = list(game_state.pacs_pos)
+        self.ghosts_pos = list(game_state.ghosts_pos)
+        self.fruit_pos = game_state.fruit_pos
+        self.fruit_wait = game_state.fruit_wait
+        self.fruit_eaten = game_state.fruit_eaten
+        self.num_open_cells = len(game_state.open_cells)
+        self.num_pills_eaten = game_state.num_pills_eaten
+        self.num_moves = len(game_state.moves)
+        self.time = game_state.time
+        self.score = game_state.score
+        self.ghost_won = game_state.ghost_won
+        self.rng_state = game_state.rng.getstate()
+        self.agent_rng_state = game_state.agent_rng.getstate()
+        if (game_state.seed is None):
+            self.agent_generator_state = numpy.random.get_state()
+        else:
+            self.agent_generator_state = game_state.agent_generator.bit_generator.state
@@ -1,6 +1,13 @@
 # -*- coding: utf-8 -*-
 import random
 import copy
+import math
+import numpy
+import sys
+
+sys.path.append('code')
+from replay import Replay
+from gameSnapshot import GameSnapshot
 
 
 class GameState:
@@ -16,16 +23,45 @@ class GameState:
 
 
     def __init__(self, game_map_info, pill_density, time_multiplier,
-                 fruit_spawning_probability, fruit_score, num_pacs, num_ghosts):
+                 fruit_spawning_probability, fruit_score, num_pacs, num_ghosts,
+                 seed = None, fast_forward = False):
         """
         Set up the game state given initialization parameters as listed.
+
+        If a seed is given, the game draws from its own random generators
+        (one for pills and fruit, one for the controllers, and a numpy one
+        for controllers evaluating trees vectorized) so it plays out the
+        same no matter what else is going on. Otherwise it uses the global
+        random module and numpy's global generator.
+
+        If fast_forward is set, play_turn skips ahead through loops the
+        controllers settle into (see skip_cycle).
         """
+        # Random generators for the environment and for the controllers
+        self.seed = seed
+        if (seed is None):
+            self.rng = self.agent_rng = random
+            self.agent_generator = numpy.random
+        else:
+            _, self.rng, self.agent_rng, self.agent_generator = self.game_rngs(seed)
+
         # Establish member variables for given game map
-        self.game_map = copy.deepcopy(game_map_info.game_map)
+        self.game_map_info = game_map_info
+        self.game_map = self.copy_game_map(game_map_info)
         self.width = game_map_info.width
         self.height = game_map_info.height
         self.num_walls = game_map_info.num_walls
 
+        # Walls never change, so share the map's precomputed per-cell tables
+        game_map_info.build_cell_lists()
+        self.cell_x = game_map_info.cell_x
+        self.cell_y = game_map_info.cell_y
+        self.pac_neighbors = game_map_info.pac_neighbors
+        self.ghost_neighbors = game_map_info.ghost_neighbors
+        self.wall_counts = game_map_info.wall_counts
+        self.grid_neighbors = game_map_info.grid_neighbors
+        self.maze_dist = game_map_info.maze_dist  # None unless the maze sensors are in use
+
         # initialize time and fruit variables
         self.orig_time = self.time = int(time_multiplier * self.width * self.height)
         self.score = 0
@@ -33,18 +69,69 @@ class GameState:
         self.fruit_score = fruit_score
         self.fruit_eaten = 0
 
-        # Establish member variables for positions
-        self.pacs_pos = [[0, self.height - 1] for _ in range(num_pacs)]
-        self.ghosts_pos = [[self.width - 1, 0] for _ in range(num_ghosts)]
-        self.fruit_pos = [-1, -1]   # -1,-1 means not active
+        # Establish member variables for positions. Positions are cell
+        # indices (y * width + x); cell_x and cell_y give the coordinates.
+        self.pacs_pos = [(self.height - 1) * self.width for _ in range(num_pacs)]
+        self.ghosts_pos = [self.width - 1 for _ in range(num_ghosts)]
+        self.fruit_pos = -1   # -1 means not active
+
+        # Positions before the current turn's moves, to check for crossed paths.
+        # Filled in place every turn.
+        self.prev_pacs_pos = list(self.pacs_pos)
+        self.prev_ghosts_pos = list(self.ghosts_pos)
 
         # Put pills on the map
         self.orig_num_pills = self.put_pills(pill_density)
         self.num_pills_eaten = 0
+
+        # Turns to go until fruit spawns (see check_fruit)
+        self.fruit_wait = self.draw_fruit_wait(self.rng, self.fruit_spawning_probability)
         
         # Did the Ghost win?
         self.ghost_won = False
 
+        # Cells moved to each turn, Pacs then Ghosts (see get_replay)
+        self.moves = []
+
+        # Nearest-agent distances shared by all controllers within a turn,
+        # keyed by cell index (see turn_G and turn_M)
+        self.turn_ghost_dists = {}
+        self.turn_pac_dists = {}
+
+        # Cycle detection (see skip_cycle): Zobrist keys of every agent on
+        # every cell, and the turn each position hash was last seen since
+        # the last pill, fruit or fruit spawn
+        self.fast_forward = fast_forward
+        self.cycle_keys = None
+        if (fast_forward):
+            self.cycle_keys = game_map_info.zobrist_keys(num_pacs + num_ghosts)
+        self.cycle_history = {}
+        self.cycle_events = None
+
+
+    @staticmethod
+    def game_rngs(seed):
+        """
+        Given a game seed, return the game's random generators: one to pick
+        its map, one for pills and fruit, and one for the controllers, and
+        a numpy generator for controllers evaluating trees vectorized (see
+        ExprTree.evaluate). They are spread out from the seed
+        SeedSequence-style, so nearby seeds give unrelated streams.
+        """
+        map_seed, env_seed, agent_seed, agent_array_seed \
+            = numpy.random.SeedSequence(seed).generate_state(4, numpy.uint64).tolist()
+        return (random.Random(map_seed), random.Random(env_seed), random.Random(agent_seed),
+                numpy.random.default_rng(agent_array_seed))
+
+
+    @staticmethod
+    def copy_game_map(game_map_info):
+        """
+        Return a private copy of the given map's template that this game
+        can put pills on and eat them from.
+        """
+        return copy.deepcopy(game_map_info.game_map)
+
 
     def write_world_config(self, world_data):
         """
@@ -64,13 +151,13 @@ class GameState:
         # Write walls
         for y in range(self.height):
             for x in range(self.width):
-                if (self.game_map[y][x] == GameState.WALL):
+                if (self.game_map[y][x] == self.WALL):
                     world_data.append('w ' + str(x) + ' ' + str(y) + '\n')
 
         # Write pills
         for y in range(self.height):
             for x in range(self.width):
-                if (self.game_map[y][x] == GameState.PILL):
+                if (self.game_map[y][x] == self.PILL):
                     world_data.append('p ' + str(x) + ' ' + str(y) + '\n')
 
 
@@ -85,40 +172,224 @@ class GameState:
         """
         Write the positions of Pac and Ghosts to the saved world data.
         """
-        world_data.append('m ' + str(self.pacs_pos[0][0]) + ' ' + str(self.pacs_pos[0][1]) + '\n')
-        world_data.append('1 ' + str(self.ghosts_pos[0][0]) + ' ' + str(self.ghosts_pos[0][1]) + '\n')
-        world_data.append('2 ' + str(self.ghosts_pos[1][0]) + ' ' + str(self.ghosts_pos[1][1]) + '\n')
-        world_data.append('3 ' + str(self.ghosts_pos[2][0]) + ' ' + str(self.ghosts_pos[2][1]) + '\n')
+        cell_x = self.cell_x
+        cell_y = self.cell_y
+        world_data.append('m ' + str(cell_x[self.pacs_pos[0]]) + ' ' + str(cell_y[self.pacs_pos[0]]) + '\n')
+        world_data.append('1 ' + str(cell_x[self.ghosts_pos[0]]) + ' ' + str(cell_y[self.ghosts_pos[0]]) + '\n')
+        world_data.append('2 ' + str(cell_x[self.ghosts_pos[1]]) + ' ' + str(cell_y[self.ghosts_pos[1]]) + '\n')
+        world_data.append('3 ' + str(cell_x[self.ghosts_pos[2]]) + ' ' + str(cell_y[self.ghosts_pos[2]]) + '\n')
 
 
     def put_pills(self, pill_density):
         """
-        Given a pill density, place pills on the game map and pill list.
+        Given a pill density, place pills on the game map and pill list,
+        and list the cells left open.
 
         Returns number of pills placed.
         """
 
-        num_pills = 0
+        pill_cells = []
+        self.open_cells = []
         # Walk the list and determine for each eligible cell if it
         # will get a pill.
         for y in range(self.height):
             for x in range(self.width):
-                if ((self.pacs_pos[0] != [x, y])
-                    and (self.game_map[y][x] != GameState.WALL)
-                    and (random.random() < pill_density)):
-                    self.game_map[y][x] = GameState.PILL
-                    num_pills += 1
-        # print('Placed pills:', num_pills)
-        return num_pills
+                if (self.game_map[y][x] == self.WALL):
+                    continue
+                if ((self.pacs_pos[0] != y * self.width + x)
+                    and (self.rng.random() < pill_density)):
+                    self.game_map[y][x] = self.PILL
+                    pill_cells.append(y * self.width + x)
+                else:
+                    self.open_cells.append(y * self.width + x)
+        # print('Placed pills:', len(pill_cells))
+        self.build_pill_dist(pill_cells)
+        return len(pill_cells)
 
 
     def check_pill(self):
         """
-        If Pac is at a pill, count it as eaten and remove from the map and pill list.
+        If Pac is at a pill, count it as eaten and remove from the map and
+        the nearest-pill distance field. Its cell is open from now on.
         """
-        if (self.game_map[self.pacs_pos[0][1]][self.pacs_pos[0][0]] == GameState.PILL):
+        cell = self.pacs_pos[0]
+        if (self.game_map[self.cell_y[cell]][self.cell_x[cell]] == self.PILL):
             self.num_pills_eaten += 1
-            self.game_map[self.pacs_pos[0][1]][self.pacs_pos[0][0]] = GameState.OPEN
+            self.game_map[self.cell_y[cell]][self.cell_x[cell]] = self.OPEN
+            self.open_cells.append(cell)
+            self.remove_pill_dist(cell)
+
+
+    def build_pill_dist(self, pill_cells):
+        """
+        Given the cell indices (y * width + x) of all pills, build the
+        field holding each cell's Manhattan distance to its nearest pill.
+
+        Manhattan distance on the grid is the same as the step distance
+        through the grid ignoring walls, so two sweeps are enough.
+        Cells with no pill at all get width + height.
+        """
+        width = self.width
+        no_pill = self.width + self.height
+        dist = [no_pill] * (self.width * self.height)
+        for cell in pill_cells:
+            dist[cell] = 0
+
+        # Sweep from the lower left, pulling distances from left and below
+        for y in range(self.height):
+            row = y * width
+            for cell in range(row, row + width):
+                d = dist[cell]
+                if ((cell > row) and (dist[cell - 1] + 1 < d)): d = dist[cell - 1] + 1
+                if ((y > 0) and (dist[cell - width] + 1 < d)): d = dist[cell - width] + 1
+                dist[cell] = d
+
+        # Sweep from the upper right, pulling distances from right and above
+        for y in range(self.height - 1, -1, -1):
+            row = y * width
+            for cell in range(row + width - 1, row - 1, -1):
+                d = dist[cell]
+                if ((cell < row + width - 1) and (dist[cell + 1] + 1 < d)): d = dist[cell + 1] + 1
+                if ((y < self.height - 1) and (dist[cell + width] + 1 < d)): d = dist[cell + width] + 1
+                dist[cell] = d
+
+        self.pill_dist = dist
+
+        if (self.maze_dist is not None):
+            self.build_maze_pill_dist(pill_cells)
+
+
+    def add_pill_dist(self, pill_cell):
+        """
+        Update the nearest-pill distance field after a pill has been put
+        (back) in the given cell. Only cells that are now closer to a pill
+        are visited.
+        """
+        if (self.maze_dist is not None):
+            self.add_maze_pill_dist(pill_cell)
+
+        dist = self.pill_dist
+        dist[pill_cell] = 0
+        frontier = [pill_cell]
+        d = 0
+        while (len(frontier) > 0):
+            d += 1
+            next_frontier = []
+            for cell in frontier:
+                for neighbor in self.grid_neighbors[cell]:
+                    if (d < dist[neighbor]):
+                        dist[neighbor] = d
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+
+    def remove_pill_dist(self, pill_cell):
+        """
+        Update the nearest-pill distance field after the pill in the given
+        cell has been eaten. Only cells for which that pill was a nearest
+        pill are recalculated.
+        """
+        if (self.maze_dist is not None):
+            self.remove_maze_pill_dist(pill_cell)
+
+        dist = self.pill_dist
+        width = self.width
+        pill_x = pill_cell % width
+        pill_y = pill_cell // width
+
+        # Find the cells whose distance was measured to this pill. Walking
+        # outward from it, they form a connected region.
+        affected = [pill_cell]
+        in_region = {pill_cell}
+        for cell in affected:
+            for neighbor in self.grid_neighbors[cell]:
+                if ((neighbor not in in_region)
+                    and (dist[neighbor] == abs(neighbor % width - pill_x)
+                         + abs(neighbor // width - pill_y))):
+                    in_region.add(neighbor)
+                    affected.append(neighbor)
+
+        # Seed each affected cell from its unaffected neighbors, whose
+        # distances are still right, then spread through the region in
+        # order of increasing distance.
+        no_pill = self.width + self.height
+        buckets = [[] for _ in range(no_pill + 1)]
+        for cell in affected:
+            d = no_pill
+            for neighbor in self.grid_neighbors[cell]:
+                if ((neighbor not in in_region) and (dist[neighbor] + 1 < d)):
+                    d = dist[neighbor] + 1
+            dist[cell] = no_pill
+            buckets[d].append(cell)
+
+        for d in range(no_pill):
+            for cell in buckets[d]:
+                if (d < dist[cell]):
+                    dist[cell] = d
+                    for neighbor in self.grid_neighbors[cell]:
+                        if ((neighbor in in_region) and (d + 1 < dist[neighbor])):
+                            buckets[d + 1].append(neighbor)
+
+
+    def build_maze_pill_dist(self, pill_cells):
+        """
+        Given the cell indices of all pills, build the field holding each
+        cell's maze distance to its nearest pill, straight from the map's
+        maze distance table. Cells with no reachable pill get the number
+        of cells.
+        """
+        num_cells = self.width * self.height
+        self.maze_pills = numpy.zeros(num_cells, dtype = bool)
+        self.maze_pills[pill_cells] = True
+        if (self.maze_pills.any()):
+            self.maze_pill_dist = self.maze_dist[:, self.maze_pills].min(axis = 1).astype(numpy.int64)
+        else:
+            self.maze_pill_dist = numpy.full(num_cells, num_cells, dtype = numpy.int64)
+
+
+    def add_maze_pill_dist(self, pill_cell):
+        """
+        Update the nearest-pill maze distance field after a pill has been
+        put (back) in the given cell.
+        """
+        self.maze_pills[pill_cell] = True
+        numpy.minimum(self.maze_pill_dist, self.maze_dist[pill_cell], out = self.maze_pill_dist)
+
+
+    def remove_maze_pill_dist(self, pill_cell):
+        """
+        Update the nearest-pill maze distance field after the pill in the
+        given cell has been eaten. Only cells for which that pill was a
+        nearest pill are recalculated, against the remaining pills.
+        """
+        num_cells = self.width * self.height
+        self.maze_pills[pill_cell] = False
+        pill_row = self.maze_dist[pill_cell]
+        affected = numpy.flatnonzero((self.maze_pill_dist == pill_row) & (pill_row < num_cells))
+        if (len(affected) == 0):
+            return
+        pill_cells = numpy.flatnonzero(self.maze_pills)
+        if (len(pill_cells) > 0):
+            self.maze_pill_dist[affected] = self.maze_dist[numpy.ix_(affected, pill_cells)].min(axis = 1)
+        else:
+            self.maze_pill_dist[affected] = num_cells
+
+
+    @staticmethod
+    def sample_open_cell(rng, open_cells, pac_cell):
+        """
+        Given a random generator, the list of open cells, and Pac's cell
+        (which is always open), return a uniformly chosen open cell other
+        than Pac's, or -1 if there is none.
+        """
+        if (len(open_cells) <= 1):
+            return -1
+        # Pick among all but the last cell; if that's Pac's, the last
+        # cell stands in for it.
+        cell = open_cells[rng.randint(0, len(open_cells) - 2)]
+        if (cell == pac_cell):
+            cell = open_cells[-1]
+        return cell
 
 
     def put_fruit(self):
@@ -127,52 +398,66 @@ class GameState:
         """
         # If the number of open cells <= 1, we can't place the fruit.
         # Why 1? Because if there is only 1 open cell (before the game
-        # begins), Pac-Man must be in it.
-        num_opens = sum([curr_row.count(GameState.OPEN) \
-                              for curr_row in self.game_map])
-        if (num_opens <= 1):
-            print('No open cell for fruit')
+        # begins), Pac-Man must be in it. Then no fruit is placed, and
+        # play_turn tries again later.
+        cell = self.sample_open_cell(self.rng, self.open_cells, self.pacs_pos[0])
+        if (cell < 0):
             return
+        self.fruit_pos = cell
 
-        # Randomly place the fruit into an open cell.
-        placed = False
-        while (not placed):
-            x = random.randint(0, self.width - 1)
-            y = random.randint(0, self.height - 1)
-            if ((self.game_map[y][x] == GameState.OPEN) and
-                (self.pacs_pos[0] != [x, y])):
-                self.fruit_pos = [x, y]
-                placed = True
+
+    @staticmethod
+    def draw_fruit_wait(rng, fruit_spawning_probability):
+        """
+        Given a random generator and the per-turn fruit spawning
+        probability, return how many more turns without fruit go by before
+        fruit spawns, or -1 for never. This is the number of failed coin
+        flips before the first success, drawn all at once from the
+        geometric distribution.
+        """
+        if (fruit_spawning_probability <= 0):
+            return -1
+        if (fruit_spawning_probability >= 1):
+            return 0
+        return int(math.log(1.0 - rng.random()) / math.log(1.0 - fruit_spawning_probability))
 
 
-    def check_fruit(self, world_data):
+    def check_fruit(self, world_data = None):
         """
         If Pac is on fruit, count it as eaten and remove from the map.
 
-        Independently of the above, if a random number is under the
-        fruit spawning probability and there is no fruit on the board,
-        spawn fruit.
+        Then, if there is no fruit on the board, count down to the turn
+        fruit spawns and spawn it (and log it to world_data, if given).
+        That turn is drawn ahead of time whenever the board becomes
+        fruitless, which spawns fruit just as if a coin were flipped
+        against the fruit spawning probability every fruitless turn.
         """
 
         # Check for and handle collision with fruit
         if (self.pacs_pos[0] == self.fruit_pos):
             self.fruit_eaten += 1
-            self.fruit_pos = [-1, -1]
+            self.fruit_pos = -1
+            self.fruit_wait = self.draw_fruit_wait(self.rng, self.fruit_spawning_probability)
 
         # Check for and handle spawning new fruit
-        if ((random.random() < self.fruit_spawning_probability)
-            and (self.fruit_pos == [-1, -1])):
-            self.put_fruit()
-            if (self.fruit_pos != [-1, -1]):
-                world_data.append('f ' + str(self.fruit_pos[0]) + ' ' + str(self.fruit_pos[1]) + '\n')
+        if (self.fruit_pos == -1):
+            if (self.fruit_wait > 0):
+                self.fruit_wait -= 1
+            elif (self.fruit_wait == 0):
+                self.put_fruit()
+                if (self.fruit_pos == -1):
+                    # Nowhere to put it; try again from the next turn on
+                    self.fruit_wait = self.draw_fruit_wait(self.rng, self.fruit_spawning_probability)
+                elif (world_data is not None):
+                    world_data.append('f ' + str(self.cell_x[self.fruit_pos]) + ' '
+                                      + str(self.cell_y[self.fruit_pos]) + '\n')
 
 
-    @staticmethod
-    def manhattan_distance(pos1, pos2):
+    def manhattan_distance(self, pos1, pos2):
         """
-        Return the Manhattan distance between two positions.
+        Return the Manhattan distance between two positions (cells).
         """
-        return (abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1]))
+        return (abs(self.cell_x[pos1] - self.cell_x[pos2]) + abs(self.cell_y[pos1] - self.cell_y[pos2]))
 
 
     def G(self, pos, ghost_id = -1):
@@ -192,30 +477,10 @@ class GameState:
     def P(self, pos):
         """
         Given a position, return Manhattan distance to nearest pill.
+
+        Looked up from the distance field kept up to date as pills are eaten.
         """
-        # Check increasingly large "taxicab circles" around the given position
-        for radius in range(self.width + self.height):
-            for i in range(radius + 1):
-                if (((pos[0] - radius + i) >= 0)
-                    and ((pos[1] - i) >= 0)
-                    and self.game_map[pos[1] - i][pos[0] - radius + i] == GameState.PILL):
-                    return radius
-                if (((pos[0] - radius + i) >= 0)
-                    and ((pos[1] + i) < self.height)
-                    and self.game_map[pos[1] + i][pos[0] - radius + i] == GameState.PILL):
-                    return radius
-                if (((pos[0] + radius - i) < self.width)
-                    and ((pos[1] - i) >= 0)
-                    and self.game_map[pos[1] - i][pos[0] + radius - i] == GameState.PILL):
-                    return radius
-                if (((pos[0] + radius - i) < self.width)
-                    and ((pos[1] + i) < self.height)
-                    and self.game_map[pos[1] + i][pos[0] + radius - i] == GameState.PILL):
-                    return radius
-
-        # If we haven't found a pill... (should never get here!)
-        print('Didn''t find pill!')
-        return self.height + self.width
+        return self.pill_dist[pos]
 
 
     def W(self, pos):
@@ -224,49 +489,14 @@ class GameState:
 
         The edges of the board count as walls in this calculation.
         """
-
-        num_walls = 0
-
-        # Check up
-        if ((pos[1] < (self.height - 1))
-           and (self.game_map[pos[1] + 1][pos[0]] == GameState.WALL)):
-            num_walls += 1
-        # Check being at edge of map (implied wall)
-        if (pos[1] == (self.height - 1)):
-            num_walls += 1
-
-        # Check down
-        if ((pos[1] > 0)
-           and (self.game_map[pos[1] - 1][pos[0]] == GameState.WALL)):
-            num_walls += 1
-        # Check being at edge of map (implied wall)
-        if (pos[1] == 0):
-            num_walls += 1
-
-        # Check right
-        if ((pos[0] < (self.width - 1))
-           and (self.game_map[pos[1]][pos[0] + 1] == GameState.WALL)):
-            num_walls += 1
-        # Check being at edge of map (implied wall)
-        if (pos[0] == (self.width - 1)):
-            num_walls += 1
-
-        # Check left
-        if ((pos[0] > 0)
-           and (self.game_map[pos[1]][pos[0] - 1] == GameState.WALL)):
-            num_walls += 1
-        # Check being at edge of map (implied wall)
-        if (pos[0] == 0):
-            num_walls += 1
-
-        return num_walls
+        return self.wall_counts[pos]
 
 
     def F(self, pos):
         """
         Given a position, return Manhattan distance to nearest fruit
         """
-        if (self.fruit_pos == [-1, -1]):
+        if (self.fruit_pos == -1):
             return self.height + self.width
         return self.manhattan_distance(pos, self.fruit_pos)
 
@@ -285,45 +515,123 @@ class GameState:
         return dist_nearest
 
 
-    def get_valid_positions(self, pos, pac_or_ghost):
+    def G_maze(self, pos, ghost_id = -1):
         """
-        Given a position and whether it's for Pac or a Ghost,
-        return a list of valid possible positions for the next turn.
+        Same as G, but measured in moves around the walls.
+        """
+        maze_row = self.maze_dist[pos]
+        dist_nearest = 100000
+        for curr_ghost_id in range(len(self.ghosts_pos)):
+            if (curr_ghost_id != ghost_id):
+                curr_dist = int(maze_row[self.ghosts_pos[curr_ghost_id]])
+                if (curr_dist < dist_nearest): dist_nearest = curr_dist
+        return dist_nearest
+
+
+    def P_maze(self, pos):
+        """
+        Same as P, but measured in moves around the walls.
+        """
+        return int(self.maze_pill_dist[pos])
+
+
+    def F_maze(self, pos):
+        """
+        Same as F, but measured in moves around the walls. With no fruit
+        out, return the number of cells, which is longer than any path.
         """
-        positions = []
+        if (self.fruit_pos == -1):
+            return self.height * self.width
+        return int(self.maze_dist[pos, self.fruit_pos])
+
+
+    def M_maze(self, pos, pac_id = -1):
+        """
+        Same as M, but measured in moves around the walls.
+        """
+        maze_row = self.maze_dist[pos]
+        dist_nearest = 100000
+        for curr_pac_id in range(len(self.pacs_pos)):
+            if (curr_pac_id != pac_id):
+                curr_dist = int(maze_row[self.pacs_pos[curr_pac_id]])
+                if (curr_dist < dist_nearest): dist_nearest = curr_dist
+        return dist_nearest
 
-        # Check up
-        if ((pos[1] < (self.height - 1))
-           and (self.game_map[pos[1] + 1][pos[0]] != GameState.WALL)):
-            positions.append([pos[0], pos[1] + 1])
 
-        # Check down
-        if ((pos[1] > 0)
-           and (self.game_map[pos[1] - 1][pos[0]] != GameState.WALL)):
-            positions.append([pos[0], pos[1] - 1])
+    def nearest_two(self, pos, agents_pos):
+        """
+        Given a position and a list of agent positions, return the
+        Manhattan distance to the nearest agent, that agent's index, and
+        the distance to the nearest agent other than that one.
+        """
+        cell_x = self.cell_x
+        cell_y = self.cell_y
+        x = cell_x[pos]
+        y = cell_y[pos]
+        dist_nearest = dist_second = 100000
+        id_nearest = -1
+        for curr_id in range(len(agents_pos)):
+            curr_dist = abs(x - cell_x[agents_pos[curr_id]]) + abs(y - cell_y[agents_pos[curr_id]])
+            if (curr_dist < dist_nearest):
+                dist_second = dist_nearest
+                dist_nearest = curr_dist
+                id_nearest = curr_id
+            elif (curr_dist < dist_second):
+                dist_second = curr_dist
+        return (dist_nearest, id_nearest, dist_second)
 
-        # Check right
-        if ((pos[0] < (self.width - 1))
-           and (self.game_map[pos[1]][pos[0] + 1] != GameState.WALL)):
-            positions.append([pos[0] + 1, pos[1]])
 
-        # Check left
-        if ((pos[0] > 0)
-           and (self.game_map[pos[1]][pos[0] - 1] != GameState.WALL)):
-            positions.append([pos[0] - 1, pos[1]])
+    def turn_G(self, pos, ghost_id = -1):
+        """
+        Same as G, but shares the work with every other call made during
+        the current turn: the two nearest ghosts of each cell are found
+        once, which also answers the "excluding ghost k" variants.
 
-        # Because Pac doesn't have to move, add current position as an option
-        if (pac_or_ghost == 'pac'): positions.append(pos)
+        Only valid while controllers decide their moves.
+        """
+        nearest = self.turn_ghost_dists.get(pos)
+        if (nearest is None):
+            nearest = self.turn_ghost_dists[pos] = self.nearest_two(pos, self.ghosts_pos)
+        if (nearest[1] == ghost_id):
+            return nearest[2]
+        return nearest[0]
 
-        return positions
 
+    def turn_M(self, pos, pac_id = -1):
+        """
+        Same as M, sharing the work within the current turn like turn_G.
 
-    def check_ghosts(self, prev_pacs_pos, prev_ghosts_pos):
+        Only valid while controllers decide their moves.
+        """
+        nearest = self.turn_pac_dists.get(pos)
+        if (nearest is None):
+            nearest = self.turn_pac_dists[pos] = self.nearest_two(pos, self.pacs_pos)
+        if (nearest[1] == pac_id):
+            return nearest[2]
+        return nearest[0]
+
+
+    def get_valid_positions(self, pos, pac_or_ghost):
+        """
+        Given a position and whether it's for Pac or a Ghost,
+        return a list of valid possible positions for the next turn.
+
+        The list comes from the map's precomputed tables and is shared,
+        so callers must not modify it.
+        """
+        if (pac_or_ghost == 'pac'):
+            return self.pac_neighbors[pos]
+        return self.ghost_neighbors[pos]
+
+
+    def check_ghosts(self):
         """
         If Pac has run into a ghost, return the ghost number hit.
 
         Check for direct collisions and crossed paths / swapped positions.
         """
+        prev_pacs_pos = self.prev_pacs_pos
+        prev_ghosts_pos = self.prev_ghosts_pos
 
         # Check for direct collisions and crossed paths / swapped positions.
         for p in range(len(self.pacs_pos)):
@@ -351,18 +659,81 @@ class GameState:
         return self.score
 
 
-    def play_turn(self, world_data, pac_controllers, ghost_controllers):
+    def snapshot(self):
         """
-        Play a turn of a game given world_data to log world updates
-        and controllers for Pac and Ghosts.
+        Return a snapshot of the game between turns that restore() can
+        bring it back to, e.g. to try out moves and then undo them.
+        Costs about as much as copying the agent positions; the map isn't
+        copied.
         """
-        game_over = False
+        return GameSnapshot(self)
+
+
+    def restore(self, snapshot):
+        """
+        Bring the game back to the given snapshot of it. Every pill eaten
+        since is put back, and the random generators are rewound (the
+        global random module's and numpy's too, for games without a seed).
+
+        The snapshot must have been taken of this game and not be newer
+        than a snapshot restored since.
+        """
+        if (snapshot.game_state is not self):
+            print('Snapshot is of a different game')
+            sys.exit(1)
+
+        # Put back the pills eaten since: their cells are the ones opened
+        # up since, at the end of the open-cell list.
+        for cell in self.open_cells[snapshot.num_open_cells:]:
+            self.game_map[self.cell_y[cell]][self.cell_x[cell]] = self.PILL
+            self.add_pill_dist(cell)
+        del self.open_cells[snapshot.num_open_cells:]
+        del self.moves[snapshot.num_moves:]
 
+        self.pacs_pos[:] = snapshot.pacs_pos
+        self.ghosts_pos[:] = snapshot.ghosts_pos
+        self.fruit_pos = snapshot.fruit_pos
+        self.fruit_wait = snapshot.fruit_wait
+        self.fruit_eaten = snapshot.fruit_eaten
+        self.num_pills_eaten = snapshot.num_pills_eaten
+        self.time = snapshot.time
+        self.score = snapshot.score
+        self.ghost_won = snapshot.ghost_won
+        self.rng.setstate(snapshot.rng_state)
+        self.agent_rng.setstate(snapshot.agent_rng_state)
+        if (self.seed is None):
+            numpy.random.set_state(snapshot.agent_generator_state)
+        else:
+            self.agent_generator.bit_generator.state = snapshot.agent_generator_state
+
+        # The history may hold turns that haven't been played now
+        self.cycle_history.clear()
+        self.cycle_events = None
+
+
+    def get_replay(self):
+        """
+        Return a Replay of the game played so far. Only meaningful for
+        games set up with a seed on a pre-loaded map.
+        """
+        return Replay(self.game_map_info.map_index, self.seed,
+                      len(self.pacs_pos), len(self.ghosts_pos), self.moves)
+
+
+    def play_turn(self, pac_controllers, ghost_controllers, world_data = None):
+        """
+        Play a turn of a game given controllers for Pac and Ghosts, and
+        optionally world_data to log world updates to.
+
+        The cells moved to are recorded for get_replay.
+        """
         # Retain old positions to check for crossed paths later
-        prev_pacs_pos = copy.deepcopy(self.pacs_pos)
-        prev_ghosts_pos = copy.deepcopy(self.ghosts_pos)
+        self.prev_pacs_pos[:] = self.pacs_pos
+        self.prev_ghosts_pos[:] = self.ghosts_pos
 
-        # Decide next moves
+        # Decide next moves, sharing nearest-agent distances within the turn
+        self.turn_ghost_dists.clear()
+        self.turn_pac_dists.clear()
         for pac_controller in pac_controllers:
             pac_controller.decide_move(self)
         for ghost_controller in ghost_controllers:
@@ -374,14 +745,122 @@ class GameState:
         for ghost_controller in ghost_controllers:
             ghost_controller.execute_move(self)
 
+        # Record the moves
+        self.moves.extend(self.pacs_pos)
+        self.moves.extend(self.ghosts_pos)
+
+        game_over = self.finish_turn(world_data)
+
+        # Controllers that don't draw random numbers repeat themselves
+        # once the board repeats, so skip ahead through such loops.
+        # World data needs every turn played, so don't skip when logging.
+        if ((not game_over) and self.fast_forward and (world_data is None)
+            and all([controller.deterministic for controller in pac_controllers])
+            and all([controller.deterministic for controller in ghost_controllers])):
+            game_over = self.skip_cycle()
+
+        return game_over
+
+
+    def skip_cycle(self):
+        """
+        Called after a turn played by deterministic controllers. If the
+        agents are back where they were at an earlier turn with nothing
+        eaten or spawned in between, every turn from here on repeats the
+        turns since, until the game ends or fruit spawns. Jump straight to
+        whichever comes first, recording the repeated moves as if they
+        had been played.
+
+        Positions are hashed Zobrist-style (one random key per agent and
+        cell, XORed together). Pills and fruit are left out of the hash:
+        they only change by being eaten or spawned, and those events
+        start the history over, since no earlier board can come back.
+
+        Return whether the game is over.
+        """
+        events = (self.num_pills_eaten, self.fruit_eaten, self.fruit_pos)
+        if (events != self.cycle_events):
+            self.cycle_events = events
+            self.cycle_history.clear()
+
+        num_pacs = len(self.pacs_pos)
+        positions = self.pacs_pos + self.ghosts_pos
+        position_hash = 0
+        for agent in range(len(positions)):
+            position_hash ^= self.cycle_keys[agent][positions[agent]]
+
+        num_agents = len(positions)
+        turn = len(self.moves) // num_agents
+        prev_turn = self.cycle_history.get(position_hash)
+        self.cycle_history[position_hash] = turn
+        # Check the positions themselves in case of a hash collision
+        if ((prev_turn is None)
+            or (self.moves[(prev_turn - 1) * num_agents:prev_turn * num_agents] != positions)):
+            return False
+
+        # Turns that can be skipped: the rest of the game, unless fruit
+        # spawns before then; it does at the end of the turn after
+        # fruit_wait has counted down to 0.
+        num_skipped = self.time
+        if ((self.fruit_pos == -1) and (0 <= self.fruit_wait < num_skipped)):
+            num_skipped = self.fruit_wait
+        if (num_skipped == 0):
+            return False
+
+        # Repeat the moves of the loop
+        loop_moves = self.moves[prev_turn * num_agents:]
+        loop_length = turn - prev_turn
+        self.moves.extend(loop_moves * (num_skipped // loop_length))
+        self.moves.extend(loop_moves[:(num_skipped % loop_length) * num_agents])
+        last_turn = len(self.moves) - num_agents
+        self.pacs_pos[:] = self.moves[last_turn:last_turn + num_pacs]
+        self.ghosts_pos[:] = self.moves[last_turn + num_pacs:]
+        self.cycle_history.clear()
+
+        self.time -= num_skipped
+        if ((self.fruit_pos == -1) and (self.fruit_wait > 0)):
+            self.fruit_wait -= num_skipped
+        self.update_score()
+        return (self.time == 0)
+
+
+    def replay_turn(self, turn_moves, world_data = None):
+        """
+        Play a turn of a game with moves taken from a replay (the cells
+        moved to, Pacs first) instead of from controllers.
+        """
+        # Retain old positions to check for crossed paths later
+        self.prev_pacs_pos[:] = self.pacs_pos
+        self.prev_ghosts_pos[:] = self.ghosts_pos
+
+        # Execute the recorded moves
+        num_pacs = len(self.pacs_pos)
+        self.pacs_pos[:] = turn_moves[:num_pacs]
+        self.ghosts_pos[:] = turn_moves[num_pacs:]
+        self.moves.extend(turn_moves)
+
+        return self.finish_turn(world_data)
+
+
+    def finish_turn(self, world_data = None):
+        """
+        Once everyone has moved, run the clock, check for collisions, pills,
+        and fruit, and update the score. Log world updates to world_data,
+        if given.
+
+        Return whether the game is over.
+        """
+        game_over = False
+
         # Decrement time (yeah this is obvious but adding comment here is consistent)
         self.time -= 1
 
         # Update world data
-        self.write_world_positions(world_data)
+        if (world_data is not None):
+            self.write_world_positions(world_data)
 
         # Hit or crossed paths with a ghost? Game over.
-        ghost_hit = self.check_ghosts(prev_pacs_pos, prev_ghosts_pos)
+        ghost_hit = self.check_ghosts()
         if (ghost_hit > 0):
             game_over = True
 
@@ -392,7 +871,8 @@ class GameState:
 
         # Score update
         self.update_score()
-        self.write_world_time_score(world_data)
+        if (world_data is not None):
+            self.write_world_time_score(world_data)
 
         # Out of time? Game over.
         if (self.time == 0):
@@ -403,4 +883,3 @@ class GameState:
             game_over = True
 
         return game_over
-
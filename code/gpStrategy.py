@@ -1,12 +1,10 @@
 # -*- coding: utf-8 -*-
 import random
-import copy
 import traceback
 import sys
 
 sys.path.append('code')
 from strategy import Strategy
-from gameState import GameState
 from controllers import PacController, RandomGhostController
 from exprTree import Node, ExprTree
 
@@ -377,16 +375,17 @@ class GPStrategy(Strategy):
         Given a parent, return a mutated offspring
         """
         # Start with a copy of the parent
-        offspring = copy.deepcopy(parent)
+        offspring = parent.clone()
 
         # Randomly pick a node in the expression tree
-        selected_node = offspring.root.find_nth_node(random.randint(1, offspring.root.size))
+        selected_node = offspring.node_list()[random.randint(1, offspring.root.size) - 1]
 
         # Build a new (sub)tree there. Arbitrarily choose 'grow' method.
         self.build_tree(selected_node, selected_node.depth, 'grow')
 
-        # Reset the tree metrics we just screwed up
-        offspring.root.reset_metrics()
+        # Update the tree metrics we just screwed up: the new subtree and
+        # the path above it
+        offspring.update_metrics(selected_node, selected_node.parent, selected_node.depth)
 
         return offspring
 
@@ -396,15 +395,15 @@ class GPStrategy(Strategy):
         Given two parents, return two recombined offspring.
         """
         # Start with copies of the parents
-        offspring1 = copy.deepcopy(parent1)
-        offspring2 = copy.deepcopy(parent2)
+        offspring1 = parent1.clone()
+        offspring2 = parent2.clone()
 
         # Randomly pick nodes from each tree and swap them.
         match_found = False
         while (not(match_found)):
             # Pick a node in each tree
-            selected_node1 = offspring1.root.find_nth_node(random.randint(1, offspring1.root.size))
-            selected_node2 = offspring2.root.find_nth_node(random.randint(1, offspring2.root.size))
+            selected_node1 = offspring1.node_list()[random.randint(1, offspring1.root.size) - 1]
+            selected_node2 = offspring2.node_list()[random.randint(1, offspring2.root.size) - 1]
 
             # If the swap would cause either offspring to exceed Dmax,
             # try again.
@@ -414,16 +413,19 @@ class GPStrategy(Strategy):
             #     or ((selected_node2.depth + selected_node1.height) > self.dmax)):
             #     continue
 
-            # Match found -- make swap
+            # Match found -- make swap, remembering where each node sits
+            attach1, depth1 = selected_node1.parent, selected_node1.depth
+            attach2, depth2 = selected_node2.parent, selected_node2.depth
             temp_node = Node()
             temp_node.copy(selected_node1)
             selected_node1.copy(selected_node2)
             selected_node2.copy(temp_node)
             match_found = True
 
-        # Reset the tree metrics we just screwed up
-        offspring1.root.reset_metrics()
-        offspring2.root.reset_metrics()
+        # Update the tree metrics we just screwed up: the swapped subtrees
+        # and the paths above them
+        offspring1.update_metrics(selected_node1, attach1, depth1)
+        offspring2.update_metrics(selected_node2, attach2, depth2)
 
         return [offspring1, offspring2]
 
@@ -478,28 +480,18 @@ class GPStrategy(Strategy):
 
         Return score.
         """
-        # Pick a new map and set up a new game state.
-        game_map = self.experiment.pre_loaded_maps[random.randint(0, 99)]
-        self.experiment.world_data = []
-        game_state = GameState(game_map,
-                               self.experiment.pill_density,
-                               self.experiment.time_multiplier,
-                               self.experiment.fruit_spawning_probability,
-                               self.experiment.fruit_score,
-                               self.experiment.num_pacs,
-                               self.experiment.num_ghosts)
-        game_state.write_world_config(self.experiment.world_data)
-        game_state.write_world_time_score(self.experiment.world_data)
+        # Set up a new game state on a map picked with the game's own seed.
+        game_state = self.experiment.new_game_state()
 
         # Create a new Pac controller
-        self.pac_controllers[0] = PacController(0, pac_expr_tree)
+        self.pac_controllers[0] = PacController(0, pac_expr_tree, self.experiment.tree_eval)
 
         # While the game isn't over, play game turns.
         game_over = False
         while (not game_over):
-            game_over = game_state.play_turn(self.experiment.world_data,
-                                             self.pac_controllers,
+            game_over = game_state.play_turn(self.pac_controllers,
                                              self.ghost_controllers)
+        self.experiment.replay = game_state.get_replay()
 
         # Implement parsimony pressure
         fitness = 0
@@ -519,7 +511,7 @@ class GPStrategy(Strategy):
         for Pac and empty placeholder data for Ghost.
         """
         run_high_score = -1
-        run_best_world_data = None
+        run_best_replay = None
         run_best_solution = None
         evals_with_no_change = 0
 
@@ -530,7 +522,7 @@ class GPStrategy(Strategy):
         eval_count = 0
         for individual in population:
             individual.fitness, individual.score = self.execute_one_game(individual)
-            individual.world_data = self.experiment.world_data
+            individual.replay = self.experiment.replay
             eval_count += 1
 
             # Provide status message every nth evaluation.
@@ -546,7 +538,7 @@ class GPStrategy(Strategy):
             gen_high_score = -1
             gen_fitness_total = 0
             gen_score_total = 0
-            gen_best_world_data = None
+            gen_best_replay = None
             gen_best_solution = None
             gen_max_tree_height = -1
             gen_tree_height_total = 0
@@ -559,7 +551,7 @@ class GPStrategy(Strategy):
                 gen_score_total += individual.score
                 if (individual.score > gen_high_score):
                     gen_high_score = individual.score
-                    gen_best_world_data = individual.world_data
+                    gen_best_replay = individual.replay
                     gen_best_solution = str(individual.root)
                 gen_tree_height_total += individual.root.height
                 if (individual.root.height > gen_max_tree_height):
@@ -586,7 +578,7 @@ class GPStrategy(Strategy):
             if (gen_high_score > run_high_score):
                 run_high_score = gen_high_score
                 print('New run high score: ', run_high_score)
-                run_best_world_data = gen_best_world_data
+                run_best_replay = gen_best_replay
                 run_best_solution = gen_best_solution
 
             # Check for termination
@@ -613,7 +605,7 @@ class GPStrategy(Strategy):
             for individual in offspring:
                 individual.fitness, individual.score = \
                     self.execute_one_game(individual)
-                individual.world_data = self.experiment.world_data
+                individual.replay = self.experiment.replay
 
                 # Update termination variables
                 eval_count += 1
@@ -630,5 +622,5 @@ class GPStrategy(Strategy):
             population += offspring
             population = self.select_survivors(population)
 
-        return run_high_score, run_best_world_data, run_best_solution, 0, None
+        return run_high_score, run_best_replay, run_best_solution, 0, None
 
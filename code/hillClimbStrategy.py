@@ -4,7 +4,6 @@ import sys
 
 sys.path.append('code')
 from strategy import Strategy
-from gameState import GameState
 from controllers import PacController, RandomGhostController
 from exprTree import Node, ExprTree
 
@@ -27,18 +26,8 @@ class HillClimbStrategy(Strategy):
 
         Return score.
         """
-        # Pick a new map and set up a new game state.
-        game_map = self.experiment.pre_loaded_maps[random.randint(0, 99)]
-        self.experiment.world_data = []
-        game_state = GameState(game_map,
-                               self.experiment.pill_density,
-                               self.experiment.time_multiplier,
-                               self.experiment.fruit_spawning_probability,
-                               self.experiment.fruit_score,
-                               self.experiment.num_pacs,
-                               self.experiment.num_ghosts)
-        game_state.write_world_config(self.experiment.world_data)
-        game_state.write_world_time_score(self.experiment.world_data)
+        # Set up a new game state on a map picked with the game's own seed.
+        game_state = self.experiment.new_game_state()
 
         # Create a new Pac controller with a hard-coded expression tree
         # to add a weighted sum of G, P, W, and F.
@@ -57,14 +46,14 @@ class HillClimbStrategy(Strategy):
         add1_node = Node(expr = '+', left = g_node, right = p_node)
         add2_node = Node(expr = '+', left = w_node, right = f_node)
         root_node = Node(expr = '+', left = add1_node, right = add2_node)
-        self.pac_controllers[0] = PacController(0, ExprTree(root_node))
+        self.pac_controllers[0] = PacController(0, ExprTree(root_node), self.experiment.tree_eval)
 
         # While the game isn't over, play game turns.
         game_over = False
         while (not game_over):
-            game_over = game_state.play_turn(self.experiment.world_data,
-                                             self.pac_controllers,
+            game_over = game_state.play_turn(self.pac_controllers,
                                              self.ghost_controllers)
+        self.experiment.replay = game_state.get_replay()
 
         return game_state.score
 
@@ -77,7 +66,7 @@ class HillClimbStrategy(Strategy):
         for Pac and empty placeholder data for Ghost.
         """
         run_high_score = -2
-        run_best_world_data = None
+        run_best_replay = None
         run_best_solution = None
 
         # Hill Climbing method inspired heavily by https://en.wikipedia.org/wiki/Hill_climbing
@@ -104,7 +93,7 @@ class HillClimbStrategy(Strategy):
         while (curr_eval < self.experiment.num_fitness_evals_per_run):
             step_high_score = -1
             step_best_solution = None
-            step_best_world_data = None
+            step_best_replay = None
 
             # For each weight element, find adjustment that gets best result
             for i in range(len(weights)):
@@ -127,13 +116,13 @@ class HillClimbStrategy(Strategy):
                     if (curr_score > step_high_score):
                         step_high_score = curr_score
                         step_best_solution = str(self.pac_controllers[0].tree.root)
-                        step_best_world_data = self.experiment.world_data
+                        step_best_replay = self.experiment.replay
 
                     # Save best of run (so far) for logging
                     if (step_high_score > run_high_score):
                         run_high_score = step_high_score
                         run_best_solution = step_best_solution
-                        run_best_world_data = step_best_world_data
+                        run_best_replay = step_best_replay
                         print('New run high score: ', step_high_score)
                         self.experiment.log_file.write(str(curr_eval) + '\t' \
                                                        + str(step_high_score) + '\n')
@@ -152,5 +141,5 @@ class HillClimbStrategy(Strategy):
                   'wt', ['%0.2f' % i for i in weights],
                   'st', ['%0.2f' % i for i in step_sizes])
 
-        return run_high_score, run_best_world_data, run_best_solution, 0, None
+        return run_high_score, run_best_replay, run_best_solution, 0, None
 
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import collections
+import os
+import random
+import sys
+
+sys.path.append('code')
+from gameMapInfo import GameMapInfo
+from binaryMapCorpus import BinaryMapCorpus
+
+
+class MapCorpus:
+    """
+    The maps an experiment plays on. Maps are found up front but only
+    loaded when a game needs them, and kept in a bounded least recently
+    used cache, so a corpus can be far larger than what fits in memory.
+
+    The corpus path can be:
+        a directory:               every .txt map file in it, in natural order
+        a binary map corpus file:  see BinaryMapCorpus
+        a manifest:                a text file listing one map file path per
+                                   line, relative to the manifest's directory;
+                                   blank lines and lines starting with '#'
+                                   are skipped
+    """
+    def __init__(self, corpus_path, cache_size, maze_sensors = False):
+        """
+        Find the maps of the corpus. cache_size is the number of maps kept
+        loaded; maze_sensors says whether to load maze distance tables
+        along with the maps.
+        """
+        self.corpus_path = corpus_path
+        self.cache_size = cache_size
+        self.maze_sensors = maze_sensors
+        self.binary_corpus = None
+        self.map_file_paths = None
+
+        if (os.path.isdir(corpus_path)):
+            self.map_file_paths = BinaryMapCorpus.map_file_paths(corpus_path)
+        elif (BinaryMapCorpus.is_binary_map_corpus_file(corpus_path)):
+            self.binary_corpus = BinaryMapCorpus(corpus_path)
+        else:
+            self.map_file_paths = self.read_manifest(corpus_path)
+
+        if (self.binary_corpus is not None):
+            self.num_maps = self.binary_corpus.num_maps
+        else:
+            self.num_maps = len(self.map_file_paths)
+
+        # Loaded maps by index, least recently used first
+        self.cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+    @staticmethod
+    def read_manifest(manifest_path):
+        """
+        Return the map file paths listed in a manifest file.
+        """
+        manifest_dir = os.path.dirname(manifest_path)
+        map_file_paths = []
+        with open(manifest_path, 'r') as reader:
+            for line in reader:
+                line = line.strip()
+                if ((len(line) > 0) and (not line.startswith('#'))):
+                    map_file_paths.append(os.path.join(manifest_dir, line))
+        return map_file_paths
+
+
+    def get_map(self, map_index):
+        """
+        Return the GameMapInfo of the map with the given index, loading it
+        (and evicting the least recently used map if the cache is full) if
+        it isn't loaded.
+        """
+        map_info = self.cache.get(map_index)
+        if (map_info is not None):
+            self.hits += 1
+            self.cache.move_to_end(map_index)
+            return map_info
+
+        self.misses += 1
+        if (self.binary_corpus is not None):
+            map_info = self.binary_corpus.map_info(map_index)
+        else:
+            map_info = GameMapInfo(self.map_file_paths[map_index], map_index)
+        if (self.maze_sensors):
+            map_info.load_maze_dist()
+
+        self.cache[map_index] = map_info
+        if (len(self.cache) > self.cache_size):
+            self.cache.popitem(last = False)
+        return map_info
+
+
+    def random_map(self, rng = random):
+        """
+        Return a map picked uniformly at random from the corpus.
+        """
+        return self.get_map(rng.randint(0, self.num_maps - 1))
+
+
+    def cache_stats(self):
+        """
+        Return a line describing how well the map cache has done so far.
+        """
+        lookups = self.hits + self.misses
+        hit_rate = (100.0 * self.hits / lookups) if (lookups > 0) else 0.0
+        return ('map cache: ' + str(self.hits) + ' hits, ' + str(self.misses) + ' misses ('
+                + str(round(hit_rate, 1)) + '% hits), ' + str(len(self.cache)) + ' of '
+                + str(self.num_maps) + ' maps loaded')
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import numpy
+import sys
+
+sys.path.append('code')
+from gameState import GameState
+
+
+class NumpyGameState(GameState):
+    """
+    Game state whose map is a compact uint8 NumPy grid instead of a list
+    of lists of characters. Behaves like GameState otherwise; only the
+    methods that touch the whole map are replaced with vectorized ones.
+    """
+
+    # Name some elements of the game map (as grid codes)
+    OPEN = 0
+    WALL = 1
+    PILL = 2
+
+
+    @staticmethod
+    def copy_game_map(game_map_info):
+        """
+        Copy the map's uint8 template with a single ndarray copy.
+        """
+        return game_map_info.grid.copy()
+
+
+    def write_world_config(self, world_data):
+        """
+        Write the current state of the world to an array of strings.
+        Same output as GameState.write_world_config.
+        """
+
+        # Write dimensions
+        world_data.append(str(self.width) + '\n')
+        world_data.append(str(self.height) + '\n')
+
+        # Write Pac and Ghost positions
+        self.write_world_positions(world_data)
+
+        # Write walls, then pills, in row-major order
+        for code, prefix in [(NumpyGameState.WALL, 'w '), (NumpyGameState.PILL, 'p ')]:
+            ys, xs = numpy.nonzero(self.game_map == code)
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                world_data.append(prefix + str(x) + ' ' + str(y) + '\n')
+
+
+    def put_pills(self, pill_density):
+        """
+        Given a pill density, place pills on the game map with one
+        vectorized random mask, and list the cells left open.
+
+        The draws come from a numpy generator seeded from the game's own
+        (so a game seed still gives the same pills every time), not from
+        the game's generator cell by cell as in GameState.put_pills, so
+        the pills, and so the games, differ from the list engine's.
+
+        Returns number of pills placed.
+        """
+        cells = numpy.flatnonzero(self.game_map != NumpyGameState.WALL)
+        cells = cells[cells != self.pacs_pos[0]]
+        draws = numpy.random.default_rng(self.rng.getrandbits(64)).random(len(cells))
+        pill_mask = numpy.zeros(self.game_map.shape, dtype = bool)
+        pill_mask.flat[cells[draws < pill_density]] = True
+        self.game_map[pill_mask] = NumpyGameState.PILL
+        pill_cells = numpy.flatnonzero(pill_mask).tolist()
+        self.open_cells = numpy.flatnonzero(self.game_map == NumpyGameState.OPEN).tolist()
+        self.build_pill_dist(pill_cells)
+        return len(pill_cells)
+
+
+    def check_pill(self):
+        """
+        If Pac is at a pill, count it as eaten and remove from the map and
+        the nearest-pill distance field. Its cell is open from now on.
+        """
+        cell = self.pacs_pos[0]
+        pos = (self.cell_y[cell], self.cell_x[cell])
+        if (self.game_map[pos] == NumpyGameState.PILL):
+            self.num_pills_eaten += 1
+            self.game_map[pos] = NumpyGameState.OPEN
+            self.open_cells.append(cell)
+            self.remove_pill_dist(cell)
+
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import collections
+
+
+class OutcomeCache:
+    """
+    Outcomes of games already played in a run, so a game that would be
+    played again exactly (same Pac tree, same Ghost tree, same game seed)
+    can be skipped. Keys are (Pac tree hash, Ghost tree hash, game seed)
+    (see ExprTree.canonical_hash); seeded games draw RAND from their own
+    generators, so every pairing plays the same with the same seed.
+
+    Outcomes are kept in a bounded least recently used cache.
+    """
+    def __init__(self, cache_size):
+        """
+        Set up an empty cache holding at most cache_size outcomes.
+        """
+        self.cache_size = cache_size
+
+        # Outcomes by key, least recently used first
+        self.cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+    def get(self, key, need_replay = False):
+        """
+        Return the outcome stored for the given key, or None if there
+        isn't one. Outcomes are [score, time, orig_time, ghost_won,
+        replay]; with need_replay, an outcome stored without a replay
+        (from a batched game) is treated as missing, so only outcomes
+        that save a game count as hits.
+        """
+        outcome = self.cache.get(key)
+        if ((outcome is None) or (need_replay and (outcome[4] is None))):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.cache.move_to_end(key)
+        return outcome
+
+
+    def put(self, key, outcome):
+        """
+        Store the outcome of a game, evicting the least recently used
+        outcome if the cache is full.
+        """
+        self.cache[key] = outcome
+        self.cache.move_to_end(key)
+        if (len(self.cache) > self.cache_size):
+            self.cache.popitem(last = False)
+
+
+    def cache_stats(self):
+        """
+        Return a line describing how well the outcome cache has done so far.
+        """
+        lookups = self.hits + self.misses
+        hit_rate = (100.0 * self.hits / lookups) if (lookups > 0) else 0.0
+        return ('outcome cache: ' + str(self.hits) + ' hits, ' + str(self.misses) + ' misses ('
+                + str(round(hit_rate, 1)) + '% hits), ' + str(len(self.cache)) + ' of '
+                + str(self.cache_size) + ' outcomes stored')
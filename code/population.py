@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import copy
 
 class Population():
     """
@@ -30,7 +29,7 @@ class Population():
         # Per-run bookkeeping values
         self.run_high_fitness = float('-inf')
         self.run_high_score = float('-inf')
-        self.run_best_world_data = None
+        self.run_best_replay = None
         self.run_best_individual = None
         self.evals_with_no_change = 0
 
@@ -39,7 +38,7 @@ class Population():
         self.gen_high_score = float('-inf')
         self.gen_fitness_total = 0
         self.gen_score_total = 0
-        self.gen_best_world_data = None
+        self.gen_best_replay = None
         self.gen_best_individual = None
         self.gen_best_solution = None
         self.gen_max_tree_height = -1
@@ -56,7 +55,7 @@ class Population():
         self.best_individuals = []
         self.run_high_fitness = float('-inf')
         self.run_high_score = float('-inf')
-        self.run_best_world_data = None
+        self.run_best_replay = None
         self.run_best_solution = None
         self.evals_with_no_change = 0
 
@@ -103,7 +102,7 @@ class Population():
             self.gen_fitness_total += individual.fitness
             if (individual.fitness > self.gen_high_fitness):
                 self.gen_high_fitness = individual.fitness
-                self.gen_best_individual = copy.deepcopy(individual)
+                self.gen_best_individual = individual.clone()
             self.gen_score_total += individual.score
             if (individual.score > self.gen_high_score):
                 self.gen_high_score = individual.score
@@ -115,7 +114,7 @@ class Population():
                 self.gen_max_tree_size = individual.root.size
 
         # Save off best individual of the generation
-        self.best_individuals.append(copy.deepcopy(self.gen_best_individual))
+        self.best_individuals.append(self.gen_best_individual.clone())
 
 
     def update_logs(self, eval_count, experiment_log, parsimony_log):
@@ -4,7 +4,6 @@ import sys
 
 sys.path.append('code')
 from strategy import Strategy
-from gameState import GameState
 from controllers import PacController, RandomGhostController
 from exprTree import Node, ExprTree
 
@@ -23,18 +22,8 @@ class RandomStrategy(Strategy):
         """
         Execute one game / eval of a run. Return score.
         """
-        # Pick a new map and set up a new game state.
-        game_map = self.experiment.pre_loaded_maps[random.randint(0, 99)]
-        self.experiment.world_data = []
-        game_state = GameState(game_map,
-                               self.experiment.pill_density,
-                               self.experiment.time_multiplier,
-                               self.experiment.fruit_spawning_probability,
-                               self.experiment.fruit_score,
-                               self.experiment.num_pacs,
-                               self.experiment.num_ghosts)
-        game_state.write_world_config(self.experiment.world_data)
-        game_state.write_world_time_score(self.experiment.world_data)
+        # Set up a new game state on a map picked with the game's own seed.
+        game_state = self.experiment.new_game_state()
 
         # Create a new Pac controller with a hard-coded expression tree
         # to add a weighted sum of G, P, W, and F.
@@ -53,14 +42,14 @@ class RandomStrategy(Strategy):
         add1_node = Node(expr = '+', left = g_node, right = p_node)
         add2_node = Node(expr = '+', left = w_node, right = f_node)
         root_node = Node(expr = '+', left = add1_node, right = add2_node)
-        self.pac_controllers[0] = PacController(0, ExprTree(root_node))
+        self.pac_controllers[0] = PacController(0, ExprTree(root_node), self.experiment.tree_eval)
 
         # While the game isn't over, play game turns.
         game_over = False
         while (not game_over):
-            game_over = game_state.play_turn(self.experiment.world_data,
-                                             self.pac_controllers,
+            game_over = game_state.play_turn(self.pac_controllers,
                                              self.ghost_controllers)
+        self.experiment.replay = game_state.get_replay()
 
         return game_state.score
 
@@ -73,7 +62,7 @@ class RandomStrategy(Strategy):
         for Pac and empty placeholder data for Ghost.
         """
         run_high_score = -1
-        run_best_world_data = None
+        run_best_replay = None
         run_best_solution = None
 
         # Execute prescribed number of evaluations (games)
@@ -92,8 +81,8 @@ class RandomStrategy(Strategy):
                 print('New run high score: ', run_high_score)
                 self.experiment.log_file.write(str(curr_eval) + '\t' \
                                                + str(run_high_score) + '\n')
-                run_best_world_data = self.experiment.world_data
+                run_best_replay = self.experiment.replay
                 run_best_solution = str(self.pac_controllers[0].tree.root)
 
-        return run_high_score, run_best_world_data, run_best_solution, 0, None
+        return run_high_score, run_best_replay, run_best_solution, 0, None
 
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+
+class Replay:
+    """
+    Compact record of one game: which pre-loaded map it was played on,
+    the seed its game state was set up with, and the moves made. That is
+    enough to play the game again exactly, so the world text only needs
+    to be generated for the games we keep (see
+    Experiment.replay_to_world_file).
+    """
+    def __init__(self, map_index, seed, num_pacs, num_ghosts, moves):
+        """
+        moves holds, for each turn, the cell index (y * width + x) every
+        Pac and then every Ghost moved to.
+        """
+        self.map_index = map_index
+        self.seed = seed
+        self.num_pacs = num_pacs
+        self.num_ghosts = num_ghosts
+        self.moves = moves
+
+
+    def num_turns(self):
+        """
+        Return the number of turns played.
+        """
+        return len(self.moves) // (self.num_pacs + self.num_ghosts)
+
+
+    def turn_moves(self, turn):
+        """
+        Return the cells moved to on the given turn (0-based), Pacs first.
+        """
+        num_agents = self.num_pacs + self.num_ghosts
+        return self.moves[turn * num_agents:(turn + 1) * num_agents]
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import struct
+import sys
+
+import numpy
+
+sys.path.append('code')
+from exprTree import ExprTree
+from flatGenome import FlatGenome
+
+
+class TreeFile:
+    """
+    Reading and writing expression trees: the printed text form (one node
+    per line in preorder, indented with a pipe per level, as in solution
+    files) and a compact binary form for saving whole populations every
+    generation.
+
+    A population file holds the populations of one run, one record per
+    generation, all little-endian:
+        header:        magic, version
+        record:        generation number, number of trees, then for
+                       every tree
+        tree:          number of nodes, fitness and score (float64), the
+                       opcode of every node in preorder (int8, see
+                       FlatGenome.OPCODES), then the constant of every
+                       constant node in the same order (float64), then
+                       their kinds (int8, see FlatGenome.INT_CONSTANT)
+
+    Trees read back print, evaluate and hash the same as the trees
+    written.
+    """
+
+    MAGIC = b'PPOP'
+    VERSION = 2
+    HEADER = struct.Struct('<4sH')
+    RECORD = struct.Struct('<II')
+    TREE = struct.Struct('<Idd')
+
+
+    @staticmethod
+    def write_text(tree, writer):
+        """
+        Write the printed form of the tree to an open text file, a line
+        at a time.
+        """
+        writer.writelines(tree.root.text_lines())
+
+
+    @staticmethod
+    def read_text(lines, genome = 'tree'):
+        """
+        Return the ExprTree in the printed form read from the given lines
+        (an open text file will do), with linked Nodes ('tree') or a
+        FlatGenome ('flat') as its root. Raise ValueError if the lines
+        aren't one tree (see FlatGenome.from_text).
+        """
+        root = FlatGenome.from_text(lines)
+        if (genome == 'tree'):
+            root = root.to_node()
+        return ExprTree(root)
+
+
+    @staticmethod
+    def write_header(writer):
+        """
+        Write the header of a population file to a file opened for
+        binary writing.
+        """
+        writer.write(TreeFile.HEADER.pack(TreeFile.MAGIC, TreeFile.VERSION))
+
+
+    @staticmethod
+    def write_population(writer, generation, individuals):
+        """
+        Append the record of one generation's population (a list of
+        ExprTree) to a population file.
+        """
+        parts = [TreeFile.RECORD.pack(generation, len(individuals))]
+        for individual in individuals:
+            genome = individual.root
+            if (not isinstance(genome, FlatGenome)):
+                genome = FlatGenome.from_node(genome)
+            parts.append(TreeFile.TREE.pack(genome.size, individual.fitness, individual.score))
+            parts.append(genome.ops.tobytes())
+            is_constant = (genome.ops == FlatGenome.CONSTANT)
+            parts.append(genome.constants[is_constant].astype('<f8').tobytes())
+            parts.append(genome.kinds[is_constant].tobytes())
+        writer.write(b''.join(parts))
+
+
+    @staticmethod
+    def read_populations(file_path, genome = 'tree'):
+        """
+        Read a population file, yielding the generation number and the
+        population (a list of ExprTree, with fitness and score restored)
+        of every record in order. Trees have linked Nodes ('tree') or a
+        FlatGenome ('flat') as their roots. Raise ValueError if the file
+        isn't a population file or is corrupt.
+        """
+        with open(file_path, 'rb') as the_file:
+            data = the_file.read()
+
+        if (len(data) < TreeFile.HEADER.size):
+            raise ValueError('not a population file')
+        magic, version = TreeFile.HEADER.unpack_from(data, 0)
+        if (magic != TreeFile.MAGIC):
+            raise ValueError('not a population file')
+        if (version != TreeFile.VERSION):
+            raise ValueError('unsupported population file version ' + str(version))
+
+        offset = TreeFile.HEADER.size
+        try:
+            while (offset < len(data)):
+                generation, num_trees = TreeFile.RECORD.unpack_from(data, offset)
+                offset += TreeFile.RECORD.size
+                individuals = []
+                for _ in range(num_trees):
+                    num_nodes, fitness, score = TreeFile.TREE.unpack_from(data, offset)
+                    offset += TreeFile.TREE.size
+                    ops = numpy.frombuffer(data, dtype = numpy.int8, count = num_nodes,
+                                           offset = offset).copy()
+                    offset += num_nodes
+                    if (not FlatGenome.is_well_formed(ops.tolist())):
+                        raise ValueError('malformed tree in generation ' + str(generation))
+                    is_constant = (ops == FlatGenome.CONSTANT)
+                    num_constants = int(numpy.count_nonzero(is_constant))
+                    constants = numpy.zeros(num_nodes, dtype = numpy.float64)
+                    constants[is_constant] = numpy.frombuffer(data, dtype = '<f8',
+                                                              count = num_constants, offset = offset)
+                    offset += 8 * num_constants
+                    kinds = numpy.zeros(num_nodes, dtype = numpy.int8)
+                    kinds[is_constant] = numpy.frombuffer(data, dtype = numpy.int8,
+                                                          count = num_constants, offset = offset)
+                    offset += num_constants
+
+                    root = FlatGenome(ops, constants, kinds = kinds)
+                    if (genome == 'tree'):
+                        root = root.to_node()
+                    individual = ExprTree(root)
+                    individual.fitness = fitness
+                    individual.score = score
+                    individuals.append(individual)
+                yield generation, individuals
+        except struct.error:
+            raise ValueError('population file ends early')
+
+
+if __name__ == '__main__':
+    # Print the trees of a population file, every generation or just the
+    # one given, or check and echo a tree in text form.
+    if (len(sys.argv) < 2 or len(sys.argv) > 3):
+        print('use: python3 treeFile.py populationFile [generation]')
+        print('     python3 treeFile.py treeFile')
+        sys.exit(1)
+    with open(sys.argv[1], 'rb') as the_file:
+        is_population_file = (the_file.read(len(TreeFile.MAGIC)) == TreeFile.MAGIC)
+    try:
+        if (is_population_file):
+            for generation, individuals in TreeFile.read_populations(sys.argv[1], genome = 'flat'):
+                if (len(sys.argv) == 3 and generation != int(sys.argv[2])):
+                    continue
+                for num, individual in enumerate(individuals):
+                    print('# Generation', generation, 'tree', num, 'fitness', individual.fitness,
+                          'score', individual.score)
+                    TreeFile.write_text(individual, sys.stdout)
+        else:
+            with open(sys.argv[1], 'r') as the_file:
+                TreeFile.write_text(TreeFile.read_text(the_file, genome = 'flat'), sys.stdout)
+    except ValueError as error:
+        print(sys.argv[1] + ':', error)
+        sys.exit(1)
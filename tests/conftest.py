@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import math
+import os
+import random
+import sys
+
+import pytest
+
+# The modules import each other from code/, and tools/ holds treeCheck
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'code'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from ccegpStrategy import CCEGPStrategy
+from controllers import PacController, GhostController
+from experiment import Experiment
+from exprTree import ExprTree
+from flatGenome import FlatGenome
+from gameMapInfo import GameMapInfo
+from gameState import GameState
+
+
+MAPS = os.path.join(ROOT, 'maps')
+NUM_GHOSTS = 3
+
+
+@pytest.fixture
+def map_paths():
+    """
+    Paths of a few of the shipped maps.
+    """
+    return [os.path.join(MAPS, 'map' + str(i) + '.txt') for i in range(4)]
+
+
+@pytest.fixture
+def map_infos(map_paths):
+    """
+    The GameMapInfo of each of map_paths.
+    """
+    return [GameMapInfo(path, index) for index, path in enumerate(map_paths)]
+
+
+def random_genome(seed, functions = None, terminals = None):
+    """
+    Return a random genome (see FlatGenome.random_genome) of random depth
+    and method, drawn entirely from the given seed.
+    """
+    rng = random.Random(seed)
+    return FlatGenome.random_genome(functions or ExprTree.functions,
+                                    terminals or ExprTree.ghost_terminals,
+                                    0, rng.randint(0, 7), rng.choice(['grow', 'full']), rng)
+
+
+def sensor_values(rng):
+    """
+    Return a random gpwfm list of sensor values.
+    """
+    return [rng.randint(0, 40) for _ in range(len(ExprTree.terminal_indices))]
+
+
+def same_value(a, b):
+    """
+    Return whether two tree values are the same, type included (nan
+    matching nan).
+    """
+    if (type(a) != type(b)):
+        return False
+    if (isinstance(a, float) and math.isnan(a)):
+        return math.isnan(b)
+    return (a == b)
+
+
+def node_metrics(root):
+    """
+    Return every node of a tree of linked Nodes, in preorder, as its
+    expression, constant, metrics and the preorder index of its parent.
+    """
+    nodes = []
+    to_visit = [root]
+    while (len(to_visit) > 0):
+        node = to_visit.pop()
+        nodes.append(node)
+        if (node.expr in ExprTree.functions):
+            to_visit += [node.right, node.left]
+    index = {id(node): k for k, node in enumerate(nodes)}
+    return [(node.expr, node.constant, node.depth, node.height, node.size, node.terminal_mask,
+             None if (node.parent is None) else index[id(node.parent)])
+            for node in nodes]
+
+
+def new_game_state(map_infos, seed, game_state_class = GameState, fast_forward = False):
+    """
+    Set up a game with the default settings on a map picked by its seed.
+    """
+    return game_state_class(map_infos[seed % len(map_infos)], 0.5, 2, 0.01, 10, 1, NUM_GHOSTS,
+                            seed, fast_forward)
+
+
+def trees(seed, functions = None):
+    """
+    Return the Pac and Ghost trees of a game.
+    """
+    pac = ExprTree(random_genome(1000 + seed, functions, ExprTree.pac_terminals).to_node())
+    ghost = ExprTree(random_genome(2000 + seed, functions, ExprTree.ghost_terminals).to_node())
+    return pac, ghost
+
+
+def play(game_state, pac_tree, ghost_tree, world_data = None, tree_eval = 'compiled'):
+    """
+    Play a game to the end and return its score, time and winner.
+    """
+    pacs = [PacController(0, pac_tree, tree_eval)]
+    ghosts = [GhostController(i, ghost_tree, tree_eval) for i in range(NUM_GHOSTS)]
+    if (world_data is not None):
+        game_state.write_world_config(world_data)
+        game_state.write_world_time_score(world_data)
+    while (not game_state.play_turn(pacs, ghosts, world_data)):
+        pass
+    return game_state.score, game_state.time, game_state.ghost_won
+
+
+def new_ccegp_strategy(tmp_path, monkeypatch, basic_lines = [], ccegp_lines = []):
+    """
+    Set up a CCEGP strategy from the given basic_options and
+    ccegp_options lines, writing its files under tmp_path.
+    """
+    monkeypatch.chdir(str(tmp_path))
+    os.mkdir('logs')
+    os.mkdir('data')
+    with open('test.cfg', 'w') as writer:
+        writer.write('[basic_options]\nmap_corpus_path = ' + MAPS + '\n'
+                     + ''.join([line + '\n' for line in basic_lines])
+                     + '[ccegp_options]\n' + ''.join([line + '\n' for line in ccegp_lines]))
+    experiment = Experiment('test.cfg')
+    experiment.load_map_corpus()
+    return CCEGPStrategy(experiment)
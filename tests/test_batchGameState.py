@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from batchGameState import BatchGameState
+from conftest import new_game_state, play, trees
+from exprTree import ExprTree, Node
+
+
+SEEDS = range(8)
+
+
+@pytest.mark.parametrize('tree_eval, functions', [('compiled', None),
+                                                  ('compiled', ['+', '-', '*', '/']),
+                                                  ('vectorized', ['+', '-', '*', '/'])])
+def test_batch_matches_serial(map_infos, tree_eval, functions):
+    pairings = [trees(seed, functions) for seed in SEEDS]
+    # The same trees playing more than one game share remembered values
+    pairings += pairings[:3]
+    seeds = list(SEEDS) + [100, 101, 102]
+    serial = [play(new_game_state(map_infos, seed), pac, ghost, tree_eval = tree_eval)
+              for seed, (pac, ghost) in zip(seeds, pairings)]
+    batch = BatchGameState([new_game_state(map_infos, seed) for seed in seeds],
+                           [pac for pac, _ in pairings], [ghost for _, ghost in pairings], tree_eval)
+    batch.play()
+    assert serial == [(int(batch.score[i]), int(batch.time[i]), bool(batch.ghost_won[i]))
+                      for i in range(len(serial))]
+
+
+def power_tree(sensor, depth):
+    """
+    Return a tree multiplying the given sensor by itself 2 ** depth times.
+    """
+    def power(depth):
+        if (depth == 0):
+            return Node(sensor)
+        return Node('*', power(depth - 1), power(depth - 1))
+    tree = ExprTree(power(depth))
+    tree.reset_metrics()
+    return tree
+
+
+def test_batch_matches_serial_beyond_float_precision(map_infos):
+    # Integers too large to compare exactly as floats
+    pairings = [(power_tree('P', 6), power_tree('M', 5)) for _ in SEEDS]
+    serial = [play(new_game_state(map_infos, seed), pac, ghost)
+              for seed, (pac, ghost) in zip(SEEDS, pairings)]
+    batch = BatchGameState([new_game_state(map_infos, seed) for seed in SEEDS],
+                           [pac for pac, _ in pairings], [ghost for _, ghost in pairings])
+    batch.play()
+    assert serial == [(int(batch.score[i]), int(batch.time[i]), bool(batch.ghost_won[i]))
+                      for i in range(len(serial))]
+
+
+def test_batch_pill_dist_matches_games(map_infos):
+    # The batch's distance fields follow its games' pills as they are eaten
+    pairings = [trees(seed) for seed in SEEDS]
+    batch = BatchGameState([new_game_state(map_infos, seed) for seed in SEEDS],
+                           [pac for pac, _ in pairings], [ghost for _, ghost in pairings])
+    eaten = batch.num_pills_eaten.copy()
+    while (batch.step() > 0):
+        for i in (batch.num_pills_eaten != eaten).nonzero()[0].tolist():
+            game_state = batch.game_states[i]
+            num_cells = game_state.width * game_state.height
+            pills = batch.pills[i, :num_cells].nonzero()[0].tolist()
+            fresh = new_game_state(map_infos, SEEDS[i])
+            fresh.build_pill_dist(pills)
+            assert batch.pill_dist[i, :num_cells].tolist() == fresh.pill_dist
+        eaten = batch.num_pills_eaten.copy()
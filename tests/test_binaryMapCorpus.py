@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from binaryMapCorpus import BinaryMapCorpus
+from conftest import new_game_state, play, trees
+
+
+def test_map_corpus_matches_map_files(map_paths, map_infos, tmp_path):
+    corpus_path = str(tmp_path / 'corpus.bin')
+    BinaryMapCorpus.compile(map_paths, corpus_path)
+    corpus = BinaryMapCorpus(corpus_path)
+    for index, info in enumerate(map_infos):
+        corpus_info = corpus.map_info(index)
+        corpus_info.build_cell_lists()
+        info.build_cell_lists()
+        assert corpus_info.map_file_path == info.map_file_path
+        assert (corpus_info.width, corpus_info.height, corpus_info.num_walls) \
+            == (info.width, info.height, info.num_walls)
+        assert corpus_info.game_map == info.game_map
+        assert (corpus_info.grid == info.grid).all()
+        for table in ['cell_x', 'cell_y', 'pac_neighbors', 'ghost_neighbors', 'wall_counts',
+                      'grid_neighbors']:
+            assert getattr(corpus_info, table) == getattr(info, table)
+        for table in ['pac_neighbor_array', 'ghost_neighbor_array', 'grid_neighbor_array',
+                      'wall_count_array']:
+            assert (getattr(corpus_info, table) == getattr(info, table)).all()
+
+    # Games on a corpus map play the same as on the map file
+    pac, ghost = trees(0)
+    assert (play(new_game_state([corpus.map_info(0)], 0), pac, ghost)
+            == play(new_game_state(map_infos[:1], 0), pac, ghost))
+
+
+def test_map_corpus_maze_dist(map_paths, map_infos, tmp_path):
+    corpus_path = str(tmp_path / 'corpus.bin')
+    BinaryMapCorpus.compile(map_paths[:2], corpus_path, with_maze_dist = True)
+    corpus = BinaryMapCorpus(corpus_path)
+    for index in range(2):
+        corpus_info = corpus.map_info(index)
+        corpus_info.load_maze_dist()
+        assert (corpus_info.maze_dist == map_infos[index].build_maze_dist()).all()
+
+    # Without them, they are missing rather than wrong
+    BinaryMapCorpus.compile(map_paths[:1], corpus_path)
+    assert BinaryMapCorpus(corpus_path).maze_dist(0) is None
+
+
+def test_not_a_map_corpus_is_rejected(map_paths):
+    assert not BinaryMapCorpus.is_binary_map_corpus_file(map_paths[0])
+    with pytest.raises(ValueError):
+        BinaryMapCorpus(map_paths[0])
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from binaryWorld import BinaryWorld, BinaryWorldReader
+from conftest import new_game_state, play, trees
+
+
+SEEDS = range(6)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_binary_world_round_trip(map_infos, seed, tmp_path):
+    pac, ghost = trees(seed)
+    world_data = []
+    play(new_game_state(map_infos, seed), pac, ghost, world_data)
+
+    world = BinaryWorld.from_world_data(world_data)
+    assert world.to_world_data() == world_data
+    file_path = str(tmp_path / 'world.bin')
+    world.write(file_path)
+    assert BinaryWorld.is_binary_world_file(file_path)
+    assert BinaryWorld.read(file_path).to_world_data() == world_data
+
+    # Jumping to any turn gives the same as reading them all in order
+    reader = BinaryWorldReader(file_path)
+    turns = list(reader.read_turns())
+    assert [reader.read_turn(turn) for turn in range(len(turns))] == turns
+    reader.close()
+
+
+@pytest.mark.parametrize('width, height', [(256, 256), (300, 300), (5, 13108)])
+def test_too_many_cells_are_rejected(width, height):
+    world = BinaryWorld(width, height, [[0, 0], [width - 1, height - 1]], 1, set(), set(), 100, 0)
+    with pytest.raises(ValueError):
+        world.to_bytes()
+
+
+def test_largest_map_round_trip(tmp_path):
+    # The last cell of the largest map still fits
+    world = BinaryWorld(5, 13107, [[0, 0], [4, 13106]], 1, {1, 2}, {3, 65534}, 100, 0)
+    world.add_turn([[1, 0], [4, 13105]], None, 99, 5)
+    world.add_turn([[0, 0], [4, 13106]], [3, 13106], 98, 5)
+    file_path = str(tmp_path / 'world.bin')
+    world.write(file_path)
+    assert BinaryWorld.read(file_path).to_world_data() == world.to_world_data()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import copy
+import pickle
+
+import pytest
+
+from conftest import node_metrics, random_genome
+from exprTree import ExprTree
+
+
+SEEDS = range(50)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_clone_is_independent_copy(seed):
+    tree = ExprTree(random_genome(seed).to_node())
+    tree.fitness = 12.5
+    tree.score = 40
+    clone = tree.clone()
+    assert (clone.fitness, clone.score) == (tree.fitness, tree.score)
+    # Same nodes, with metrics set as reset_metrics sets them
+    assert node_metrics(clone.root) == node_metrics(tree.root)
+    assert clone.root.parent is None
+
+    node = clone.node_list()[-1]
+    node.expr = 'constant'
+    node.constant = 123.0
+    clone.update_metrics(node, node.parent, node.depth)
+    assert '123.0' not in str(tree.root)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_flat_clone_is_independent_copy(seed):
+    genome = random_genome(seed)
+    clone = genome.clone()
+    assert str(clone) == str(genome)
+    clone.ops[-1] = clone.CONSTANT
+    clone.constants[-1] = 123.0
+    assert '123.0' not in str(genome)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_deepcopy_and_pickle_match_clone(seed):
+    tree = ExprTree(random_genome(seed).to_node())
+    tree.fitness = 3.0
+    tree.compile()
+    for other in [copy.deepcopy(tree), pickle.loads(pickle.dumps(tree))]:
+        assert node_metrics(other.root) == node_metrics(tree.clone().root)
+        assert other.fitness == tree.fitness
+        # Compiled functions aren't copied
+        assert other.compiled is None
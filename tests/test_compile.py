@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from conftest import random_genome, same_value, sensor_values
+from exprTree import ExprTree
+
+
+SEEDS = range(300)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_compiled_matches_calc(seed):
+    tree = ExprTree(random_genome(seed).to_node())
+    gpwfm = sensor_values(random.Random(seed))
+    calc_rng = random.Random(seed)
+    compiled_rng = random.Random(seed)
+    assert same_value(tree.root.calc(gpwfm, calc_rng), tree.compile()(gpwfm, compiled_rng))
+    # RAND draws the same numbers in the same order
+    assert calc_rng.random() == compiled_rng.random()
+
+
+def test_compiled_function_is_cached():
+    tree = ExprTree(random_genome(0).to_node())
+    assert tree.compile() is tree.compile()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import collections
+import random
+
+import pytest
+
+from conftest import new_ccegp_strategy, random_genome
+from exprTree import ExprTree
+from flatGenome import FlatGenome
+
+
+DMAX = 6
+
+
+@pytest.fixture
+def strategy(tmp_path, monkeypatch):
+    return new_ccegp_strategy(tmp_path, monkeypatch, ccegp_lines = ['pac_dmax_overall = ' + str(DMAX)])
+
+
+def depths_heights(seed):
+    """
+    Return the depth and height of every node of a random tree, in
+    node_list order.
+    """
+    tree = ExprTree(random_genome(seed).to_node())
+    nodes = tree.node_list()
+    return [node.depth for node in nodes], [node.height for node in nodes]
+
+
+def fitting_pairs(depths1, heights1, depths2, heights2):
+    return [(k1, k2) for k1 in range(len(depths1)) for k2 in range(len(depths2))
+            if (((depths1[k1] + heights2[k2]) <= DMAX) and ((depths2[k2] + heights1[k1]) <= DMAX))]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_crossover_pair_fits_within_dmax(strategy, seed):
+    trees = depths_heights(seed) + depths_heights(1000 + seed)
+    # Trees already deeper than Dmax swap roots
+    pairs = set(fitting_pairs(*trees)) or {(0, 0)}
+    random.seed(seed)
+    for _ in range(200):
+        assert strategy.sample_crossover_pair(strategy.pac_pop, *trees) in pairs
+
+
+# Trees where some pairs don't fit
+@pytest.mark.parametrize('seed1, seed2', [(1, 1002), (4, 1002), (1002, 1006)])
+def test_crossover_pair_is_uniform(strategy, seed1, seed2):
+    trees = depths_heights(seed1) + depths_heights(seed2)
+    pairs = fitting_pairs(*trees)
+    assert len(pairs) < len(trees[0]) * len(trees[2])
+    num_draws = 300 * len(pairs)
+    random.seed(seed1)
+    counts = collections.Counter(strategy.sample_crossover_pair(strategy.pac_pop, *trees)
+                                 for _ in range(num_draws))
+    assert set(counts) == set(pairs)
+    # Each pair is drawn 300 times on average; allow 5 standard deviations
+    for pair in pairs:
+        assert abs(counts[pair] - 300) < 5 * (300 ** 0.5)
+
+
+def test_crossover_pair_without_fits_swaps_roots(strategy):
+    # Both trees deeper than Dmax already
+    assert strategy.sample_crossover_pair(strategy.pac_pop, [0, 1], [DMAX + 1, DMAX],
+                                          [0, 1], [DMAX + 1, DMAX]) == (0, 0)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_node_list_matches_find_nth_node(seed):
+    tree = ExprTree(random_genome(seed).to_node())
+    flat = random_genome(seed)
+    nodes = tree.node_list()
+    for n in range(1, tree.root.size + 1):
+        assert nodes[n - 1] is tree.root.find_nth_node(n)
+    # Flat genomes list their nodes in the same order
+    depths = flat.node_depths()
+    heights = flat.subtree_heights()
+    for k, node in zip(flat.breadth_first_order(), nodes):
+        assert FlatGenome.OPCODES[int(flat.ops[k])] == node.expr
+        assert (depths[k], heights[k]) == (node.depth, node.height)
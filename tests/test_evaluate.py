@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import math
+import random
+
+import numpy
+import pytest
+
+from conftest import random_genome, sensor_values
+from exprTree import ExprTree
+
+
+SEEDS = range(300)
+RAND_FREE = ['+', '-', '*', '/']
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_evaluate_matches_calc(seed):
+    genome = random_genome(seed, functions = RAND_FREE)
+    rng = random.Random(seed)
+    # Float sensor values, so calc's arithmetic is the same as numpy's
+    sensors = [[float(value) for value in sensor_values(rng)] for _ in range(6)]
+    for tree in [ExprTree(genome.to_node()), ExprTree(genome)]:
+        values = tree.evaluate(numpy.array(sensors), numpy.random.default_rng(seed))
+        assert values.shape == (len(sensors),)
+        for row, value in zip(sensors, values.tolist()):
+            expected = float(tree.root.calc(row, rng))
+            assert (value == expected) or (math.isnan(value) and math.isnan(expected))
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_evaluate_draws_each_row_from_its_generator(seed):
+    # Stacked games draw RAND from their own generators, the same numbers
+    # as evaluating each game on its own
+    tree = ExprTree(random_genome(seed).to_node())
+    rng = random.Random(seed)
+    sensors = numpy.array([[[float(value) for value in sensor_values(rng)] for _ in range(4)]
+                           for _ in range(3)])
+    stacked = tree.evaluate(sensors, [numpy.random.default_rng(seed + game) for game in range(3)])
+    for game in range(3):
+        alone = tree.evaluate(sensors[game], numpy.random.default_rng(seed + game))
+        assert numpy.array_equal(stacked[game], alone, equal_nan = True)
+
+
+def test_evaluated_function_is_cached():
+    tree = ExprTree(random_genome(0).to_node())
+    tree.evaluate(numpy.zeros((2, len(ExprTree.terminal_indices))), numpy.random.default_rng(0))
+    function = tree.compiled_vectorized
+    tree.evaluate(numpy.zeros((3, len(ExprTree.terminal_indices))), numpy.random.default_rng(0))
+    assert tree.compiled_vectorized is function
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from conftest import new_game_state, play, trees
+
+
+SEEDS = range(8)
+RAND_FREE = ['+', '-', '*', '/']
+
+
+@pytest.mark.parametrize('functions', [None, RAND_FREE])
+@pytest.mark.parametrize('seed', SEEDS)
+def test_fast_forward_keeps_outcome(map_infos, seed, functions):
+    pac, ghost = trees(seed, functions)
+    assert (play(new_game_state(map_infos, seed), pac, ghost)
+            == play(new_game_state(map_infos, seed, fast_forward = True), pac, ghost))
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_fast_forwarded_replay_reproduces_world(map_infos, seed):
+    # Skipped turns are recorded as if they had been played
+    pac, ghost = trees(seed, RAND_FREE)
+    world_data = []
+    play(new_game_state(map_infos, seed), pac, ghost, world_data)
+    game_state = new_game_state(map_infos, seed, fast_forward = True)
+    play(game_state, pac, ghost)
+    replay = game_state.get_replay()
+
+    replayed = new_game_state(map_infos, replay.seed)
+    replay_data = []
+    replayed.write_world_config(replay_data)
+    replayed.write_world_time_score(replay_data)
+    for turn in range(replay.num_turns()):
+        replayed.replay_turn(replay.turn_moves(turn), replay_data)
+    assert replay_data == world_data
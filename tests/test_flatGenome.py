@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from conftest import random_genome, same_value, sensor_values
+from exprTree import ExprTree, Node
+from flatGenome import FlatGenome
+
+
+SEEDS = range(300)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_flat_matches_tree(seed):
+    genome = random_genome(seed)
+    tree = ExprTree(genome.to_node())
+    flat = ExprTree(genome)
+    assert str(flat.root) == str(tree.root)
+    assert (flat.root.size, flat.root.height) == (tree.root.size, tree.root.height)
+    assert flat.canonical_hash() == tree.canonical_hash()
+    assert flat.sensor_mask() == tree.sensor_mask()
+    assert flat.uses_rand() == tree.uses_rand()
+    gpwfm = sensor_values(random.Random(seed))
+    expected = tree.root.calc(gpwfm, random.Random(seed))
+    assert same_value(flat.root.calc(gpwfm, random.Random(seed)), expected)
+    assert same_value(flat.compile()(gpwfm, random.Random(seed)), expected)
+
+
+def division_by_zero():
+    """
+    Return the linked Nodes of (G / 0.0) + (1.0 / 0.0), which simplify
+    folds down to the int constant 0.
+    """
+    root = Node('+', Node('/', Node('G'), Node('constant', constant = 0.0)),
+                Node('/', Node('constant', constant = 1.0), Node('constant', constant = 0.0)))
+    root.reset_metrics()
+    return root
+
+
+def test_simplify_stores_int_constants():
+    tree = ExprTree(division_by_zero())
+    flat = ExprTree(FlatGenome.from_node(division_by_zero()))
+    simplified = flat.simplify()
+    assert isinstance(simplified, FlatGenome)
+    assert str(simplified) == str(tree.simplify())
+    assert simplified.size < flat.root.size
+    assert simplified.kinds.tolist() == [FlatGenome.INT_CONSTANT]
+    gpwfm = [3, 4, 5, 6, 7, 0, 0, 0, 0]
+    expected = tree.root.calc(gpwfm)
+    assert same_value(simplified.calc(gpwfm), expected)
+    assert same_value(flat.compile()(gpwfm, random.Random(0)), expected)
+    assert simplified.canonical_hash() == tree.simplify().canonical_hash()
+
+
+def test_int_constants_survive_text_and_copies():
+    simplified = FlatGenome.from_node(division_by_zero()).simplify()
+    for genome in [FlatGenome.from_text(simplified.text_lines()), simplified.clone(),
+                   FlatGenome.from_node(simplified.to_node())]:
+        assert genome.kinds.tolist() == simplified.kinds.tolist()
+        assert same_value(genome.calc([0] * 9), simplified.calc([0] * 9))
+    # Grafting keeps the kinds of both sides' constants
+    grafted = random_genome(0).replace_subtree(0, simplified, 0)
+    assert str(grafted) == str(simplified)
+    assert grafted.kinds.tolist() == simplified.kinds.tolist()
+    # Float constants print with a point, so they read back as floats
+    assert FlatGenome.from_text(['1.0\n']).kinds.tolist() == [FlatGenome.FLOAT_CONSTANT]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from experiment import Experiment
+from gameState import GameState
+
+
+def new_experiment(tmp_path, monkeypatch, config_lines):
+    """
+    Set up an experiment from the given basic_options lines, writing its
+    files under tmp_path.
+    """
+    monkeypatch.chdir(str(tmp_path))
+    os.mkdir('logs')
+    with open('test.cfg', 'w') as writer:
+        writer.write('[basic_options]\n' + ''.join([line + '\n' for line in config_lines]))
+    return Experiment('test.cfg')
+
+
+@pytest.mark.parametrize('random_seed', [-1, -12345, -2 ** 63, 0, 12345, 2 ** 64 - 1])
+def test_game_seeds(tmp_path, monkeypatch, random_seed):
+    experiment = new_experiment(tmp_path, monkeypatch, ['random_seed = ' + str(random_seed)])
+    seeds = [experiment.next_game_seed() for _ in range(20)]
+    assert all([0 <= seed < 2 ** 64 for seed in seeds])
+    assert len(set(seeds)) == len(seeds)
+
+    # The same random seed gives the same games again
+    experiment.num_games = 0
+    assert [experiment.next_game_seed() for _ in range(20)] == seeds
+
+
+def test_negative_random_seed_differs_from_positive(tmp_path, monkeypatch):
+    negative = new_experiment(tmp_path, monkeypatch, ['random_seed = -5'])
+    positive = Experiment('test.cfg')
+    positive.random_seed = 5
+    assert negative.next_game_seed() != positive.next_game_seed()
+
+
+def test_game_seed_pool_cycles(tmp_path, monkeypatch):
+    experiment = new_experiment(tmp_path, monkeypatch, ['random_seed = -7', 'game_seed_pool_size = 3'])
+    seeds = [experiment.next_game_seed() for _ in range(9)]
+    assert len(set(seeds)) == 3
+    assert seeds == seeds[:3] * 3
+
+
+def test_game_rngs_are_reproducible_and_independent():
+    draws = [[rng.random() for rng in GameState.game_rngs(seed)] for seed in range(50)]
+    assert draws == [[rng.random() for rng in GameState.game_rngs(seed)] for seed in range(50)]
+    # Nearby seeds and the streams of a seed are unrelated
+    assert len(set([draw for seed_draws in draws for draw in seed_draws])) == 50 * len(draws[0])
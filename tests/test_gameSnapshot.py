@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import copy
+
+import pytest
+
+from conftest import NUM_GHOSTS, new_game_state, trees
+from controllers import PacController, GhostController
+
+
+SEEDS = range(6)
+
+
+def game_values(game_state):
+    """
+    Return copies of everything restore() is meant to bring back.
+    """
+    return copy.deepcopy([game_state.game_map, game_state.pill_dist, game_state.open_cells,
+                          game_state.moves, game_state.pacs_pos, game_state.ghosts_pos,
+                          game_state.fruit_pos, game_state.fruit_wait, game_state.fruit_eaten,
+                          game_state.num_pills_eaten, game_state.time, game_state.score,
+                          game_state.ghost_won, game_state.rng.getstate(),
+                          game_state.agent_rng.getstate()])
+
+
+def play_on(game_state, pacs, ghosts, num_turns = None):
+    """
+    Play the given number of turns, or to the end of the game, and return
+    the world data logged.
+    """
+    world_data = []
+    turn = 0
+    while ((num_turns is None) or (turn < num_turns)):
+        turn += 1
+        if (game_state.play_turn(pacs, ghosts, world_data)):
+            break
+    return world_data
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_restore_brings_game_back(map_infos, seed):
+    game_state = new_game_state(map_infos, seed)
+    pac, ghost = trees(seed)
+    pacs = [PacController(0, pac, 'compiled')]
+    ghosts = [GhostController(i, ghost, 'compiled') for i in range(NUM_GHOSTS)]
+    play_on(game_state, pacs, ghosts, 5)
+
+    snapshot = game_state.snapshot()
+    values = game_values(game_state)
+    world_data = play_on(game_state, pacs, ghosts)
+    outcome = (game_state.score, game_state.time, game_state.ghost_won)
+
+    # Playing on from the snapshot again plays the same game
+    for _ in range(2):
+        game_state.restore(snapshot)
+        assert game_values(game_state) == values
+        assert play_on(game_state, pacs, ghosts) == world_data
+        assert (game_state.score, game_state.time, game_state.ghost_won) == outcome
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_restore_to_earlier_snapshots(map_infos, seed):
+    game_state = new_game_state(map_infos, seed)
+    pac, ghost = trees(seed)
+    pacs = [PacController(0, pac, 'compiled')]
+    ghosts = [GhostController(i, ghost, 'compiled') for i in range(NUM_GHOSTS)]
+    # A snapshot every few turns to the end of the game
+    snapshots = []
+    game_over = False
+    while (not game_over):
+        snapshots.append((game_state.snapshot(), game_values(game_state)))
+        for _ in range(7):
+            game_over = game_state.play_turn(pacs, ghosts)
+            if (game_over):
+                break
+    for snapshot, values in reversed(snapshots):
+        game_state.restore(snapshot)
+        assert game_values(game_state) == values
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+import shutil
+
+import pytest
+
+from binaryMapCorpus import BinaryMapCorpus
+from conftest import MAPS
+from mapCorpus import MapCorpus
+
+
+def test_lru_eviction_and_counts():
+    corpus = MapCorpus(MAPS, 3)
+    assert corpus.num_maps == len([name for name in os.listdir(MAPS) if name.endswith('.txt')])
+    for map_index in [0, 1, 2]:
+        corpus.get_map(map_index)
+    assert (corpus.hits, corpus.misses) == (0, 3)
+
+    # A hit makes map 0 the most recently used, so map 1 goes first
+    first = corpus.get_map(0)
+    corpus.get_map(3)
+    assert list(corpus.cache.keys()) == [2, 0, 3]
+    assert corpus.get_map(0) is first
+    assert list(corpus.cache.keys()) == [2, 3, 0]
+    corpus.get_map(1)
+    assert list(corpus.cache.keys()) == [3, 0, 1]
+    assert (corpus.hits, corpus.misses) == (2, 5)
+    assert corpus.cache_stats() == ('map cache: 2 hits, 5 misses (28.6% hits), 3 of '
+                                    + str(corpus.num_maps) + ' maps loaded')
+
+
+def test_cache_never_exceeds_its_size():
+    corpus = MapCorpus(MAPS, 4)
+    rng = random.Random(0)
+    recent = []
+    for _ in range(300):
+        map_info = corpus.random_map(rng)
+        assert map_info.map_index in range(corpus.num_maps)
+        # The cache holds exactly the most recently used maps
+        if (map_info.map_index in recent):
+            recent.remove(map_info.map_index)
+        recent.append(map_info.map_index)
+        assert list(corpus.cache.keys()) == recent[-4:]
+    assert corpus.hits + corpus.misses == 300
+
+
+def test_directory_is_in_natural_order():
+    corpus = MapCorpus(MAPS, 1)
+    names = [os.path.basename(path) for path in corpus.map_file_paths]
+    numbers = [int(name[len('map'):-len('.txt')]) for name in names]
+    assert numbers == sorted(numbers)
+
+
+def test_manifest(tmp_path):
+    os.mkdir(str(tmp_path / 'maps'))
+    for name in ['map2.txt', 'map0.txt']:
+        shutil.copy(os.path.join(MAPS, name), str(tmp_path / 'maps' / name))
+    manifest_path = str(tmp_path / 'corpus.txt')
+    with open(manifest_path, 'w') as writer:
+        writer.write('# Maps for this run\n\nmaps/map2.txt\n  maps/map0.txt  \n\n# done\n')
+
+    corpus = MapCorpus(manifest_path, 2)
+    assert corpus.map_file_paths == [str(tmp_path / 'maps' / 'map2.txt'),
+                                     str(tmp_path / 'maps' / 'map0.txt')]
+    assert corpus.num_maps == 2
+    assert corpus.get_map(0).map_file_path == corpus.map_file_paths[0]
+
+
+def test_binary_corpus(map_paths, tmp_path):
+    corpus_path = str(tmp_path / 'corpus.bin')
+    BinaryMapCorpus.compile(map_paths, corpus_path)
+    corpus = MapCorpus(corpus_path, 2)
+    assert corpus.map_file_paths is None
+    assert corpus.num_maps == len(map_paths)
+    for map_index in [0, 1, 0, 2, 1]:
+        assert corpus.get_map(map_index).map_file_path == map_paths[map_index]
+    assert (corpus.hits, corpus.misses) == (1, 4)
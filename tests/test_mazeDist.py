@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import shutil
+
+import numpy
+import pytest
+
+from conftest import NUM_GHOSTS, new_game_state, random_genome
+from controllers import PacController, GhostController
+from exprTree import ExprTree
+from gameMapInfo import GameMapInfo
+
+
+SEEDS = range(4)
+
+
+@pytest.fixture
+def maze_infos(map_paths, tmp_path):
+    """
+    GameMapInfos with maze distances loaded, from copies of the maps so
+    the distance caches are written next to the copies.
+    """
+    infos = []
+    for index, path in enumerate(map_paths):
+        copy_path = str(tmp_path / ('map' + str(index) + '.txt'))
+        shutil.copy(path, copy_path)
+        info = GameMapInfo(copy_path, index)
+        info.load_maze_dist()
+        infos.append(info)
+    return infos
+
+
+def bfs_dist(info, start):
+    """
+    Return the number of Ghost moves from the given cell to every cell,
+    or the number of cells if there's no path.
+    """
+    num_cells = info.width * info.height
+    dist = [num_cells] * num_cells
+    dist[start] = 0
+    queue = [start]
+    for cell in queue:
+        for neighbor in info.ghost_neighbors[cell]:
+            if (dist[neighbor] == num_cells):
+                dist[neighbor] = dist[cell] + 1
+                queue.append(neighbor)
+    return dist
+
+
+def test_maze_dist_matches_bfs(maze_infos):
+    for info in maze_infos:
+        info.build_cell_lists()
+        num_cells = info.width * info.height
+        for cell in range(num_cells):
+            if (info.game_map[info.cell_y[cell]][info.cell_x[cell]] == '#'):
+                assert info.maze_dist[cell].tolist() == [num_cells] * num_cells
+            else:
+                assert info.maze_dist[cell].tolist() == bfs_dist(info, cell)
+
+
+def test_maze_dist_cache_is_reused(maze_infos, monkeypatch):
+    def no_build(self):
+        raise AssertionError('maze distances built again')
+    monkeypatch.setattr(GameMapInfo, 'build_maze_dist', no_build)
+    for info in maze_infos:
+        cached = GameMapInfo(info.map_file_path, info.map_index)
+        cached.load_maze_dist()
+        assert (cached.maze_dist == info.maze_dist).all()
+
+
+def assert_maze_sensors(game_state):
+    """
+    Check the maze sensors of every cell against the maze distance table.
+    """
+    maze_dist = game_state.maze_dist
+    num_cells = game_state.width * game_state.height
+    pills = (numpy.asarray(game_state.game_map) == game_state.PILL).reshape(-1)
+    if (pills.any()):
+        assert (game_state.maze_pill_dist == maze_dist[:, pills].min(axis = 1)).all()
+    else:
+        assert (game_state.maze_pill_dist == num_cells).all()
+    for cell in range(num_cells):
+        row = maze_dist[cell].tolist()
+        assert game_state.P_maze(cell) == game_state.maze_pill_dist[cell]
+        assert game_state.G_maze(cell) == min([row[ghost] for ghost in game_state.ghosts_pos])
+        assert game_state.G_maze(cell, ghost_id = 0) == min([row[ghost] for ghost in game_state.ghosts_pos[1:]])
+        assert game_state.M_maze(cell) == min([row[pac] for pac in game_state.pacs_pos])
+        if (game_state.fruit_pos == -1):
+            assert game_state.F_maze(cell) == num_cells
+        else:
+            assert game_state.F_maze(cell) == row[game_state.fruit_pos]
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_maze_sensors_during_game(maze_infos, seed):
+    game_state = new_game_state(maze_infos, seed)
+    pac = ExprTree(random_genome(1000 + seed, None,
+                                 ExprTree.pac_terminals + ExprTree.pac_maze_terminals).to_node())
+    ghost = ExprTree(random_genome(2000 + seed, None,
+                                   ExprTree.ghost_terminals + ExprTree.ghost_maze_terminals).to_node())
+    pacs = [PacController(0, pac, 'compiled')]
+    ghosts = [GhostController(i, ghost, 'compiled') for i in range(NUM_GHOSTS)]
+    snapshot = game_state.snapshot()
+    assert_maze_sensors(game_state)
+    eaten = 0
+    while (not game_state.play_turn(pacs, ghosts)):
+        if (game_state.num_pills_eaten > eaten):
+            eaten = game_state.num_pills_eaten
+            assert_maze_sensors(game_state)
+    assert_maze_sensors(game_state)
+
+    # Pills put back by restore count again
+    game_state.restore(snapshot)
+    assert_maze_sensors(game_state)
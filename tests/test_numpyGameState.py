@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import numpy
+import pytest
+
+from conftest import new_game_state, play, trees
+from gameState import GameState
+from numpyGameState import NumpyGameState
+
+
+SEEDS = range(6)
+
+
+def list_game_with_pills(map_infos, seed, pill_cells):
+    """
+    Set up a list engine game with the given pills instead of its own,
+    drawing from its generator as NumpyGameState.put_pills does, so the
+    rest of the game draws the same numbers as a numpy engine game.
+    """
+    class SamePills(GameState):
+        def put_pills(self, pill_density):
+            self.rng.getrandbits(64)
+            self.open_cells = []
+            for cell in range(self.width * self.height):
+                if (self.game_map[self.cell_y[cell]][self.cell_x[cell]] == self.WALL):
+                    continue
+                if (cell in pill_cells):
+                    self.game_map[self.cell_y[cell]][self.cell_x[cell]] = self.PILL
+                else:
+                    self.open_cells.append(cell)
+            self.build_pill_dist(sorted(pill_cells))
+            return len(pill_cells)
+
+    return new_game_state(map_infos, seed, SamePills)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_pills_are_reproducible_and_placeable(map_infos, seed):
+    game_state = new_game_state(map_infos, seed, NumpyGameState)
+    again = new_game_state(map_infos, seed, NumpyGameState)
+    assert (game_state.game_map == again.game_map).all()
+    pills = (game_state.game_map == NumpyGameState.PILL)
+    assert not (pills & (game_state.game_map_info.grid == NumpyGameState.WALL)).any()
+    assert not pills.flat[game_state.pacs_pos[0]]
+    assert int(pills.sum()) == game_state.orig_num_pills
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_numpy_engine_plays_like_list_engine(map_infos, seed):
+    numpy_state = new_game_state(map_infos, seed, NumpyGameState)
+    pill_cells = set(numpy.flatnonzero(numpy_state.game_map == NumpyGameState.PILL).tolist())
+    list_state = list_game_with_pills(map_infos, seed, pill_cells)
+    pac, ghost = trees(seed)
+    numpy_world = []
+    list_world = []
+    assert play(numpy_state, pac, ghost, numpy_world) == play(list_state, pac, ghost, list_world)
+    assert numpy_world == list_world
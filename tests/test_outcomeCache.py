@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from conftest import new_ccegp_strategy
+from exprTree import ExprTree, Node
+from outcomeCache import OutcomeCache
+
+
+def outcome(score, replay = 'replay'):
+    return [score, 10, 20, False, replay]
+
+
+def test_get_put_and_eviction():
+    cache = OutcomeCache(2)
+    assert cache.get('a') is None
+    cache.put('a', outcome(1))
+    cache.put('b', outcome(2))
+    assert cache.get('a') == outcome(1)
+    # b is now the least recently used
+    cache.put('c', outcome(3))
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (outcome(1), outcome(3))
+    assert list(cache.cache) == ['a', 'c']
+    assert (cache.hits, cache.misses) == (3, 2)
+    assert cache.cache_stats() == 'outcome cache: 3 hits, 2 misses (60.0% hits), 2 of 2 outcomes stored'
+
+
+def test_need_replay():
+    cache = OutcomeCache(10)
+    cache.put('batched', outcome(1, replay = None))
+    assert cache.get('batched', need_replay = True) is None
+    assert cache.get('batched') == outcome(1, replay = None)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def tree(expr, left, right):
+    tree = ExprTree(Node(expr, left, right))
+    tree.reset_metrics()
+    return tree
+
+
+def test_canonical_hash_ignores_commutative_order():
+    assert tree('+', Node('G'), Node('P')).canonical_hash() \
+        == tree('+', Node('P'), Node('G')).canonical_hash()
+    assert tree('*', Node('G'), Node('P')).canonical_hash() \
+        == tree('*', Node('P'), Node('G')).canonical_hash()
+    assert tree('-', Node('G'), Node('P')).canonical_hash() \
+        != tree('-', Node('P'), Node('G')).canonical_hash()
+    # Only one side draws random numbers, so the order doesn't matter
+    assert tree('+', Node('RAND', Node('G'), Node('P')), Node('W')).canonical_hash() \
+        == tree('+', Node('W'), Node('RAND', Node('G'), Node('P'))).canonical_hash()
+
+
+def test_canonical_hash_keeps_the_order_of_draws():
+    first = Node('RAND', Node('G'), Node('P'))
+    second = Node('RAND', Node('constant', constant = 0.0), Node('W'))
+    assert tree('+', first, second).canonical_hash() \
+        != tree('+', second.clone(), first.clone()).canonical_hash()
+
+
+def test_canonical_hash_quantum():
+    near = tree('+', Node('G'), Node('constant', constant = 1.1))
+    far = tree('+', Node('G'), Node('constant', constant = 1.9))
+    base = tree('+', Node('G'), Node('constant', constant = 1.0))
+    assert near.canonical_hash() != base.canonical_hash()
+    assert near.canonical_hash(0.5) == base.canonical_hash(0.5)
+    assert far.canonical_hash(0.5) != base.canonical_hash(0.5)
+
+
+def new_strategy(tmp_path, monkeypatch, quantum):
+    """
+    Set up a CCEGP strategy whose games all have the same seed, with an
+    outcome cache.
+    """
+    strategy = new_ccegp_strategy(tmp_path, monkeypatch,
+                                  ['random_seed = 1', 'game_seed_pool_size = 1'],
+                                  ['outcome_cache_size = 100',
+                                   'outcome_cache_quantum = ' + str(quantum)])
+    strategy.outcome_cache = OutcomeCache(strategy.outcome_cache_size)
+    return strategy
+
+
+def pac_tree(constant):
+    # Uses RAND, which seeded games draw from their own generators
+    return tree('-', Node('RAND', Node('G'), Node('constant', constant = constant)), Node('P'))
+
+
+def test_games_with_rand_are_reused(tmp_path, monkeypatch):
+    strategy = new_strategy(tmp_path, monkeypatch, 0)
+    ghost = tree('+', Node('G'), Node('M'))
+    played = pac_tree(5.0)
+    strategy.execute_one_game(played, ghost)
+    replay = strategy.experiment.replay
+    reused = pac_tree(5.0)
+    strategy.execute_one_game(reused, ghost)
+    assert (strategy.outcome_cache.hits, strategy.outcome_cache.misses) == (1, 1)
+    assert reused.fitness == played.fitness
+    assert strategy.experiment.replay is replay
+
+    # Playing it again gives the same outcome
+    strategy.outcome_cache = OutcomeCache(100)
+    again = pac_tree(5.0)
+    strategy.execute_one_game(again, ghost)
+    assert again.fitness == played.fitness
+    assert strategy.experiment.replay.moves == replay.moves
+
+
+def test_quantized_hits_give_no_replay(tmp_path, monkeypatch):
+    strategy = new_strategy(tmp_path, monkeypatch, 0.5)
+    ghost = tree('+', Node('G'), Node('M'))
+    strategy.execute_one_game(pac_tree(5.0), ghost)
+    strategy.execute_one_game(pac_tree(5.1), ghost)
+    assert strategy.outcome_cache.hits == 1
+    assert strategy.experiment.replay is None
+
+    # The exhibition game is played, so its replay is of its own trees
+    strategy.execute_one_game(pac_tree(5.1), ghost, exhibition = True)
+    assert strategy.outcome_cache.hits == 1
+    assert strategy.experiment.replay is not None
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from conftest import NUM_GHOSTS, new_game_state, trees
+from controllers import PacController, GhostController
+
+
+SEEDS = range(6)
+
+
+def taxicab_P(game_state, pos):
+    """
+    The nearest-pill search P did before the distance field: check
+    increasingly large taxicab circles around the given position.
+    """
+    for radius in range(game_state.width + game_state.height):
+        for i in range(radius + 1):
+            if (((pos[0] - radius + i) >= 0)
+                and ((pos[1] - i) >= 0)
+                and game_state.game_map[pos[1] - i][pos[0] - radius + i] == game_state.PILL):
+                return radius
+            if (((pos[0] - radius + i) >= 0)
+                and ((pos[1] + i) < game_state.height)
+                and game_state.game_map[pos[1] + i][pos[0] - radius + i] == game_state.PILL):
+                return radius
+            if (((pos[0] + radius - i) < game_state.width)
+                and ((pos[1] - i) >= 0)
+                and game_state.game_map[pos[1] - i][pos[0] + radius - i] == game_state.PILL):
+                return radius
+            if (((pos[0] + radius - i) < game_state.width)
+                and ((pos[1] + i) < game_state.height)
+                and game_state.game_map[pos[1] + i][pos[0] + radius - i] == game_state.PILL):
+                return radius
+    return game_state.height + game_state.width
+
+
+def assert_P_matches_search(game_state):
+    for y in range(game_state.height):
+        for x in range(game_state.width):
+            assert game_state.P(y * game_state.width + x) == taxicab_P(game_state, (x, y))
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_P_matches_search_during_game(map_infos, seed):
+    game_state = new_game_state(map_infos, seed)
+    pac, ghost = trees(seed)
+    pacs = [PacController(0, pac, 'compiled')]
+    ghosts = [GhostController(i, ghost, 'compiled') for i in range(NUM_GHOSTS)]
+    assert_P_matches_search(game_state)
+    eaten = 0
+    while (not game_state.play_turn(pacs, ghosts)):
+        if (game_state.num_pills_eaten > eaten):
+            eaten = game_state.num_pills_eaten
+            assert_P_matches_search(game_state)
+    assert_P_matches_search(game_state)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_P_matches_search_eating_every_pill(map_infos, seed):
+    # Eat the pills in a random order, down to none left
+    game_state = new_game_state(map_infos, seed)
+    pill_cells = [y * game_state.width + x
+                  for y in range(game_state.height) for x in range(game_state.width)
+                  if (game_state.game_map[y][x] == game_state.PILL)]
+    random.Random(seed).shuffle(pill_cells)
+    for cell in pill_cells:
+        game_state.game_map[cell // game_state.width][cell % game_state.width] = game_state.OPEN
+        game_state.remove_pill_dist(cell)
+        assert_P_matches_search(game_state)
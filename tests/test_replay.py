@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from conftest import new_game_state, play, trees
+
+
+SEEDS = range(6)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_replay_reproduces_world(map_infos, seed):
+    pac, ghost = trees(seed)
+    game_state = new_game_state(map_infos, seed)
+    world_data = []
+    play(game_state, pac, ghost, world_data)
+    replay = game_state.get_replay()
+
+    replayed = new_game_state(map_infos, replay.seed)
+    replay_data = []
+    replayed.write_world_config(replay_data)
+    replayed.write_world_time_score(replay_data)
+    for turn in range(replay.num_turns()):
+        replayed.replay_turn(replay.turn_moves(turn), replay_data)
+    assert replay_data == world_data
+
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from conftest import random_genome, same_value, sensor_values
+from exprTree import ExprTree, Node
+from flatGenome import FlatGenome
+
+
+SEEDS = range(300)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_simplify_keeps_values(seed):
+    genome = random_genome(seed)
+    # Exact 0 and 1 constants give the simplifier something to do
+    rng = random.Random(seed)
+    constants = [rng.choice([0.0, 1.0, value]) for value in genome.constants.tolist()]
+    genome = FlatGenome(genome.ops, constants)
+    tree = ExprTree(genome.to_node())
+    flat = ExprTree(genome)
+    assert tree.simplify().size <= tree.root.size
+    assert str(flat.simplify()) == str(tree.simplify())
+    gpwfm = sensor_values(rng)
+    expected = tree.root.calc(gpwfm, random.Random(seed))
+    assert same_value(tree.simplify().calc(gpwfm, random.Random(seed)), expected)
+    assert same_value(flat.simplify().calc(gpwfm, random.Random(seed)), expected)
+    assert same_value(tree.compile()(gpwfm, random.Random(seed)), expected)
+
+
+def test_simplify_drops_identities():
+    # (G + 0) * 1 is G, (W * 1.0) / 0 folds to int 0, and G - 0 is G
+    tree = ExprTree(Node('-', Node('*', Node('+', Node('G'), Node('constant', constant = 0)),
+                                   Node('constant', constant = 1)),
+                         Node('/', Node('*', Node('W'), Node('constant', constant = 1.0)),
+                              Node('constant', constant = 0.0))))
+    tree.reset_metrics()
+    assert str(tree.simplify()) == 'G\n'
+    # The tree itself is left alone
+    assert tree.root.size == 11
+
+
+def test_simplify_keeps_int_types():
+    # G + 0.0 is a float, so the 0.0 can't be dropped
+    tree = ExprTree(Node('+', Node('G'), Node('constant', constant = 0.0)))
+    tree.reset_metrics()
+    assert tree.simplify().size == 3
+    assert same_value(tree.compile()([3] * 9, random.Random(0)), 3.0)
+
+
+def test_simplify_keeps_division_by_zero_type():
+    # RAND(G, P) / 0 is int 0 from calc, so + 0.0 around it can't be dropped
+    tree = ExprTree(Node('+', Node('/', Node('RAND', Node('G'), Node('P')),
+                                   Node('constant', constant = 0.0)),
+                         Node('constant', constant = 0.0)))
+    tree.reset_metrics()
+    gpwfm = [3, 4, 5, 6, 7, 0, 0, 0, 0]
+    assert same_value(tree.compile()(gpwfm, random.Random(1)), tree.root.calc(gpwfm, random.Random(1)))
+    # The dividend still draws its random number
+    rng = random.Random(1)
+    tree.compile()(gpwfm, rng)
+    expected = random.Random(1)
+    expected.random()
+    assert rng.random() == expected.random()
+
+
+def test_sensor_mask_skips_dropped_subtrees():
+    tree = ExprTree(Node('+', Node('P'), Node('/', Node('M'), Node('constant', constant = 0.0))))
+    tree.reset_metrics()
+    assert tree.root.terminal_mask == ExprTree.terminal_bit('P') | ExprTree.terminal_bit('M')
+    assert tree.sensor_mask() == ExprTree.terminal_bit('P')
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import io
+import random
+
+import pytest
+
+import treeCheck
+from conftest import random_genome
+from exprTree import ExprTree, Node
+from flatGenome import FlatGenome
+from treeFile import TreeFile
+
+
+@pytest.mark.parametrize('seed', range(200))
+@pytest.mark.parametrize('genome', ['tree', 'flat'])
+def test_text_round_trip(seed, genome):
+    tree = ExprTree(random_genome(seed).to_node())
+    text = str(tree.root)
+    read = TreeFile.read_text(io.StringIO(text), genome = genome)
+    assert str(read.root) == text
+    assert read.canonical_hash() == tree.canonical_hash()
+    assert (read.root.size, read.root.height) == (tree.root.size, tree.root.height)
+    writer = io.StringIO()
+    TreeFile.write_text(read, writer)
+    assert writer.getvalue() == text
+
+
+@pytest.mark.parametrize('text', ['', '|G\n', '+\n|G\n', 'G\nP\n', '+\n|G\n||P\n', 'X\n', 'constant\n'])
+def test_malformed_text_is_rejected(text):
+    with pytest.raises(ValueError):
+        TreeFile.read_text(io.StringIO(text))
+
+
+def test_population_round_trip(tmp_path):
+    populations = []
+    for generation in range(1, 4):
+        individuals = []
+        for i in range(20):
+            genome = random_genome(generation * 100 + i)
+            individual = ExprTree(genome if (i % 2) else genome.to_node())
+            individual.fitness = random.Random(i).uniform(-50, 50)
+            individual.score = i
+            individuals.append(individual)
+        populations.append((generation, individuals))
+
+    file_path = str(tmp_path / 'test.pop')
+    with open(file_path, 'wb') as writer:
+        TreeFile.write_header(writer)
+        for generation, individuals in populations:
+            TreeFile.write_population(writer, generation, individuals)
+
+    for genome in ['tree', 'flat']:
+        read = list(TreeFile.read_populations(file_path, genome = genome))
+        assert [generation for generation, _ in read] == [1, 2, 3]
+        for (_, individuals), (_, read_individuals) in zip(populations, read):
+            for individual, read_individual in zip(individuals, read_individuals):
+                assert str(read_individual.root) == str(individual.root)
+                assert read_individual.canonical_hash() == individual.canonical_hash()
+                assert read_individual.fitness == individual.fitness
+                assert read_individual.score == individual.score
+
+
+def test_int_constants_round_trip(tmp_path):
+    # (G / 0.0) + (1.0 / 0.0) simplifies to the int constant 0
+    root = Node('+', Node('/', Node('G'), Node('constant', constant = 0.0)),
+                Node('/', Node('constant', constant = 1.0), Node('constant', constant = 0.0)))
+    root.reset_metrics()
+    simplified = ExprTree(FlatGenome.from_node(root).simplify())
+    file_path = str(tmp_path / 'test.pop')
+    with open(file_path, 'wb') as writer:
+        TreeFile.write_header(writer)
+        TreeFile.write_population(writer, 1, [simplified, ExprTree(simplified.root.to_node())])
+    for genome in ['tree', 'flat']:
+        _, individuals = next(TreeFile.read_populations(file_path, genome = genome))
+        for individual in individuals:
+            assert str(individual.root) == '0\n'
+            assert individual.canonical_hash() == simplified.canonical_hash()
+            assert type(individual.root.calc([0] * 9)) == int
+
+
+def test_other_version_is_rejected(tmp_path):
+    file_path = str(tmp_path / 'test.pop')
+    with open(file_path, 'wb') as writer:
+        writer.write(TreeFile.HEADER.pack(TreeFile.MAGIC, TreeFile.VERSION - 1))
+    with pytest.raises(ValueError):
+        list(TreeFile.read_populations(file_path))
+
+
+def test_truncated_population_file_is_rejected(tmp_path):
+    file_path = str(tmp_path / 'test.pop')
+    with open(file_path, 'wb') as writer:
+        TreeFile.write_header(writer)
+        TreeFile.write_population(writer, 1, [ExprTree(random_genome(seed)) for seed in range(5)])
+    with open(file_path, 'rb') as reader:
+        data = reader.read()
+    with open(file_path, 'wb') as writer:
+        writer.write(data[:-3])
+    with pytest.raises(ValueError):
+        list(TreeFile.read_populations(file_path))
+
+
+def test_tree_check_child_counts():
+    rng = random.Random(0)
+    for _ in range(2000):
+        depths = [rng.randint(0, 6) for _ in range(rng.randint(1, 30))]
+        # Forward scan from every line, as treeCheck used to count
+        expected = []
+        for line in range(len(depths)):
+            children = 0
+            for other in range(line + 1, len(depths)):
+                if (depths[other] == depths[line] + 1):
+                    children += 1
+                elif (depths[other] <= depths[line]):
+                    break
+            expected.append(children)
+        assert treeCheck.numChildren(depths) == expected
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from conftest import node_metrics, random_genome, same_value, sensor_values
+from exprTree import ExprTree, Node
+
+
+SEEDS = range(100)
+
+
+def evaluated_tree(seed):
+    """
+    Return a random tree that has been compiled, simplified and hashed.
+    """
+    tree = ExprTree(random_genome(seed).to_node())
+    tree.compile()
+    tree.canonical_hash()
+    tree.uses_rand()
+    tree.node_list()
+    return tree
+
+
+def assert_matches_reset(tree):
+    """
+    Check the tree's metrics are what reset_metrics gives, and that it
+    computes what its changed nodes do.
+    """
+    assert (tree.compiled, tree.compiled_vectorized, tree.simplified) == (None, None, None)
+    assert (tree.nodes, tree.hash_cache, tree.rand_used) == (None, None, None)
+    expected = node_metrics(tree.root)
+    tree.root.reset_metrics()
+    assert node_metrics(tree.root) == expected
+    gpwfm = sensor_values(random.Random(0))
+    assert same_value(tree.compile()(gpwfm, random.Random(0)), tree.root.calc(gpwfm, random.Random(0)))
+    assert tree.canonical_hash() == ExprTree(tree.root.clone()).canonical_hash()
+    assert tree.uses_rand() == tree.root.contains('RAND')
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_update_metrics_after_mutation(seed):
+    tree = evaluated_tree(seed)
+    rng = random.Random(seed)
+    node = tree.node_list()[rng.randint(0, tree.root.size - 1)]
+    parent, depth = node.parent, node.depth
+    node.copy(random_genome(3000 + seed).to_node())
+    tree.update_metrics(node, parent, depth)
+    assert_matches_reset(tree)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_update_metrics_after_crossover(seed):
+    tree1 = evaluated_tree(seed)
+    tree2 = evaluated_tree(1000 + seed)
+    rng = random.Random(seed)
+    node1 = tree1.node_list()[rng.randint(0, tree1.root.size - 1)]
+    node2 = tree2.node_list()[rng.randint(0, tree2.root.size - 1)]
+    attach1, depth1 = node1.parent, node1.depth
+    attach2, depth2 = node2.parent, node2.depth
+    temp_node = Node()
+    temp_node.copy(node1)
+    node1.copy(node2)
+    node2.copy(temp_node)
+    tree1.update_metrics(node1, attach1, depth1)
+    tree2.update_metrics(node2, attach2, depth2)
+    assert_matches_reset(tree1)
+    assert_matches_reset(tree2)
+
+
+def test_reset_metrics_drops_compiled_function():
+    tree = ExprTree(Node('+', Node('G'), Node('P')))
+    tree.reset_metrics()
+    assert tree.compile()([1, 2, 0, 0, 0, 0, 0, 0, 0], random) == 3
+    tree.root.expr = '*'
+    tree.reset_metrics()
+    assert tree.compile()([1, 2, 0, 0, 0, 0, 0, 0, 0], random) == 2
@@ -14,17 +14,20 @@ def getDepth(line):
 	return len(line)-len(line.lstrip("|")) # this is kinda gross but it works
 
 '''
-desc:	Returns the number of children for a node on a given line.
+desc:	Returns the number of children for the node on every line, in one pass. A line's
+		parent is the closest line above it one level up with nothing at that level or
+		above in between; a stack holds the lines that can still take children.
 '''
-def numChildren(depths, lineNum):
-	myDepth = depths[lineNum]
-	children = 0
-	for line in range(lineNum+1,len(depths)):
+def numChildren(depths):
+	children = [0]*len(depths)
+	openLines = []
+	for line in range(len(depths)):
 		nodeDepth = depths[line]
-		if nodeDepth == myDepth+1:
-			children += 1
-		elif nodeDepth <= myDepth:
-			break
+		while openLines and depths[openLines[-1]] >= nodeDepth:
+			openLines.pop()
+		if openLines and depths[openLines[-1]] == nodeDepth-1:
+			children[openLines[-1]] += 1
+		openLines.append(line)
 	return children
 
 '''
@@ -60,7 +63,7 @@ def checkTree(filename):
 
 	depths = [getDepth(line) for line in treeText]
 	nodes = [line.lstrip("|") for line in treeText]
-	children = [numChildren(depths,line) for line in range(len(treeText))]
+	children = numChildren(depths)
 
 	# check for invalid depth increases
 	for line in range(len(treeText)-1):